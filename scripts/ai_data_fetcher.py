@@ -10,8 +10,12 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(current_dir)
 sys.path.append(project_root)
 
+# stdout é capturado pelo n8n como JSON: logs do projeto vão para stderr
+os.environ.setdefault("LOG_STREAM", "stderr")
+
 from src.config import POWERBI_CONFIG
 from src.core.clients.powerbi_client import PowerBIClient
+from src.core.clients.query_budget import PRIORITY_AI, set_default_priority
 from src.core.services import dax_queries
 
 
@@ -60,6 +64,8 @@ def main():
     parser.add_argument("--dashboard", required=True, help="ID ou Nome do dashboard (ex: metas, ina)")
     args = parser.parse_args()
 
+    # Consultas do agente do n8n cedem a cota aos relatórios agendados
+    set_default_priority(PRIORITY_AI)
     data = fetch_data(args.dashboard)
 
     # Printe o JSON para o n8n capturar via stdout
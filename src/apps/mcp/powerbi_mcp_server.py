@@ -15,11 +15,23 @@ import json
 import os
 import re
 import sys
-import time
 from typing import Any
 
 import requests
 
+# Permite executar o servidor diretamente pelo caminho do arquivo (python src/apps/mcp/...)
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.append(_PROJECT_ROOT)
+
+# stdout é o canal JSON-RPC: logs do projeto vão para stderr
+os.environ.setdefault("LOG_STREAM", "stderr")
+
+from src.core.clients.dax_result import DaxResult  # noqa: E402
+from src.core.clients.powerbi_auth import get_token_broker  # noqa: E402
+from src.core.clients.powerbi_client import PowerBIClient  # noqa: E402
+from src.core.clients.query_budget import PRIORITY_AI, set_default_priority  # noqa: E402
+
 # ------- Configuração -------
 TENANT = os.environ.get("SHAREPOINT_TENANT", "")
 CLIENT_ID = os.environ.get("SHAREPOINT_CLIENT_ID", "")
@@ -27,30 +39,16 @@ CLIENT_SECRET = os.environ.get("SHAREPOINT_CLIENT_SECRET", "")
 DEFAULT_WORKSPACE_ID = os.environ.get("POWERBI_WORKSPACE_ID", "")
 DEFAULT_DATASET_ID = os.environ.get("POWERBI_DATASET_ID", "")
 
-_token: str = ""
-_token_expiry: float = 0
+# Clientes por (workspace, dataset) — reaproveitam sessão HTTP e token entre chamadas
+_clients: dict[tuple[str, str], PowerBIClient] = {}
 
 
 def _get_token() -> str:
-    """Obtém ou renova o token OAuth via Service Principal."""
-    global _token, _token_expiry
-
-    if _token and time.time() < _token_expiry:
-        return _token
-
-    url = f"https://login.microsoftonline.com/{TENANT}/oauth2/v2.0/token"
-    data = {
-        "grant_type": "client_credentials",
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-        "scope": "https://analysis.windows.net/powerbi/api/.default",
-    }
-    resp = requests.post(url, data=data, timeout=10)
-    resp.raise_for_status()
-    token_data = resp.json()
-    _token = token_data["access_token"]
-    _token_expiry = time.time() + token_data.get("expires_in", 3600) - 60
-    return _token
+    """Obtém o token OAuth do broker do processo (o mesmo usado pelos PowerBIClient)."""
+    token = get_token_broker(TENANT, CLIENT_ID, CLIENT_SECRET).get_token()
+    if not token:
+        raise RuntimeError("Falha ao autenticar no Azure AD (ver logs).")
+    return token
 
 
 def _pbi_request(method: str, path: str, json_body=None) -> dict:
@@ -63,13 +61,23 @@ def _pbi_request(method: str, path: str, json_body=None) -> dict:
     return resp.json() if resp.content else {}
 
 
-def _execute_dax(workspace_id: str, dataset_id: str, query: str) -> list[dict]:
-    """Executa uma query DAX e retorna as linhas resultantes."""
-    body = {"queries": [{"query": query}], "serializerSettings": {"includeNulls": True}}
-    path = f"/groups/{workspace_id}/datasets/{dataset_id}/executeQueries"
-    result = _pbi_request("POST", path, json_body=body)
-    tables = result.get("results", [{}])[0].get("tables", [{}])
-    return tables[0].get("rows", []) if tables else []
+def _get_client(workspace_id: str, dataset_id: str) -> PowerBIClient:
+    """Retorna (ou cria) o PowerBIClient do par workspace/dataset."""
+    key = (workspace_id, dataset_id)
+    if key not in _clients:
+        _clients[key] = PowerBIClient(workspace_id=workspace_id, dataset_id=dataset_id)
+    return _clients[key]
+
+
+def _execute_dax(workspace_id: str, dataset_id: str, query: str) -> DaxResult:
+    """
+    Executa uma query DAX e retorna o resultado colunar (nomes de coluna já normalizados).
+    Passa pelo PowerBIClient para compartilhar o cache DAX em disco com os demais processos.
+    """
+    result = _get_client(workspace_id, dataset_id).execute_dax_result(query)
+    if result is None:
+        raise RuntimeError("Falha ao executar a query DAX no Power BI (ver logs).")
+    return result
 
 
 def _extract_html_value(raw: Any) -> str:
@@ -103,14 +111,13 @@ def tool_execute_dax(args: dict) -> str:
     if not rows:
         return "Nenhum resultado retornado."
 
-    # Normaliza e formata o resultado como tabela de texto
+    # Formata o resultado como tabela de texto (chaves já normalizadas pelo DaxResult)
     output_lines = []
     for i, row in enumerate(rows):
-        norm = {}
-        for k, v in row.items():
-            clean_key = re.sub(r".*\[|\]", "", k).strip()
-            clean_val = _extract_html_value(v) if isinstance(v, str) else (str(v) if v is not None else "")
-            norm[clean_key] = clean_val
+        norm = {
+            k: _extract_html_value(v) if isinstance(v, str) else (str(v) if v is not None else "")
+            for k, v in row.items()
+        }
         output_lines.append(f"Linha {i + 1}: {json.dumps(norm, ensure_ascii=False)}")
 
     return "\n".join(output_lines)
@@ -166,9 +173,9 @@ def tool_get_schema(args: dict) -> str:
         output.append("MEDIDAS:")
         current_table = None
         for row in measure_rows:
-            tabela = row.get("[Tabela]", row.get("Tabela", ""))
-            medida = row.get("[Medida]", row.get("Medida", ""))
-            formato = row.get("[Formato]", row.get("Formato", ""))
+            tabela = row.get("Tabela", "")
+            medida = row.get("Medida", "")
+            formato = row.get("Formato", "")
             if tabela != current_table:
                 output.append(f"  [{tabela}]")
                 current_table = tabela
@@ -195,10 +202,9 @@ def tool_evaluate_measure(args: dict) -> str:
         return "Nenhum resultado."
 
     output = []
-    for k, v in rows[0].items():
-        clean_key = re.sub(r".*\[|\]", "", k).strip()
+    for k, v in rows.first().items():
         clean_val = _extract_html_value(v) if isinstance(v, str) else str(v)
-        output.append(f"  {clean_key}: {clean_val}")
+        output.append(f"  {k}: {clean_val}")
 
     return "Valores das medidas:\n" + "\n".join(output)
 
@@ -348,6 +354,8 @@ def handle(req: dict) -> dict | None:
 
 def main():
     """Loop principal do servidor MCP stdio."""
+    # Consultas de agentes cedem a cota aos relatórios agendados
+    set_default_priority(PRIORITY_AI)
     sys.stderr.write("[powerbi-mcp] Servidor iniciado.\n")
     sys.stderr.flush()
 
@@ -11,7 +11,8 @@ import time
 import schedule
 
 from src.config import validate_config
-from src.core.jobs import JOB_MAPPING, safe_run_job
+from src.core.clients.query_budget import reserve_schedule
+from src.core.jobs import JOB_MAPPING, PBI_REPORT_JOBS, safe_run_job
 from src.core.services.job_service import JobService
 from src.core.services.supabase_service import SupabaseService
 from src.core.utils.lock_manager import LockManager
@@ -116,7 +117,7 @@ def refresh_schedule():
                 if day_name:
                     scheduler_obj = getattr(schedule.every(), day_name)
                     # Pass template_content to safe_run_job wrapper
-                    scheduler_obj.at(time_clean).do(
+                    job = scheduler_obj.at(time_clean).do(
                         _run_job_in_thread,
                         job_func,
                         job_name=name,
@@ -124,6 +125,9 @@ def refresh_schedule():
                         template_content=template_content,
                     )
                     count += 1
+                    # Reserva a cota do Power BI: consultas "ai" na janela são recusadas (retornam None)
+                    if def_key in PBI_REPORT_JOBS and job.next_run:
+                        reserve_schedule(name, job.next_run)
 
             logger.info(f"  [OK] Agendado '{name}' ({def_key}) às {time_clean} em {days}")
 
@@ -63,12 +63,25 @@ EVOLUTION_CONFIG = {
 NEXUS_CONFIG = {
     "api_url": os.getenv("NEXUS_API_URL"),
     "token": os.getenv("NEXUS_TOKEN"),
+    # Páginas pedidas antecipadamente (em voo ao mesmo tempo) nas leituras completas das APIs Nexus
+    "prefetch_pages": int(os.getenv("NEXUS_PREFETCH_PAGES", "4")),
 }
 
 # Configurações Unidades (Data Lake)
 UNIDADES_CONFIG = {
     "api_url": os.getenv("UNIDADES_API_URL"),
     "token": os.getenv("UNIDADES_TOKEN"),
+    # Colunas buscadas no mirror Supabase (projeção feita no servidor, em vez de select=*)
+    "modelos_select": os.getenv(
+        "UNIDADES_MODELOS_SELECT",
+        "id,unidade,status,data,data_contrato,data_cancelamento,modelo,tipo_franquia,tipo_contrato,"
+        "valor,percentual_retencao,royalties,crm,anos,consultor_venda,gerente_venda,raw_data",
+    ),
+    "unidades_select": os.getenv("UNIDADES_UNIDADES_SELECT", "id,codigo,nome,cidade,uf,raw_data"),
+    "participantes_select": os.getenv("UNIDADES_PARTICIPANTES_SELECT", "id,codigo,nome"),
+    # Unidades ausentes do mirror: nomes buscados na API em paralelo e guardados no espelho local
+    "name_resolver_workers": int(os.getenv("UNIDADES_NAME_RESOLVER_WORKERS", "8")),
+    "name_cache_ttl_seconds": int(os.getenv("UNIDADES_NAME_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
 }
 
 # Lista de departamentos e Nomes (Legacy/Unused - Removed)
@@ -90,6 +103,107 @@ PORTAL_URL = os.getenv("PORTAL_URL", "https://bi.grupostudio.tec.br")
 DATA_DIR = os.getenv("DATA_DIR", ".")
 KNOWN_FILES_PATH = os.path.join(DATA_DIR, "known_files.json")
 IMAGES_DIR = os.path.join(DATA_DIR, "images")
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(DATA_DIR, "cache"))
+
+# Cache persistente de resultados DAX (compartilhado entre API, scheduler, MCP e scripts)
+DAX_CACHE_CONFIG = {
+    "path": os.getenv("DAX_CACHE_PATH", os.path.join(CACHE_DIR, "dax_cache.sqlite3")),
+    "ttl_seconds": int(os.getenv("DAX_CACHE_TTL_SECONDS", "1800")),
+    "max_bytes": int(os.getenv("DAX_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    # Stale-while-revalidate (opt-in por dataset): IDs separados por vírgula ou "*" para todos.
+    # Após o soft TTL o resultado vencido é devolvido na hora e atualizado em background;
+    # após o hard TTL a entrada é removida de fato.
+    "swr_datasets": [d.strip() for d in os.getenv("DAX_SWR_DATASETS", "").split(",") if d.strip()],
+    "swr_soft_ttl_seconds": int(os.getenv("DAX_SWR_SOFT_TTL_SECONDS", "1800")),
+    "swr_hard_ttl_seconds": int(os.getenv("DAX_SWR_HARD_TTL_SECONDS", "21600")),
+    # Invalidação por refresh: o resultado vale enquanto o dataset não for atualizado
+    # (último refresh concluído consultado a cada refresh_check_seconds), até refresh_max_age_seconds.
+    # Queries com TODAY()/NOW() continuam expirando pelo TTL de relógio.
+    "refresh_aware": os.getenv("DAX_CACHE_REFRESH_AWARE", "true").lower() == "true",
+    "refresh_check_seconds": int(os.getenv("DAX_CACHE_REFRESH_CHECK_SECONDS", "120")),
+    "refresh_max_age_seconds": int(os.getenv("DAX_CACHE_REFRESH_MAX_AGE_SECONDS", "86400")),
+    # Cache por medida: cada expressão de um ROW é cacheada por (dataset, expressão, filtros);
+    # consultas escalares novas buscam só as medidas que ainda não estão em cache.
+    "measure_cache": os.getenv("DAX_MEASURE_CACHE", "true").lower() == "true",
+}
+
+# Token OAuth do Power BI compartilhado entre processos: antes de ir ao Azure AD, o broker
+# tenta o arquivo local (gravado por qualquer processo do projeto) e o setting
+# pbi_access_token do Supabase (gravado pelos jobs de token/refresh).
+POWERBI_TOKEN_CONFIG = {
+    "store_path": os.getenv("PBI_TOKEN_STORE_PATH", os.path.join(CACHE_DIR, "pbi_token.json")),
+    "use_supabase": os.getenv("PBI_TOKEN_FROM_SUPABASE", "true").lower() == "true",
+    # Validade mínima restante para reaproveitar um token persistido
+    "min_ttl_seconds": int(os.getenv("PBI_TOKEN_MIN_TTL_SECONDS", "300")),
+}
+
+# Controle de admissão das chamadas executeQueries (por tenant, compartilhado no processo).
+# Limite PPU: 120 requisições de query por minuto por usuário (service principal).
+# A concorrência começa em initial_concurrency, sobe +1 a cada janela sem throttling
+# e cai pela metade a cada HTTP 429 (AIMD), respeitando o Retry-After.
+POWERBI_GOVERNOR_CONFIG = {
+    "rate_per_minute": int(os.getenv("PBI_QUERY_RATE_PER_MINUTE", "120")),
+    "burst": int(os.getenv("PBI_QUERY_BURST", "20")),
+    "max_concurrency": int(os.getenv("PBI_QUERY_MAX_CONCURRENCY", "10")),
+    "initial_concurrency": int(os.getenv("PBI_QUERY_INITIAL_CONCURRENCY", "5")),
+    "max_retries": int(os.getenv("PBI_QUERY_MAX_RETRIES", "3")),
+    # Espera padrão quando o 429 não traz Retry-After
+    "default_retry_after_seconds": int(os.getenv("PBI_QUERY_DEFAULT_RETRY_AFTER", "30")),
+}
+
+# Prioridade entre classes de chamadores que dividem a mesma cota do service principal:
+# "scheduled" (relatórios agendados) > "interactive" (API/dashboards) > "ai" (MCP, n8n).
+# O ledger horário e as reservas dos jobs agendados ficam em SQLite, visíveis a todos os processos.
+POWERBI_BUDGET_CONFIG = {
+    "ledger_path": os.getenv("PBI_QUERY_LEDGER_PATH", os.path.join(CACHE_DIR, "pbi_query_ledger.sqlite3")),
+    # Máximo de consultas por hora para cada classe (0 = sem limite); "scheduled" nunca é limitada
+    "hourly_budget": {
+        "interactive": int(os.getenv("PBI_BUDGET_INTERACTIVE_PER_HOUR", "0")),
+        "ai": int(os.getenv("PBI_BUDGET_AI_PER_HOUR", "1200")),
+    },
+    # Janela reservada aos jobs agendados: começa reservation_lead_seconds antes do horário
+    # e dura reservation_seconds; durante a execução do job, a reserva é renovada periodicamente.
+    # Durante a reserva, consultas da classe "ai" são recusadas.
+    "reservation_lead_seconds": int(os.getenv("PBI_RESERVATION_LEAD_SECONDS", "180")),
+    "reservation_seconds": int(os.getenv("PBI_RESERVATION_SECONDS", "900")),
+}
+
+# Micro-batching de consultas escalares: ROW/CALCULATETABLE(ROW) com o mesmo contexto de
+# filtro, disparadas dentro de window_ms, são fundidas em um único executeQueries
+DAX_BATCH_CONFIG = {
+    "enabled": os.getenv("DAX_AUTO_BATCH", "true").lower() == "true",
+    "window_ms": int(os.getenv("DAX_BATCH_WINDOW_MS", "25")),
+    "max_queries": int(os.getenv("DAX_BATCH_MAX_QUERIES", "20")),
+}
+
+# Histórico local dos valores numéricos de metas (um snapshot por data de referência),
+# usado para tendências, variação dia a dia e regeneração de relatórios de períodos passados
+METAS_HISTORY_CONFIG = {
+    "enabled": os.getenv("METAS_HISTORY_ENABLED", "true").lower() == "true",
+    "path": os.getenv("METAS_HISTORY_PATH", os.path.join(CACHE_DIR, "metas_history.sqlite3")),
+}
+
+# Partições diárias das listas de unidades novas/inativadas (Power BI), gravadas a cada consulta.
+# Relatórios semanais, mensais e customizados são montados a partir delas, consultando só os dias
+# que faltam. Todo dia encerrado consultado é gravado; na leitura, dias dentro de refresh_days antes de
+# hoje são reconsultados (lançamentos tardios) e partições gravadas há mais de ttl_seconds expiram
+# (correções retroativas na origem).
+UNIDADES_PARTITIONS_CONFIG = {
+    "enabled": os.getenv("UNIDADES_PARTITIONS_ENABLED", "true").lower() == "true",
+    "path": os.getenv("UNIDADES_PARTITIONS_PATH", os.path.join(CACHE_DIR, "unidades_partitions.sqlite3")),
+    "refresh_days": int(os.getenv("UNIDADES_PARTITIONS_REFRESH_DAYS", "3")),
+    "ttl_seconds": int(os.getenv("UNIDADES_PARTITIONS_TTL_SECONDS", str(7 * 86400))),
+}
+
+# Espelho local das dimensões do Nexus (participantes, unidades), sincronizado por delta de updated_at.
+# Dentro de sync_interval_seconds as leituras vêm só do disco; a cada full_sync_seconds
+# a tabela é recarregada inteira (captura exclusões).
+NEXUS_MIRROR_CONFIG = {
+    "enabled": os.getenv("NEXUS_MIRROR_ENABLED", "true").lower() == "true",
+    "path": os.getenv("NEXUS_MIRROR_PATH", os.path.join(CACHE_DIR, "nexus_mirror.sqlite3")),
+    "sync_interval_seconds": int(os.getenv("NEXUS_MIRROR_SYNC_INTERVAL_SECONDS", "300")),
+    "full_sync_seconds": int(os.getenv("NEXUS_MIRROR_FULL_SYNC_SECONDS", "86400")),
+}
 
 # Configurações de Email
 EMAIL_CONFIG = {
@@ -291,29 +291,16 @@ async def export_metas_excel(
                 ("data_emissao", f"lte.{data_fim}"),
             ]
 
-        # Busca paginada do Supabase
-        all_rows = []
-        offset = 0
-        limit = 1000
-
-        while True:
-            # Monta params como lista de tuplas preservando os filtros de data repetidos.
-            # prefer_count_none=True evita o COUNT(*) auxiliar do PostgREST em cada página,
-            # reduzindo o tempo de resposta em loops de paginação grandes.
-            p: list[tuple] = [
-                ("select", ",".join(COL_MAP.keys())),
-                ("order", "descricao.asc,razao_social.asc"),
-                ("offset", offset),
-                ("limit", limit),
-                *filtros_data,
-            ]
-            chunk = svc._get("nexus_contas_receber", p, prefer_count_none=True)
-            if not chunk:
-                break
-            all_rows.extend(chunk)
-            if len(chunk) < limit:
-                break
-            offset += limit
+        # Busca paginada do Supabase, com as páginas lidas em paralelo.
+        # codigo no fim da ordenação garante páginas disjuntas entre as requisições simultâneas.
+        all_rows = (
+            svc.fetch_table_parallel(
+                "nexus_contas_receber",
+                [("select", ",".join(COL_MAP.keys())), *filtros_data],
+                order="descricao.asc,razao_social.asc,codigo.asc",
+            )
+            or []
+        )
 
         if not all_rows:
             detalhe = f"{mes_nome}/{ano_ref}" if mes else "histórico completo"
@@ -0,0 +1,82 @@
+"""
+Rastreamento do último refresh concluído de cada dataset do Power BI.
+
+O horário do último refresh bem-sucedido funciona como "versão" dos dados:
+resultados DAX gravados com a mesma versão continuam válidos enquanto o dataset
+não for atualizado. A consulta ao histórico de refreshes é memorizada por alguns
+minutos no processo e no cache em disco, para que scripts de vida curta (n8n, MCP)
+não paguem uma chamada extra a cada execução.
+"""
+
+import threading
+import time
+from typing import Callable
+
+from src.core.utils.dax_cache import DAXCache
+from src.core.utils.logger import get_logger
+from src.core.utils.single_flight import SingleFlight
+
+logger = get_logger("dataset_refresh")
+
+# loader(workspace_id, dataset_id) -> endTime ISO do último refresh concluído, ou None
+RefreshLoader = Callable[[str, str], str | None]
+
+
+class DatasetRefreshTracker:
+    """
+    Memoriza o último refresh concluído por (workspace, dataset) durante check_interval segundos.
+
+    O loader é fornecido a cada chamada (normalmente PowerBIClient.get_last_refresh_time),
+    o que permite substituí-lo por um stand-in local da API de refreshes em testes.
+    Falhas do loader também são memorizadas (como None) para não repetir a chamada a cada query.
+    """
+
+    def __init__(self, check_interval: int = 120, shared_cache: DAXCache | None = None):
+        self._interval = check_interval
+        self._shared = shared_cache
+        self._lock = threading.Lock()
+        self._known: dict[tuple[str, str], tuple[str | None, float]] = {}
+        self._flights = SingleFlight("dataset_refresh")
+
+    @staticmethod
+    def _shared_key(workspace_id: str, dataset_id: str) -> str:
+        return f"refresh:{workspace_id}:{dataset_id}"
+
+    def last_refresh(self, workspace_id: str, dataset_id: str, loader: RefreshLoader) -> str | None:
+        """Retorna o endTime do último refresh concluído (memorizado) ou None se desconhecido."""
+        key = (workspace_id, dataset_id)
+        with self._lock:
+            known = self._known.get(key)
+        if known is not None and time.time() - known[1] < self._interval:
+            return known[0]
+
+        # Outro processo pode ter consultado a API há pouco
+        if self._shared is not None:
+            shared = self._shared.get(self._shared_key(*key))
+            if shared:
+                with self._lock:
+                    self._known[key] = (shared[0], time.time())
+                return shared[0]
+
+        value, _ = self._flights.do(key, self._load, key, loader)
+        return value
+
+    def _load(self, key: tuple[str, str], loader: RefreshLoader) -> str | None:
+        try:
+            value = loader(*key)
+        except Exception as e:
+            logger.warning(f"Falha ao consultar último refresh do dataset {key[1]}: {e}")
+            value = None
+
+        with self._lock:
+            self._known[key] = (value, time.time())
+        if self._shared is not None and value is not None:
+            self._shared.set(self._shared_key(*key), [value], ttl_seconds=self._interval)
+        return value
+
+    def invalidate(self, workspace_id: str, dataset_id: str) -> None:
+        """Esquece o valor memorizado (ex: logo após disparar um refresh)."""
+        with self._lock:
+            self._known.pop((workspace_id, dataset_id), None)
+        if self._shared is not None:
+            self._shared.delete(self._shared_key(workspace_id, dataset_id))
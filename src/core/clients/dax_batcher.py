@@ -0,0 +1,92 @@
+"""
+Micro-batching de consultas DAX escalares.
+
+Consultas submetidas dentro de uma janela curta (alguns milissegundos) são
+entregues juntas a uma função de execução em lote — normalmente
+PowerBIClient._execute_batch, que funde as consultas ROW do mesmo contexto de
+filtro em um único executeQueries. Cada chamador recebe um Future com o seu
+próprio resultado.
+"""
+
+import contextvars
+import threading
+from concurrent.futures import Future
+from typing import Callable
+
+from src.core.utils.logger import get_logger
+
+logger = get_logger("dax_batcher")
+
+
+class DaxBatcher:
+    """Agrupa submissões concorrentes por janela de tempo ou até max_queries consultas."""
+
+    def __init__(
+        self,
+        execute_batch: Callable[[list[str]], list],
+        window_seconds: float = 0.02,
+        max_queries: int = 20,
+    ):
+        self._execute_batch = execute_batch
+        self._window = window_seconds
+        self._max = max(1, max_queries)
+        self._lock = threading.Lock()
+        self._pending: list[tuple[str, Future]] = []
+        self._timer: threading.Timer | None = None
+        self._stats = {"batches": 0, "queries": 0}
+
+    def submit(self, query: str) -> Future:
+        """Enfileira a consulta; o Future recebe as linhas (ou None em caso de erro)."""
+        future: Future = Future()
+        batch = None
+        with self._lock:
+            self._pending.append((query, future))
+            if len(self._pending) >= self._max:
+                batch = self._take_locked()
+            elif self._timer is None:
+                # O lote roda no contexto (prioridade) de quem abriu a janela
+                ctx = contextvars.copy_context()
+                self._timer = threading.Timer(self._window, ctx.run, args=(self._flush,))
+                self._timer.daemon = True
+                self._timer.start()
+
+        if batch:
+            self._run(batch)
+        return future
+
+    def _take_locked(self) -> list[tuple[str, Future]]:
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush(self) -> None:
+        with self._lock:
+            batch = self._take_locked()
+        if batch:
+            self._run(batch)
+
+    def _run(self, batch: list[tuple[str, Future]]) -> None:
+        # Consultas idênticas no mesmo lote são executadas uma vez
+        queries = list(dict.fromkeys(query for query, _ in batch))
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["queries"] += len(batch)
+
+        try:
+            results = dict(zip(queries, self._execute_batch(queries)))
+        except Exception as e:
+            logger.error(f"Falha ao executar lote DAX ({len(queries)} consultas): {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for query, future in batch:
+            rows = results.get(query)
+            # Cada chamador recebe sua própria cópia das linhas
+            future.set_result([dict(row) for row in rows] if rows is not None else None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
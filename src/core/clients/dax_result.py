@@ -0,0 +1,141 @@
+"""
+Representação colunar de resultados DAX.
+
+A API executeQueries devolve uma lista de dicts com chaves como
+"[FatoUnidades].[Nome]" ou "[NovasUnidades]". DaxResult converte essa lista uma
+única vez em arrays por coluna: os nomes são normalizados uma vez por resultado
+(não por linha) e conversões de tipo são aplicadas coluna a coluna no parse.
+Para o código existente, continua se comportando como uma sequência de dicts
+(com chaves já normalizadas), montados sob demanda.
+"""
+
+import re
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from datetime import datetime
+from typing import Any
+
+_COLUMN_PREFIX = re.compile(r".*\[|\]")
+
+# Datas ISO devolvidas pelo Power BI (ex: "2025-03-01T00:00:00")
+_ISO_DATETIME = re.compile(r"^\d{4}-\d{2}-\d{2}(?:T\d{2}:\d{2}:\d{2}(?:\.\d+)?)?$")
+
+
+def normalize_column(name: str) -> str:
+    """
+    Remove prefixo de tabela e colchetes do nome de uma coluna do Power BI.
+    Ex: "[FatoUnidades].[Nome]" → "Nome" | "[NovasUnidades]" → "NovasUnidades"
+    """
+    return _COLUMN_PREFIX.sub("", name).strip()
+
+
+def _parse_datetimes(values: list) -> list:
+    """Converte a coluna para datetime se todos os valores não nulos forem datas ISO."""
+    present = [v for v in values if v is not None]
+    if not present or not all(isinstance(v, str) and _ISO_DATETIME.match(v) for v in present):
+        return values
+    return [datetime.fromisoformat(v) if v is not None else None for v in values]
+
+
+class DaxResult(Sequence):
+    """
+    Resultado DAX em colunas: columns (nomes normalizados) e data[coluna] -> lista de valores.
+
+    Indexar ou iterar devolve dicts por linha (montados sob demanda), o que mantém
+    compatibilidade com quem consome list[dict] normalizado.
+    """
+
+    __slots__ = ("columns", "raw_columns", "data", "_length")
+
+    def __init__(self, columns: list[str], data: dict[str, list], raw_columns: list[str] | None = None):
+        self.columns = columns
+        self.raw_columns = raw_columns or list(columns)
+        self.data = data
+        self._length = len(data[columns[0]]) if columns else 0
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Iterable[dict],
+        converters: dict[str, Callable[[Any], Any]] | None = None,
+        parse_dates: bool = False,
+    ) -> "DaxResult":
+        """
+        Monta o resultado a partir das linhas da API (uma passada por linha, sem regex por chave).
+        rows pode ser um gerador (ex: PowerBIClient.iter_dax_windows): as linhas não são retidas.
+
+        converters: função por coluna (nome normalizado) aplicada a cada valor não nulo.
+        parse_dates: colunas inteiramente compostas de datas ISO viram datetime.
+        Colunas cujo nome normalizado colide com outra mantêm o nome original.
+        """
+        raw_columns: list[str] = []
+        index: dict[str, int] = {}
+        arrays: list[list] = []
+
+        for i, row in enumerate(rows):
+            for key in row:
+                if key not in index:
+                    # Coluna nova (normalmente só na primeira linha): preenche as linhas anteriores
+                    index[key] = len(raw_columns)
+                    raw_columns.append(key)
+                    arrays.append([None] * i)
+            for key, pos in index.items():
+                arrays[pos].append(row.get(key))
+
+        columns: list[str] = []
+        seen: set[str] = set()
+        for raw in raw_columns:
+            name = normalize_column(raw)
+            if name in seen or not name:
+                name = raw
+            seen.add(name)
+            columns.append(name)
+
+        data = dict(zip(columns, arrays))
+        if parse_dates:
+            for name in columns:
+                data[name] = _parse_datetimes(data[name])
+        for name, convert in (converters or {}).items():
+            if name in data:
+                data[name] = [convert(v) if v is not None else None for v in data[name]]
+
+        return cls(columns, data, raw_columns)
+
+    # ── Visão por linhas (compatibilidade) ─────────────────────────────────
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._row(j) for j in range(*i.indices(self._length))]
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError("DaxResult index out of range")
+        return self._row(i)
+
+    def __iter__(self) -> Iterator[dict]:
+        arrays = [self.data[c] for c in self.columns]
+        for values in zip(*arrays):
+            yield dict(zip(self.columns, values))
+
+    def _row(self, i: int) -> dict:
+        return {c: self.data[c][i] for c in self.columns}
+
+    def __repr__(self) -> str:
+        return f"DaxResult({self._length} linhas, colunas={self.columns})"
+
+    # ── Acesso colunar ──────────────────────────────────────────────────────
+
+    def column(self, name: str, default: Any = None) -> list:
+        """Valores de uma coluna (nome normalizado); coluna ausente vira [default] * len."""
+        values = self.data.get(name)
+        return values if values is not None else [default] * self._length
+
+    def first(self) -> dict:
+        """Primeira linha (ex: resultados de ROW com medidas) ou {} se vazio."""
+        return self._row(0) if self._length else {}
+
+    def to_rows(self) -> list[dict]:
+        """Materializa todas as linhas como dicts normalizados."""
+        return list(self)
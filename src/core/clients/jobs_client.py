@@ -3,6 +3,7 @@ import requests.adapters
 from urllib3.util.retry import Retry
 
 from src.config import NEXUS_CONFIG
+from src.core.clients.nexus_paginator import NexusPaginator
 from src.core.utils.logger import get_logger
 
 logger = get_logger("jobs_client")
@@ -19,16 +20,16 @@ class JobsClient:
         self.session.mount("http://", requests.adapters.HTTPAdapter(max_retries=retries))
         self.session.mount("https://", requests.adapters.HTTPAdapter(max_retries=retries))
 
+        self.paginator = NexusPaginator(
+            self.session, self.headers, page_size=500, window=NEXUS_CONFIG["prefetch_pages"], timeout=60
+        )
+
     def fetch_all_jobs(self):
         """Fetches all jobs from the Data Lake."""
         return self.fetch_all("/jobs/")
 
-    def fetch_all(self, endpoint):
-        """Generic fetch all with pagination."""
-        all_items = []
-        page = 1
-        limit = 500
-
+    def iter_pages(self, endpoint):
+        """Streams pages of an endpoint, keeping NEXUS_CONFIG['prefetch_pages'] requests in flight."""
         # Ensure endpoint starts with slash but base url doesn't have double slash issues
         # api_url usually doesn't have trailing slash.
         if not endpoint.startswith("/"):
@@ -37,38 +38,13 @@ class JobsClient:
         url = f"{self.api_url}{endpoint}"
 
         logger.info(f"Fetching data from: {url}")
+        return self.paginator.pages(url)
 
-        while True:
-            try:
-                params = {"page": page, "limit": limit}
-
-                # Para POST endpoints que se comportam como GET (alguns casos legados ou específicos)
-                # Mas por padrao vamos de GET. Se precisar de POST, o metodo deve receber argumento.
-                resp = self.session.get(url, headers=self.headers, params=params, timeout=60)
-
-                if resp.status_code != 200:
-                    logger.error(f"Failed to fetch page {page}: {resp.status_code} - {resp.text[:100]}")
-                    break
-
-                data = resp.json()
-                items = []
-                if isinstance(data, list):
-                    items = data
-                elif isinstance(data, dict):
-                    items = data.get("results") or data.get("data") or []
-
-                if not items:
-                    break
-
-                all_items.extend(items)
-                logger.info(f"Page {page}: Fetched {len(items)} items. Total so far: {len(all_items)}")
-
-                if len(items) < limit:
-                    break
-
-                page += 1
-            except Exception as e:
-                logger.error(f"Error fetching page {page}: {e}")
-                break
+    def fetch_all(self, endpoint):
+        """Generic fetch all with pagination."""
+        all_items = []
+        for page, items in enumerate(self.iter_pages(endpoint), start=1):
+            all_items.extend(items)
+            logger.info(f"Page {page}: Fetched {len(items)} items. Total so far: {len(all_items)}")
 
         return all_items
@@ -0,0 +1,96 @@
+"""
+Paginação com prefetch para as APIs do Nexus (Data Lake e Unidades).
+
+As APIs do Nexus paginam por ?page=N&limit=M e não informam o total de páginas.
+Em vez de esperar cada página para pedir a seguinte, o paginador mantém uma janela
+de até `window` páginas em voo: ao entregar a página N, já pede a N+window. As
+páginas são entregues em ordem, e a iteração termina na primeira página vazia ou
+incompleta (as requisições ainda pendentes além dela são descartadas).
+"""
+
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+
+from src.core.utils.logger import get_logger
+
+logger = get_logger("nexus_paginator")
+
+
+class NexusPageError(Exception):
+    """Página respondeu com status diferente de 200 ou em formato desconhecido."""
+
+
+def extract_items(data) -> list:
+    """Itens de uma página: lista direta ou envelopada em 'data'/'results'."""
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        return data.get("data") or data.get("results") or []
+    raise NexusPageError(f"Formato de resposta desconhecido: {type(data)}")
+
+
+class NexusPaginator:
+    """
+    Busca páginas de um endpoint do Nexus com até `window` requisições simultâneas.
+
+    A sessão (com retry e pool de conexões) é a do cliente que cria o paginador;
+    `window` deve ficar dentro do pool do HTTPAdapter (10 conexões por padrão).
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        headers: dict,
+        page_size: int = 500,
+        window: int = 4,
+        timeout: int = 30,
+    ):
+        self.session = session
+        self.headers = headers
+        self.page_size = page_size
+        self.window = max(1, window)
+        self.timeout = timeout
+
+    def _fetch(self, url: str, page: int) -> list:
+        params = {"page": page, "limit": self.page_size}
+        resp = self.session.get(url, headers=self.headers, params=params, timeout=self.timeout)
+        if resp.status_code != 200:
+            raise NexusPageError(f"{resp.status_code} - {resp.text[:100]}")
+        return extract_items(resp.json())
+
+    def pages(self, url: str) -> Iterator[list]:
+        """
+        Gera as páginas em ordem. Erros interrompem a iteração (logados), mantendo as
+        páginas já entregues — mesmo comportamento da paginação sequencial anterior.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.window, thread_name_prefix="nexus-page")
+        in_flight: deque[tuple[int, Future]] = deque()
+        next_page = 1
+        try:
+            for _ in range(self.window):
+                in_flight.append((next_page, executor.submit(self._fetch, url, next_page)))
+                next_page += 1
+
+            while in_flight:
+                page, future = in_flight.popleft()
+                try:
+                    items = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to fetch page {page} of {url}: {e}")
+                    return
+
+                if not items:
+                    return
+                yield items
+                if len(items) < self.page_size:
+                    # Última página
+                    return
+
+                in_flight.append((next_page, executor.submit(self._fetch, url, next_page)))
+                next_page += 1
+        finally:
+            # Páginas além da última (ou após um erro/parada do consumidor) são descartadas
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,388 @@
+"""
+Broker de tokens Azure AD para o Power BI.
+
+Um único token por (tenant, client_id, scope) é compartilhado por todos os
+PowerBIClient do processo (metas, INA, unidades, jobs, MCP). Após a primeira
+autenticação, uma thread daemon renova o token bem antes da expiração, de modo
+que nenhuma chamada DAX precise esperar pelo endpoint de token.
+
+Entre processos, o token é distribuído por "stores": um arquivo JSON local
+(gravado a cada autenticação) e o setting pbi_access_token do Supabase (gravado
+pelos jobs). Scripts de vida curta (n8n, MCP) reaproveitam um token ainda válido
+em vez de refazer o OAuth a cada execução.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.config import POWERBI_TOKEN_CONFIG
+from src.core.utils.logger import get_logger
+
+logger = get_logger("powerbi_auth")
+
+POWERBI_SCOPE = "https://analysis.windows.net/powerbi/api/.default"
+
+# Buffer para não usar um token prestes a expirar
+_EXPIRY_BUFFER_SECONDS = 60
+# Renovação proativa: quando faltar o maior entre 10 minutos e 25% da vida útil do token
+# (nunca antes da metade da vida útil, para tokens curtos)
+_REFRESH_MARGIN_SECONDS = 600
+_REFRESH_MARGIN_RATIO = 0.25
+# Espera entre tentativas quando a renovação em background falha
+_RETRY_DELAY_SECONDS = 30
+
+
+# ── Stores de token entre processos ─────────────────────────────────────────
+#
+# Registros no formato já usado pelos jobs no Supabase:
+# {"token", "expires_at" (timestamp até o qual o token pode ser usado), "updated_at",
+#  "tenant", "client_id", "scope"}.
+
+
+class FileTokenStore:
+    """Arquivo JSON local com um registro por (tenant, client_id, scope)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @staticmethod
+    def _slot(key: tuple[str, str, str]) -> str:
+        return "|".join(key)
+
+    def _read_all(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.debug(f"Store de token ilegível ({self.path}): {e}")
+            return {}
+
+    def load(self, key: tuple[str, str, str]) -> dict | None:
+        return self._read_all().get(self._slot(key))
+
+    def save(self, key: tuple[str, str, str], record: dict) -> None:
+        # Gravação atômica (arquivo temporário + rename), legível apenas pelo dono
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            data = self._read_all()
+            data[self._slot(key)] = record
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".pbi_token.")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.chmod(tmp_path, 0o600)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"Falha ao gravar store de token ({self.path}): {e}")
+
+
+class SupabaseTokenStore:
+    """
+    Setting pbi_access_token do Supabase (somente leitura).
+    A gravação continua a cargo de job_refresh_pbi_token e job_refresh_dashboards.
+    """
+
+    SETTING_KEY = "pbi_access_token"
+
+    def load(self, key: tuple[str, str, str]) -> dict | None:
+        from src.core.services.supabase_service import SupabaseService  # importação local: dependência opcional
+
+        service = SupabaseService()
+        if not getattr(service, "headers", None):
+            return None  # Supabase não configurado neste ambiente
+
+        # Leitura direta, sem o retry/backoff de get_setting: se o Supabase estiver lento,
+        # é mais barato autenticar no Azure AD
+        try:
+            response = requests.get(
+                f"{service.url}/rest/v1/system_settings",
+                headers=service.headers,
+                params={"key": f"eq.{self.SETTING_KEY}", "select": "value"},
+                timeout=5,
+            )
+            response.raise_for_status()
+            rows = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.debug(f"Setting {self.SETTING_KEY} indisponível: {e}")
+            return None
+
+        record = rows[0].get("value") if rows else None
+        if not isinstance(record, dict):
+            return None
+
+        # Registros antigos não trazem tenant/client_id; quando presentes, precisam bater
+        tenant, client_id, scope = key
+        if record.get("tenant", tenant) != tenant or record.get("client_id", client_id) != client_id:
+            return None
+        if record.get("scope", scope) != scope:
+            return None
+        return record
+
+    def save(self, key: tuple[str, str, str], record: dict) -> None:
+        pass
+
+
+def default_token_stores() -> list:
+    """Stores configurados em POWERBI_TOKEN_CONFIG, na ordem de consulta (mais barato primeiro)."""
+    stores: list = []
+    if POWERBI_TOKEN_CONFIG["store_path"]:
+        stores.append(FileTokenStore(POWERBI_TOKEN_CONFIG["store_path"]))
+    if POWERBI_TOKEN_CONFIG["use_supabase"]:
+        stores.append(SupabaseTokenStore())
+    return stores
+
+
+class TokenBroker:
+    """Token OAuth (client credentials) compartilhado, com renovação proativa em background."""
+
+    def __init__(
+        self,
+        tenant: str,
+        client_id: str,
+        client_secret: str,
+        scope: str = POWERBI_SCOPE,
+        stores: list | None = None,
+        min_ttl_seconds: int | None = None,
+    ):
+        self.tenant = tenant
+        self.client_id = client_id
+        self._client_secret = client_secret
+        self.scope = scope
+        self._stores = stores if stores is not None else []
+        self._min_ttl = min_ttl_seconds if min_ttl_seconds is not None else POWERBI_TOKEN_CONFIG["min_ttl_seconds"]
+
+        # _lock protege só o estado (leituras e a troca do token); o I/O de renovação
+        # (stores e Azure AD) roda fora dele, serializado por _refreshing
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        self._generation = 0  # Incrementado a cada troca de token
+        self._token: str | None = None
+        self._expires_at = 0.0  # Expiração real informada pelo Azure AD
+        self._lifetime = 0.0
+        self._auth_count = 0
+        self._adopted = 0
+        self._failures = 0
+        self._refresher: threading.Thread | None = None
+
+        self._session = requests.Session()
+        retries = Retry(total=3, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
+        adapter = HTTPAdapter(max_retries=retries)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    # ── Estado ──────────────────────────────────────────────────────────────
+
+    @property
+    def token(self) -> str | None:
+        """Token atual, sem disparar autenticação (None se ausente ou expirado)."""
+        with self._lock:
+            return self._token if self._is_valid() else None
+
+    @property
+    def token_expiry(self) -> float:
+        """Timestamp a partir do qual o token não deve mais ser usado."""
+        with self._lock:
+            return self._expires_at - _EXPIRY_BUFFER_SECONDS if self._token else 0
+
+    def current(self) -> tuple[str | None, float]:
+        """(token, token_expiry) lidos juntos, para quem persiste o par; (None, 0) sem token válido."""
+        with self._lock:
+            if not self._is_valid():
+                return None, 0
+            return self._token, self._expires_at - _EXPIRY_BUFFER_SECONDS
+
+    def _is_valid(self) -> bool:
+        return bool(self._token) and time.time() < self._expires_at - _EXPIRY_BUFFER_SECONDS
+
+    @property
+    def _key(self) -> tuple[str, str, str]:
+        return (self.tenant, self.client_id, self.scope)
+
+    # ── Autenticação ────────────────────────────────────────────────────────
+
+    def get_token(self, force: bool = False) -> str | None:
+        """
+        Retorna um token válido, autenticando no Azure AD apenas se necessário.
+        Antes do Azure AD, tenta um token ainda válido persistido por outro processo.
+        force=True ignora o token atual e os persistidos (ex: após HTTP 401).
+
+        Só uma renovação roda por vez: quem chega durante ela espera e usa o token novo,
+        e chamadas com token válido nunca esperam pela renovação.
+        """
+        with self._lock:
+            if not force and self._is_valid():
+                return self._token
+            generation = self._generation
+
+        with self._refreshing:
+            with self._lock:
+                # Outra thread trocou o token enquanto esperávamos: não renova de novo
+                token = self._token if self._generation != generation and self._is_valid() else None
+            if token is None:
+                if not self._renew(adopt=not force):
+                    return None
+                token = self.token
+
+        self._ensure_refresher()
+        return token
+
+    def _renew(self, adopt: bool = True) -> bool:
+        """Adota um token persistido ou autentica no Azure AD. Chamado com _refreshing adquirido."""
+        return (adopt and self._adopt()) or self._authenticate()
+
+    def _swap(self, token: str, expires_at: float) -> bool:
+        """Troca o token atual se o novo expira depois dele. Retorna se houve troca."""
+        with self._lock:
+            if expires_at <= self._expires_at:
+                return False
+            self._token = token
+            self._expires_at = expires_at
+            self._lifetime = expires_at - time.time()
+            self._generation += 1
+            return True
+
+    def _authenticate(self) -> bool:
+        token_url = f"https://login.microsoftonline.com/{self.tenant}/oauth2/v2.0/token"
+        data = {
+            "grant_type": "client_credentials",
+            "client_id": self.client_id,
+            "client_secret": self._client_secret,
+            "scope": self.scope,
+        }
+
+        try:
+            response = self._session.post(token_url, data=data, timeout=10)
+            response.raise_for_status()
+            token_data = response.json()
+            expires_in = token_data.get("expires_in", 3600)
+            token = token_data.get("access_token")
+        except requests.exceptions.RequestException as e:
+            with self._lock:
+                self._failures += 1
+            logger.error(f"Erro na autenticacao: {e}")
+            return False
+
+        expires_at = time.time() + float(expires_in)
+        with self._lock:
+            self._token = token
+            self._expires_at = expires_at
+            self._lifetime = float(expires_in)
+            self._generation += 1
+            self._auth_count += 1
+            auth_count = self._auth_count
+        logger.info(f"Token OAuth obtido (expira em {expires_in}s, autenticação #{auth_count})")
+
+        record = {
+            "token": token,
+            "expires_at": expires_at - _EXPIRY_BUFFER_SECONDS,
+            "updated_at": datetime.now().isoformat(),
+            "tenant": self.tenant,
+            "client_id": self.client_id,
+            "scope": self.scope,
+        }
+        for store in self._stores:
+            store.save(self._key, record)
+        return True
+
+    def _adopt(self) -> bool:
+        """Adota o token persistido mais novo que o atual, se ainda valer por min_ttl segundos."""
+        for store in self._stores:
+            try:
+                record = store.load(self._key)
+            except Exception as e:
+                logger.debug(f"Falha ao ler store de token {type(store).__name__}: {e}")
+                continue
+            if not record or not record.get("token"):
+                continue
+
+            now = time.time()
+            usable_until = float(record.get("expires_at") or 0)
+            if usable_until - now < self._min_ttl:
+                continue
+            if not self._swap(record["token"], usable_until + _EXPIRY_BUFFER_SECONDS):
+                continue
+
+            with self._lock:
+                self._adopted += 1
+            logger.info(f"Token OAuth reaproveitado de {type(store).__name__} (válido por {int(usable_until - now)}s)")
+            return True
+        return False
+
+    # ── Renovação proativa ──────────────────────────────────────────────────
+
+    def _ensure_refresher(self) -> None:
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._refresher = threading.Thread(
+                target=self._refresh_loop, name=f"pbi-token-{self.client_id[:8]}", daemon=True
+            )
+            self._refresher.start()
+
+    def _seconds_until_refresh(self) -> float:
+        with self._lock:
+            margin = min(max(_REFRESH_MARGIN_SECONDS, self._lifetime * _REFRESH_MARGIN_RATIO), self._lifetime / 2)
+            return self._expires_at - margin - time.time()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            wait = self._seconds_until_refresh()
+            if wait > 0:
+                time.sleep(wait)
+                continue
+
+            # Outra thread (get_token) ou outro processo pode já ter renovado o token
+            with self._refreshing:
+                ok = self._seconds_until_refresh() > 0 or self._renew()
+            if not ok:
+                logger.warning(f"Renovação proativa do token falhou; nova tentativa em {_RETRY_DELAY_SECONDS}s")
+                time.sleep(_RETRY_DELAY_SECONDS)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tenant": self.tenant,
+                "scope": self.scope,
+                "authentications": self._auth_count,
+                "adopted": self._adopted,
+                "failures": self._failures,
+                "expires_in": max(0, round(self._expires_at - time.time())) if self._token else 0,
+            }
+
+
+# Um broker por (tenant, client_id, scope) no processo
+_brokers: dict[tuple[str, str, str], TokenBroker] = {}
+_brokers_lock = threading.Lock()
+
+
+def get_token_broker(tenant: str, client_id: str, client_secret: str, scope: str = POWERBI_SCOPE) -> TokenBroker:
+    """Retorna o broker compartilhado para o tenant/app/scope, criando-o na primeira chamada."""
+    key = (tenant, client_id, scope)
+    with _brokers_lock:
+        broker = _brokers.get(key)
+        if broker is None:
+            broker = TokenBroker(tenant, client_id, client_secret, scope, stores=default_token_stores())
+            _brokers[key] = broker
+        return broker
+
+
+def get_broker_stats() -> list[dict]:
+    """Contadores de autenticação de todos os brokers do processo."""
+    with _brokers_lock:
+        brokers = list(_brokers.values())
+    return [b.stats() for b in brokers]
@@ -4,60 +4,99 @@ Funciona com licença Premium Per User (PPU).
 Gerencia autenticação Azure AD e execução de queries.
 """
 
+import contextvars
 import hashlib
 import os
+import re
 import threading
 import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, timedelta
 
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from src.config import DAX_BATCH_CONFIG, DAX_CACHE_CONFIG, POWERBI_GOVERNOR_CONFIG
+from src.core.clients.dataset_refresh import DatasetRefreshTracker
+from src.core.clients.dax_batcher import DaxBatcher
+from src.core.clients.dax_result import DaxResult
+from src.core.clients.powerbi_auth import get_broker_stats, get_token_broker
+from src.core.clients.query_budget import PRIORITY_RANK, current_priority, get_query_budget
+from src.core.clients.query_governor import get_governor_stats, get_query_governor, parse_retry_after
+from src.core.utils.dax_cache import CacheEntry, DAXCache
+from src.core.utils.dax_parser import ScalarQuery, build_scalar_query, canonicalize, parse_scalar_query
 from src.core.utils.logger import get_logger
+from src.core.utils.single_flight import SingleFlight
 
 logger = get_logger("powerbi_client")
 
 
-class _DAXCache:
-    """
-    Cache em memória thread-safe com TTL para resultados de queries DAX.
-
-    Compartilhado entre todas as instâncias de PowerBIClient no processo.
-    Evita requisições repetidas ao Power BI quando a mesma query é executada
-    múltiplas vezes dentro da janela de validade (padrão: 30 minutos).
-    """
-
-    def __init__(self, ttl_seconds: int = 1800):
-        self._store: dict[str, tuple[list, float]] = {}
-        self._lock = threading.Lock()
-        self._ttl = ttl_seconds
-
-    def get(self, key: str) -> list | None:
-        with self._lock:
-            entry = self._store.get(key)
-            if entry is None:
-                return None
-            result, expires_at = entry
-            if time.time() > expires_at:
-                del self._store[key]
-                return None
-            return result
-
-    def set(self, key: str, value: list) -> None:
-        with self._lock:
-            self._store[key] = (value, time.time() + self._ttl)
-
-    def clear(self) -> None:
-        with self._lock:
-            self._store.clear()
-
-
-# Instância única compartilhada por todas as chamadas DAX do processo (30 min TTL)
-_dax_cache = _DAXCache(ttl_seconds=1800)
+# Instância única compartilhada por todas as chamadas DAX — persistida em disco (SQLite),
+# sobrevive a restarts e é compartilhada entre API, scheduler, MCP e scripts (30 min TTL)
+_dax_cache = DAXCache(
+    path=DAX_CACHE_CONFIG["path"],
+    ttl_seconds=DAX_CACHE_CONFIG["ttl_seconds"],
+    max_bytes=DAX_CACHE_CONFIG["max_bytes"],
+)
+
+# Registro de queries DAX em andamento: chamadas idênticas e simultâneas (mesmo
+# workspace, dataset e query) aguardam a primeira requisição em vez de repeti-la
+_dax_flights = SingleFlight("dax")
+
+# Último refresh concluído de cada dataset (versão dos dados usada para validar o cache)
+_refresh_tracker = DatasetRefreshTracker(
+    check_interval=DAX_CACHE_CONFIG["refresh_check_seconds"],
+    shared_cache=_dax_cache,
+)
+
+# Funções DAX dependentes do relógio: o resultado muda sem que o dataset seja atualizado
+_VOLATILE_DAX = re.compile(r"\b(?:TODAY|NOW|UTCNOW|UTCTODAY)\s*\(", re.IGNORECASE)
+
+# Limites do executeQueries por query: resultados que os atingem vêm truncados
+_MAX_RESULT_ROWS = 100_000
+_MAX_RESULT_VALUES = 1_000_000
+
+# Stale-while-revalidate: chaves com atualização em background em andamento
+_revalidating: set[tuple] = set()
+_revalidating_lock = threading.Lock()
+_swr_stats = {"stale_served": 0, "revalidations": 0}
+
+# Lotes de consultas escalares fundidas em um único executeQueries
+_batch_stats = {"merged_requests": 0, "merged_queries": 0, "fallbacks": 0}
+_batch_stats_lock = threading.Lock()
+
+# Cache por medida: valores servidos do cache vs. buscados no Power BI
+_measure_stats = {"hits": 0, "misses": 0, "served_from_cache": 0}
+
+
+def get_dax_stats() -> dict:
+    """Contadores de diagnóstico do cache DAX e da coalescência de requisições."""
+    with _revalidating_lock:
+        swr = dict(_swr_stats)
+    return {
+        "cache": _dax_cache.stats(),
+        "requests": _dax_flights.stats(),
+        "swr": swr,
+        "auth": get_broker_stats(),
+        "admission": get_governor_stats(),
+        "budget": get_query_budget().stats(),
+        "batching": dict(_batch_stats),
+        "measures": dict(_measure_stats),
+    }
 
 
 class PowerBIClient:
-    def __init__(self, workspace_id=None, dataset_id=None):
+    def __init__(
+        self,
+        workspace_id=None,
+        dataset_id=None,
+        stale_while_revalidate: bool | None = None,
+        refresh_tracker: DatasetRefreshTracker | None = None,
+        auto_batch: bool | None = None,
+    ):
         self.tenant = os.environ.get("SHAREPOINT_TENANT")
         self.client_id = os.environ.get("SHAREPOINT_CLIENT_ID")
         self.client_secret = os.environ.get("SHAREPOINT_CLIENT_SECRET")
@@ -73,8 +112,41 @@ class PowerBIClient:
                 "(SHAREPOINT_TENANT, SHAREPOINT_CLIENT_ID, SHAREPOINT_CLIENT_SECRET)."
             )
 
-        self.token = None
-        self.token_expiry = 0  # Timestamp de expiração do token OAuth
+        # Token OAuth compartilhado por todos os clientes do mesmo tenant/app no processo
+        self._broker = get_token_broker(self.tenant, self.client_id, self.client_secret)
+        # Controle de admissão (concorrência AIMD + limite por minuto) compartilhado pelo tenant
+        self.governor = get_query_governor(self.tenant)
+
+        # Stale-while-revalidate: argumento explícito ou opt-in do dataset via DAX_SWR_DATASETS
+        if stale_while_revalidate is None:
+            swr_datasets = DAX_CACHE_CONFIG["swr_datasets"]
+            stale_while_revalidate = "*" in swr_datasets or self.dataset_id in swr_datasets
+        self.stale_while_revalidate = stale_while_revalidate
+        # Idade máxima de um resultado "fresco" e tempo de vida da entrada no cache
+        if stale_while_revalidate:
+            self._fresh_ttl = DAX_CACHE_CONFIG["swr_soft_ttl_seconds"]
+            self._store_ttl = max(DAX_CACHE_CONFIG["swr_hard_ttl_seconds"], self._fresh_ttl)
+        else:
+            self._fresh_ttl = DAX_CACHE_CONFIG["ttl_seconds"]
+            self._store_ttl = DAX_CACHE_CONFIG["ttl_seconds"]
+
+        # Micro-batching: consultas ROW concorrentes do mesmo contexto de filtro viram um executeQueries
+        if auto_batch is None:
+            auto_batch = DAX_BATCH_CONFIG["enabled"]
+        self._batcher = (
+            DaxBatcher(
+                self._execute_batch,
+                window_seconds=DAX_BATCH_CONFIG["window_ms"] / 1000,
+                max_queries=DAX_BATCH_CONFIG["max_queries"],
+            )
+            if auto_batch
+            else None
+        )
+
+        # Invalidação por refresh do dataset (tracker injetável para testes)
+        self.refresh_tracker = refresh_tracker or _refresh_tracker
+        self.refresh_aware = DAX_CACHE_CONFIG["refresh_aware"]
+        self.measure_cache = DAX_CACHE_CONFIG["measure_cache"]
 
         # Configure Autoscaling Retry
         self.session = requests.Session()
@@ -83,60 +155,377 @@ class PowerBIClient:
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
 
+    @property
+    def token(self) -> str | None:
+        """Token OAuth atual do broker compartilhado (None se ausente ou expirado)."""
+        return self._broker.token
+
+    @property
+    def token_expiry(self) -> float:
+        """Timestamp de expiração do token OAuth (já descontado o buffer de segurança)."""
+        return self._broker.token_expiry
+
     def authenticate(self) -> bool:
         """
         Autentica no Azure AD usando credenciais de Service Principal.
-        Obtém e armazena o token de acesso (Bearer Token).
+        O token é obtido pelo broker do processo, que o compartilha com os demais
+        clientes e o renova em background antes de expirar.
         """
-        token_url = f"https://login.microsoftonline.com/{self.tenant}/oauth2/v2.0/token"
+        return self._broker.get_token() is not None
 
-        data = {
-            "grant_type": "client_credentials",
-            "client_id": self.client_id,
-            "client_secret": self.client_secret,
-            "scope": "https://analysis.windows.net/powerbi/api/.default",
-        }
-
-        try:
-            response = self.session.post(token_url, data=data, timeout=10)
-            response.raise_for_status()
-            token_data = response.json()
-            self.token = token_data.get("access_token")
-            # Buffer de 60s para evitar uso de token prestes a expirar
-            expires_in = token_data.get("expires_in", 3600)
-            self.token_expiry = time.time() + expires_in - 60
-            logger.info(f"Token OAuth obtido (expira em {expires_in}s)")
-            return True
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Erro na autenticacao: {e}")
-            return False
+    def refresh_token(self) -> tuple[str, float] | None:
+        """
+        Força um token novo no Azure AD, ignorando o atual e os persistidos por outros processos
+        (jobs que distribuem o token). Retorna (token, token_expiry) ou None se a autenticação falhar.
+        """
+        if self._broker.get_token(force=True) is None:
+            return None
+        token, expires_at = self._broker.current()
+        return (token, expires_at) if token else None
 
     def execute_dax(self, query: str) -> list | None:
         """
         Executa uma consulta DAX no dataset configurado.
         Retorna uma lista de linhas (dicionários) ou lista vazia em caso de erro.
 
-        Resultado é cacheado por 30 minutos para evitar requisições duplicadas
-        ao Power BI quando a mesma query é chamada várias vezes no mesmo ciclo.
+        Resultados são cacheados em disco por (workspace, dataset) e marcados com o
+        horário do último refresh concluído do dataset: continuam válidos até o próximo
+        refresh (limitado a refresh_max_age). Se o histórico de refreshes não estiver
+        disponível, ou a query usar TODAY()/NOW(), vale o TTL de relógio (30 minutos).
+        O cache é compartilhado com outros processos e sobrevive a restarts do scheduler.
+
+        Com stale_while_revalidate, um resultado vencido ainda dentro do hard TTL é
+        devolvido na hora e atualizado em background.
+
+        Com auto_batch, consultas escalares (EVALUATE ROW / CALCULATETABLE(ROW(...)))
+        disparadas ao mesmo tempo são fundidas em uma única requisição.
+
+        Com measure_cache, cada coluna de uma consulta escalar também é cacheada por
+        (dataset, expressão, filtros): uma consulta nova com medidas já conhecidas é
+        reescrita para buscar só as que faltam, e o resultado é montado de volta.
         """
         # Verifica cache antes de qualquer requisição HTTP
-        cache_key = hashlib.md5(query.encode("utf-8")).hexdigest()
-        cached = _dax_cache.get(cache_key)
-        if cached is not None:
-            logger.debug(f"DAX cache hit [{cache_key[:8]}]")
-            return cached
-
-        # Renova token se ausente ou expirado
-        if not self.token or time.time() >= self.token_expiry:
-            if not self.authenticate():
-                return None
+        cache_key = self._cache_key(query)
+        flight_key = (self.workspace_id, self.dataset_id, cache_key)
+        refresh_tag = self._current_refresh_tag(query)
+
+        entry = _dax_cache.get_entry(cache_key)
+        if entry is not None:
+            if self._is_fresh(entry, refresh_tag):
+                logger.debug(f"DAX cache hit [{cache_key[-8:]}]")
+                return entry.value
+            if self.stale_while_revalidate:
+                logger.debug(f"DAX cache stale [{cache_key[-8:]}] — revalidando em background")
+                self._revalidate_async(flight_key, query, cache_key, refresh_tag)
+                return entry.value
+
+        if parse_scalar_query(query) is not None:
+            if self._batcher is not None:
+                return self._batcher.submit(query).result()
+            if self.measure_cache:
+                return self._execute_batch([query])[0]
+
+        return self._execute_single(query, cache_key, refresh_tag)
+
+    def _execute_single(
+        self, query: str, cache_key: str, refresh_tag: str | None, scalar: ScalarQuery | None = None
+    ) -> list | None:
+        """Executa uma consulta (sem lote); chamadas idênticas concorrentes compartilham a requisição."""
+        flight_key = (self.workspace_id, self.dataset_id, cache_key)
+        rows, shared = _dax_flights.do(
+            flight_key, self._execute_dax_uncached, query, cache_key, refresh_tag, False, scalar
+        )
+        if shared and rows is not None:
+            logger.debug(f"DAX coalescido [{cache_key[-8:]}]")
+            # Cópia rasa por chamador: o líder e os demais não compartilham os mesmos dicts
+            return [dict(row) for row in rows]
+        return rows
+
+    def execute_dax_batch(self, queries: list[str]) -> list[list | None]:
+        """
+        Executa várias consultas, fundindo as escalares do mesmo contexto de filtro.
 
-        url = f"https://api.powerbi.com/v1.0/myorg/groups/{self.workspace_id}/datasets/{self.dataset_id}/executeQueries"
+        Retorna uma lista de resultados na mesma ordem das consultas (None onde houve erro).
+        Consultas já em cache não vão ao Power BI; as demais ROW com os mesmos filtros
+        viram um único ROW com colunas prefixadas (só as medidas fora do cache por medida),
+        separado de volta por consulta.
+        """
+        results = self._execute_batch(queries)
+        return [[dict(row) for row in rows] if rows is not None else None for rows in results]
+
+    def _execute_batch(self, queries: list[str]) -> list[list | None]:
+        results: list[list | None] = [None] * len(queries)
+        groups: dict[tuple, list[tuple[int, ScalarQuery, str, str | None, dict]]] = {}
+
+        for i, query in enumerate(queries):
+            cache_key = self._cache_key(query)
+            refresh_tag = self._current_refresh_tag(query)
+            entry = _dax_cache.get_entry(cache_key)
+            if entry is not None and self._is_fresh(entry, refresh_tag):
+                results[i] = entry.value
+                continue
+
+            parsed = parse_scalar_query(query)
+            if parsed is None:
+                results[i] = self._execute_single(query, cache_key, refresh_tag)
+                continue
+
+            cached = self._cached_measures(parsed, refresh_tag)
+            if len(cached) == len(parsed.columns):
+                # Todas as medidas já conhecidas: a consulta não vai ao Power BI
+                rows = [self._stitch_row(parsed, cached)]
+                self._store(cache_key, rows, refresh_tag)
+                with _batch_stats_lock:
+                    _measure_stats["served_from_cache"] += 1
+                results[i] = rows
+                continue
+            groups.setdefault(parsed.filter_key, []).append((i, parsed, cache_key, refresh_tag, cached))
+
+        for members in groups.values():
+            if len(members) == 1 and not members[0][4]:
+                i, parsed, cache_key, refresh_tag, _ = members[0]
+                results[i] = self._execute_single(queries[i], cache_key, refresh_tag, parsed)
+                continue
+
+            for i, rows in self._execute_merged(members).items():
+                results[i] = rows
+            # Falha do lote (ex: uma medida inválida) ou coluna ausente na resposta: a consulta
+            # original roda sozinha, qualquer que seja o tamanho do grupo
+            for i, parsed, cache_key, refresh_tag, _ in members:
+                if results[i] is None:
+                    results[i] = self._execute_single(queries[i], cache_key, refresh_tag, parsed)
+
+        return results
+
+    def _execute_merged(self, members: list[tuple[int, ScalarQuery, str, str | None, dict]]) -> dict[int, list]:
+        """
+        Funde consultas ROW do mesmo contexto em uma só requisição e separa o resultado.
+        Colunas já presentes no cache por medida (cached: índice → valor) não são pedidas.
+        Consultas com alguma coluna ausente na resposta ficam de fora do resultado (e do cache).
+        """
+        columns = []
+        for i, parsed, _, _, cached in members:
+            columns.extend(
+                (f"b{i}_{name}", expr) for n, (name, expr) in enumerate(parsed.columns) if n not in cached
+            )
+        merged_query = build_scalar_query(columns, members[0][1].filters)
+
+        rows = self._execute_dax_uncached(merged_query, None)
+        if not rows:
+            with _batch_stats_lock:
+                _batch_stats["fallbacks"] += 1
+            logger.warning(f"Lote DAX de {len(members)} consultas falhou; executando individualmente")
+            return {}
+
+        with _batch_stats_lock:
+            _batch_stats["merged_requests"] += 1
+            _batch_stats["merged_queries"] += len(members)
+        logger.debug(f"Lote DAX: {len(members)} consultas ({len(columns)} colunas) em uma requisição")
+
+        merged_row = rows[0]
+        split = {}
+        for i, parsed, cache_key, refresh_tag, cached in members:
+            requested = {n: f"[b{i}_{name}]" for n, (name, _) in enumerate(parsed.columns) if n not in cached}
+            if any(column not in merged_row for column in requested.values()):
+                logger.debug(f"Lote DAX: colunas ausentes na resposta da consulta {i}; executando individualmente")
+                continue
+            fetched = {n: merged_row[column] for n, column in requested.items()}
+            self._store_measures(parsed, fetched, refresh_tag)
+            row = self._stitch_row(parsed, {**cached, **fetched})
+            self._store(cache_key, [row], refresh_tag)
+            split[i] = [row]
+        return split
+
+    # ── Cache por medida ────────────────────────────────────────────────────
+
+    def _measure_key(self, parsed: ScalarQuery, expr: str) -> str:
+        """Chave de uma medida: dataset + expressão + contexto de filtro (ambos canônicos)."""
+        identity = "\x1f".join(parsed.filter_key) + "\x1e" + canonicalize(expr)
+        digest = hashlib.md5(identity.encode("utf-8")).hexdigest()
+        return f"m:{self.workspace_id}:{self.dataset_id}:{digest}"
+
+    def _cached_measures(self, parsed: ScalarQuery, refresh_tag: str | None) -> dict[int, object]:
+        """Valores em cache (ainda frescos) das colunas da consulta, por índice da coluna."""
+        if not self.measure_cache:
+            return {}
+        keys = [self._measure_key(parsed, expr) for _, expr in parsed.columns]
+        entries = _dax_cache.get_entries(keys)
+        cached = {}
+        for n, key in enumerate(keys):
+            entry = entries.get(key)
+            if entry is not None and self._is_fresh(entry, refresh_tag):
+                cached[n] = entry.value[0]
+        with _batch_stats_lock:
+            _measure_stats["hits"] += len(cached)
+            _measure_stats["misses"] += len(keys) - len(cached)
+        return cached
+
+    def _store_measures(self, parsed: ScalarQuery, values: dict[int, object], refresh_tag: str | None) -> None:
+        """Grava os valores buscados (índice da coluna → valor) no cache por medida."""
+        if not self.measure_cache or not values:
+            return
+        ttl = self._store_ttl
+        if refresh_tag is not None:
+            ttl = max(ttl, DAX_CACHE_CONFIG["refresh_max_age_seconds"])
+        _dax_cache.set_many(
+            [(self._measure_key(parsed, parsed.columns[n][1]), [value]) for n, value in values.items()],
+            ttl_seconds=ttl,
+            tag=refresh_tag,
+        )
+
+    @staticmethod
+    def _stitch_row(parsed: ScalarQuery, values: dict[int, object]) -> dict:
+        """Monta a linha no formato da API ("[Nome]": valor), na ordem das colunas da consulta."""
+        return {f"[{name}]": values.get(n) for n, (name, _) in enumerate(parsed.columns)}
+
+    def execute_dax_result(
+        self,
+        query: str,
+        converters: dict | None = None,
+        parse_dates: bool = False,
+    ) -> DaxResult | None:
+        """
+        Como execute_dax, mas devolve um DaxResult colunar com nomes de coluna normalizados
+        ("[Tabela].[Coluna]" → "Coluna") e conversões de tipo aplicadas no parse.
+        Retorna None em caso de erro.
+        """
+        rows = self.execute_dax(query)
+        if rows is None:
+            return None
+        return DaxResult.from_rows(rows, converters=converters, parse_dates=parse_dates)
+
+    def iter_dax_windows(
+        self,
+        build_query: Callable[[str, str], str],
+        date_start: str,
+        date_end: str,
+        window_days: int | None = None,
+        max_workers: int = 4,
+    ) -> Iterator[dict]:
+        """
+        Executa uma query de listagem por janelas de datas e devolve as linhas em streaming.
+
+        build_query(inicio, fim) recebe datas "YYYY-MM-DD" (o mesmo contrato das funções de
+        dax_queries usadas em DATESBETWEEN). O período é dividido em janelas de window_days
+        (ou uma única janela); uma janela cujo resultado atinge o limite do executeQueries
+        (100 mil linhas ou 1 milhão de valores) é dividida ao meio e consultada de novo.
+        As janelas rodam em paralelo (até max_workers) e as linhas são emitidas na ordem
+        em que as janelas terminam. Levanta RuntimeError se alguma janela falhar.
+        """
+        start, end = date.fromisoformat(date_start), date.fromisoformat(date_end)
+        pending: deque[tuple[date, date]] = deque()
+        step = timedelta(days=window_days) if window_days else None
+        cursor = start
+        while cursor <= end:
+            window_end = min(end, cursor + step - timedelta(days=1)) if step else end
+            pending.append((cursor, window_end))
+            cursor = window_end + timedelta(days=1)
+
+        def _run(window: tuple[date, date]) -> list | None:
+            return self.execute_dax(build_query(window[0].isoformat(), window[1].isoformat()))
+
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dax-window")
+        running: dict = {}
+        try:
+            while pending or running:
+                while pending and len(running) < max_workers:
+                    window = pending.popleft()
+                    # copy_context: a janela herda a prioridade do chamador
+                    running[executor.submit(contextvars.copy_context().run, _run, window)] = window
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    window = running.pop(future)
+                    rows = future.result()
+                    if rows is None:
+                        raise RuntimeError(f"Falha ao consultar a janela DAX {window[0]} a {window[1]}")
+
+                    if self._is_truncated(rows):
+                        if window[0] < window[1]:
+                            middle = window[0] + (window[1] - window[0]) // 2
+                            logger.info(f"Resultado DAX truncado em {window[0]}..{window[1]}; dividindo a janela")
+                            pending.append((window[0], middle))
+                            pending.append((middle + timedelta(days=1), window[1]))
+                            continue
+                        logger.warning(f"Resultado DAX truncado em um único dia ({window[0]}); emitindo parcial")
+
+                    yield from rows
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _is_truncated(rows: list) -> bool:
+        if not rows:
+            return False
+        return len(rows) >= _MAX_RESULT_ROWS or len(rows) * len(rows[0]) >= _MAX_RESULT_VALUES
 
-        headers = {
-            "Authorization": f"Bearer {self.token}",
-            "Content-Type": "application/json",
-        }
+    def _cache_key(self, query: str) -> str:
+        """
+        Chave do cache: namespace do dataset + hash da forma canônica da query
+        (comentários e diferenças de espaçamento não geram chaves distintas).
+        """
+        digest = hashlib.md5(canonicalize(query).encode("utf-8")).hexdigest()
+        return f"{self.workspace_id}:{self.dataset_id}:{digest}"
+
+    def _current_refresh_tag(self, query: str) -> str | None:
+        """Versão atual dos dados (último refresh concluído) ou None se não se aplica à query."""
+        if not self.refresh_aware or _VOLATILE_DAX.search(query):
+            return None
+        return self.refresh_tracker.last_refresh(self.workspace_id, self.dataset_id, self.get_last_refresh_time)
+
+    def _is_fresh(self, entry: CacheEntry, refresh_tag: str | None) -> bool:
+        # Ambos os lados conhecem a versão dos dados: válido enquanto não houver novo refresh
+        if refresh_tag is not None and entry.tag is not None:
+            return entry.tag == refresh_tag
+        return time.time() - entry.created_at <= self._fresh_ttl
+
+    def _revalidate_async(self, flight_key: tuple, query: str, cache_key: str, refresh_tag: str | None) -> None:
+        """Atualiza uma entrada vencida em uma thread daemon (no máximo uma por chave)."""
+        with _revalidating_lock:
+            _swr_stats["stale_served"] += 1
+            if flight_key in _revalidating:
+                return
+            _revalidating.add(flight_key)
+            _swr_stats["revalidations"] += 1
+
+        def _target():
+            try:
+                _dax_flights.do(flight_key, self._execute_dax_uncached, query, cache_key, refresh_tag, True)
+            except Exception as e:
+                logger.warning(f"Falha ao revalidar DAX [{cache_key[-8:]}] em background: {e}")
+            finally:
+                with _revalidating_lock:
+                    _revalidating.discard(flight_key)
+
+        # A revalidação herda a prioridade do chamador que recebeu o resultado vencido
+        ctx = contextvars.copy_context()
+        threading.Thread(target=ctx.run, args=(_target,), name=f"dax-swr-{cache_key[-8:]}", daemon=True).start()
+
+    def _execute_dax_uncached(
+        self,
+        query: str,
+        cache_key: str | None,
+        refresh_tag: str | None = None,
+        revalidate: bool = False,
+        scalar: ScalarQuery | None = None,
+    ) -> list | None:
+        """
+        Executa a query no Power BI e grava o resultado no cache.
+        scalar: a consulta já reconhecida como ROW — seus valores também vão para o cache por medida.
+        """
+        # Outra requisição pode ter concluído entre o cache miss e a entrada no single-flight
+        # (cache_key None: consulta de lote, não cacheada como um todo)
+        if cache_key is not None and not revalidate:
+            entry = _dax_cache.get_entry(cache_key)
+            if entry is not None and self._is_fresh(entry, refresh_tag):
+                return entry.value
+
+        # Token do broker compartilhado (renovado em background antes de expirar)
+        token = self._broker.get_token()
+        if not token:
+            return None
+
+        url = f"https://api.powerbi.com/v1.0/myorg/groups/{self.workspace_id}/datasets/{self.dataset_id}/executeQueries"
 
         payload = {
             "queries": [{"query": query}],
@@ -144,7 +533,9 @@ class PowerBIClient:
         }
 
         try:
-            response = self.session.post(url, json=payload, headers=headers, timeout=30)
+            response = self._post_execute_queries(url, payload, token)
+            if response is None:
+                return None
             response.raise_for_status()
 
             result = response.json()
@@ -152,16 +543,83 @@ class PowerBIClient:
 
             if tables:
                 rows = tables[0].get("rows", [])
-                _dax_cache.set(cache_key, rows)
+                if cache_key is not None:
+                    self._store(cache_key, rows, refresh_tag)
+                if scalar is not None and len(rows) == 1:
+                    values = {n: rows[0].get(f"[{name}]") for n, (name, _) in enumerate(scalar.columns)}
+                    self._store_measures(scalar, values, refresh_tag)
                 return rows
             return []
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Erro ao executar DAX: {e}")
+            logger.error(f"Query: {canonicalize(query)[:500]}")
             if hasattr(e, "response") and e.response is not None:
                 logger.error(f"Detalhes: {e.response.text[:500]}")
             return None
 
+    def _store(self, cache_key: str, rows: list, refresh_tag: str | None) -> None:
+        """Grava o resultado no cache DAX com a versão dos dados (tag de refresh)."""
+        ttl = self._store_ttl
+        if refresh_tag is not None:
+            ttl = max(ttl, DAX_CACHE_CONFIG["refresh_max_age_seconds"])
+        _dax_cache.set(
+            cache_key,
+            rows,
+            ttl_seconds=ttl,
+            tag=refresh_tag,
+        )
+
+    def _post_execute_queries(self, url: str, payload: dict, token: str) -> requests.Response | None:
+        """
+        POST executeQueries sob o orçamento por classe e o governor do tenant.
+
+        A prioridade do contexto (scheduled/interactive/ai) decide a admissão: consultas
+        recusadas pelo orçamento (reserva de job agendado ou cota horária) retornam None.
+        HTTP 429 devolve a vaga como throttled (o governor reduz a concorrência e pausa
+        pelo Retry-After) e a requisição é repetida até max_retries vezes. HTTP 401 força
+        uma nova autenticação uma única vez. Retorna None se não houver token.
+        """
+        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+        reauthenticated = False
+        priority = current_priority()
+        budget = get_query_budget()
+
+        for attempt in range(POWERBI_GOVERNOR_CONFIG["max_retries"] + 1):
+            denied = budget.admit(priority)
+            if denied:
+                logger.warning(f"Consulta DAX recusada (prioridade '{priority}'): {denied}")
+                return None
+
+            self.governor.acquire(rank=PRIORITY_RANK[priority])
+            throttled, retry_after = False, None
+            try:
+                response = self.session.post(url, json=payload, headers=headers, timeout=30)
+                if response.status_code == 429:
+                    throttled = True
+                    retry_after = parse_retry_after(
+                        response.headers.get("Retry-After"),
+                        POWERBI_GOVERNOR_CONFIG["default_retry_after_seconds"],
+                    )
+            finally:
+                self.governor.release(throttled=throttled, retry_after=retry_after)
+
+            if throttled and attempt < POWERBI_GOVERNOR_CONFIG["max_retries"]:
+                logger.warning(f"executeQueries com throttling (HTTP 429); nova tentativa em {retry_after:.0f}s")
+                continue
+
+            if response.status_code == 401 and not reauthenticated:
+                # Token reaproveitado de outro processo pode ter sido revogado: autentica de novo
+                token = self._broker.get_token(force=True)
+                if not token:
+                    return None
+                headers["Authorization"] = f"Bearer {token}"
+                reauthenticated = True
+                continue
+
+            return response
+        return response
+
     def get_sample_data(self) -> list | None:
         """Retorna dados de exemplo (teste de conexão simples)."""
         # Query simples para testar conexao
@@ -170,12 +628,12 @@ class PowerBIClient:
 
     def list_datasets(self) -> list:
         """Lista todos os datasets disponíveis no workspace configurado."""
-        if not self.token:
-            if not self.authenticate():
-                return []
+        token = self._broker.get_token()
+        if not token:
+            return []
 
         url = f"https://api.powerbi.com/v1.0/myorg/groups/{self.workspace_id}/datasets"
-        headers = {"Authorization": f"Bearer {self.token}"}
+        headers = {"Authorization": f"Bearer {token}"}
 
         try:
             response = self.session.get(url, headers=headers, timeout=10)
@@ -184,6 +642,33 @@ class PowerBIClient:
         except Exception:
             return []
 
+    def get_last_refresh_time(self, workspace_id: str | None = None, dataset_id: str | None = None) -> str | None:
+        """
+        Consulta o histórico de refreshes e retorna o endTime do último refresh concluído
+        com sucesso (status "Completed"), ou None se indisponível.
+        """
+        ws_id = workspace_id or self.workspace_id
+        ds_id = dataset_id or self.dataset_id
+
+        token = self._broker.get_token()
+        if not token:
+            return None
+
+        url = f"https://api.powerbi.com/v1.0/myorg/groups/{ws_id}/datasets/{ds_id}/refreshes"
+        headers = {"Authorization": f"Bearer {token}"}
+
+        try:
+            response = self.session.get(url, headers=headers, params={"$top": 10}, timeout=10)
+            response.raise_for_status()
+            # O histórico vem do mais recente para o mais antigo
+            for refresh in response.json().get("value", []):
+                if refresh.get("status") == "Completed" and refresh.get("endTime"):
+                    return refresh["endTime"]
+            return None
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Erro ao consultar histórico de refresh do dataset {ds_id}: {e}")
+            return None
+
     def trigger_dataset_refresh(self, dataset_id: str, workspace_id: str | None = None) -> bool:
         """
         Dispara a atualização de um dataset no Power BI.
@@ -195,14 +680,14 @@ class PowerBIClient:
         ws_id = workspace_id or self.workspace_id
 
         # Renova o token se necessário antes de disparar
-        if not self.token or time.time() >= self.token_expiry:
-            if not self.authenticate():
-                logger.error(f"Falha ao autenticar antes do refresh do dataset {dataset_id}")
-                return False
+        token = self._broker.get_token()
+        if not token:
+            logger.error(f"Falha ao autenticar antes do refresh do dataset {dataset_id}")
+            return False
 
         url = f"https://api.powerbi.com/v1.0/myorg/groups/{ws_id}/datasets/{dataset_id}/refreshes"
         headers = {
-            "Authorization": f"Bearer {self.token}",
+            "Authorization": f"Bearer {token}",
             "Content-Type": "application/json",
         }
 
@@ -212,6 +697,8 @@ class PowerBIClient:
             # 202 Accepted = Power BI aceitou a requisição de refresh
             if response.status_code == 202:
                 logger.info(f"Refresh aceito para dataset {dataset_id}")
+                # Força nova consulta do histórico para que o cache perceba o refresh logo ao concluir
+                self.refresh_tracker.invalidate(ws_id, dataset_id)
                 return True
 
             logger.error(
@@ -0,0 +1,269 @@
+"""
+Classes de prioridade e orçamento de consultas do Power BI.
+
+Jobs agendados, a API, o servidor MCP e o script do n8n usam o mesmo service
+principal e, portanto, a mesma cota de executeQueries. Cada chamada DAX é
+classificada pela prioridade do contexto atual:
+
+- "scheduled": relatórios agendados (job_metas, job_painel_ina, job_unidades);
+- "interactive": padrão (API, dashboards, uso manual);
+- "ai": tráfego ad-hoc de agentes (MCP, ai_data_fetcher.py).
+
+Um ledger em SQLite, compartilhado entre processos, conta as consultas por hora e
+por classe e guarda as reservas dos jobs agendados. Enquanto uma reserva está ativa
+(alguns minutos antes do horário até o fim do job), a classe "ai" é recusada sem espera —
+o cliente recebe None, como em qualquer falha de consulta —, de modo que uma sessão de
+agente às 13:59 não atrasa o envio de metas das 14:00.
+"""
+
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from src.config import POWERBI_BUDGET_CONFIG
+from src.core.utils.logger import get_logger
+
+logger = get_logger("query_budget")
+
+PRIORITY_SCHEDULED = "scheduled"
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_AI = "ai"
+
+# Menor valor = maior prioridade
+PRIORITY_RANK = {PRIORITY_SCHEDULED: 0, PRIORITY_INTERACTIVE: 1, PRIORITY_AI: 2}
+
+# Horas de histórico mantidas no ledger
+_LEDGER_RETENTION_HOURS = 48
+
+_default_priority = PRIORITY_INTERACTIVE
+_priority: contextvars.ContextVar[str | None] = contextvars.ContextVar("pbi_query_priority", default=None)
+
+
+def set_default_priority(priority: str) -> None:
+    """Define a prioridade padrão do processo (ex: "ai" no servidor MCP)."""
+    global _default_priority
+    if priority not in PRIORITY_RANK:
+        raise ValueError(f"Prioridade desconhecida: {priority}")
+    _default_priority = priority
+
+
+def current_priority() -> str:
+    """Prioridade do contexto atual (ou o padrão do processo)."""
+    return _priority.get() or _default_priority
+
+
+@contextmanager
+def query_priority(priority: str):
+    """Executa o bloco com a prioridade informada (propagada a threads via contextvars.copy_context)."""
+    if priority not in PRIORITY_RANK:
+        raise ValueError(f"Prioridade desconhecida: {priority}")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+_LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_usage (
+    hour     TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    queries  INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, priority)
+);
+CREATE TABLE IF NOT EXISTS query_reservations (
+    name      TEXT PRIMARY KEY,
+    starts_at REAL NOT NULL,
+    ends_at   REAL NOT NULL
+);
+"""
+
+
+class QueryLedger:
+    """
+    Contagem horária de consultas por classe e reservas de janela, em SQLite (WAL).
+
+    Falhas de I/O nunca propagam: o ledger é consultivo e, se indisponível,
+    as consultas seguem sem orçamento.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout = 10000")
+            if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != "wal":
+                conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(_LEDGER_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _hour(ts: float | None = None) -> str:
+        return datetime.fromtimestamp(ts if ts is not None else time.time()).strftime("%Y-%m-%dT%H")
+
+    def record(self, priority: str) -> None:
+        """Soma uma consulta à hora corrente da classe."""
+        try:
+            self._conn().execute(
+                "INSERT INTO query_usage (hour, priority, queries) VALUES (?, ?, 1) "
+                "ON CONFLICT(hour, priority) DO UPDATE SET queries = queries + 1",
+                (self._hour(), priority),
+            )
+        except (sqlite3.Error, OSError) as e:
+            logger.debug(f"Falha ao registrar consulta no ledger: {e}")
+
+    def usage(self, hour: str | None = None) -> dict[str, int]:
+        """Consultas por classe na hora informada (padrão: hora corrente)."""
+        try:
+            rows = self._conn().execute(
+                "SELECT priority, queries FROM query_usage WHERE hour = ?", (hour or self._hour(),)
+            ).fetchall()
+            return dict(rows)
+        except (sqlite3.Error, OSError) as e:
+            logger.debug(f"Falha ao ler ledger de consultas: {e}")
+            return {}
+
+    def reserve(self, name: str, starts_at: float, ends_at: float) -> None:
+        """Cria ou atualiza uma reserva de capacidade para jobs agendados."""
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO query_reservations (name, starts_at, ends_at) VALUES (?, ?, ?)",
+                (name, starts_at, ends_at),
+            )
+            # Limpeza oportunista de reservas vencidas e horas antigas
+            now = time.time()
+            conn.execute("DELETE FROM query_reservations WHERE ends_at < ?", (now,))
+            conn.execute(
+                "DELETE FROM query_usage WHERE hour < ?",
+                (self._hour(now - _LEDGER_RETENTION_HOURS * 3600),),
+            )
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Falha ao registrar reserva '{name}' no ledger: {e}")
+
+    def release(self, name: str) -> None:
+        try:
+            self._conn().execute("DELETE FROM query_reservations WHERE name = ?", (name,))
+        except (sqlite3.Error, OSError) as e:
+            logger.debug(f"Falha ao remover reserva '{name}': {e}")
+
+    def active_reservation(self, now: float | None = None) -> str | None:
+        """Nome de uma reserva vigente no momento, ou None."""
+        now = now if now is not None else time.time()
+        try:
+            row = self._conn().execute(
+                "SELECT name FROM query_reservations WHERE starts_at <= ? AND ends_at > ? ORDER BY starts_at LIMIT 1",
+                (now, now),
+            ).fetchone()
+            return row[0] if row else None
+        except (sqlite3.Error, OSError) as e:
+            logger.debug(f"Falha ao consultar reservas: {e}")
+            return None
+
+
+class QueryBudget:
+    """Política de admissão por classe sobre o ledger compartilhado."""
+
+    def __init__(self, ledger: QueryLedger, hourly_budget: dict[str, int] | None = None):
+        self.ledger = ledger
+        self._hourly_budget = hourly_budget or {}
+        self._lock = threading.Lock()
+        self._denied: dict[str, int] = {}
+
+    def admit(self, priority: str) -> str | None:
+        """
+        Registra a consulta no ledger se a classe puder prosseguir.
+        Retorna None quando admitida ou o motivo da recusa.
+        """
+        reason = None
+        if priority != PRIORITY_SCHEDULED:
+            if priority == PRIORITY_AI:
+                reservation = self.ledger.active_reservation()
+                if reservation:
+                    reason = f"capacidade reservada para o job agendado '{reservation}'"
+            budget = self._hourly_budget.get(priority, 0)
+            if reason is None and budget and self.ledger.usage().get(priority, 0) >= budget:
+                reason = f"orçamento horário da classe '{priority}' esgotado ({budget} consultas)"
+
+        if reason is not None:
+            with self._lock:
+                self._denied[priority] = self._denied.get(priority, 0) + 1
+            return reason
+
+        self.ledger.record(priority)
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            denied = dict(self._denied)
+        return {
+            "usage_this_hour": self.ledger.usage(),
+            "denied": denied,
+            "active_reservation": self.ledger.active_reservation(),
+        }
+
+
+_budget: QueryBudget | None = None
+_budget_lock = threading.Lock()
+
+
+def get_query_budget() -> QueryBudget:
+    """Orçamento compartilhado do processo (ledger em POWERBI_BUDGET_CONFIG['ledger_path'])."""
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = QueryBudget(
+                QueryLedger(POWERBI_BUDGET_CONFIG["ledger_path"]),
+                hourly_budget=POWERBI_BUDGET_CONFIG["hourly_budget"],
+            )
+        return _budget
+
+
+@contextmanager
+def scheduled_run(job_name: str):
+    """
+    Executa um job agendado com prioridade "scheduled", mantendo uma reserva no ledger
+    enquanto ele roda (tráfego "ai" de outros processos fica bloqueado até o fim).
+
+    A reserva dura reservation_seconds e é renovada a cada terço desse tempo por uma
+    thread de heartbeat; se o processo morrer, ela expira sozinha.
+    """
+    ledger = get_query_budget().ledger
+    name = f"run:{job_name}:{os.getpid()}"
+    duration = POWERBI_BUDGET_CONFIG["reservation_seconds"]
+    done = threading.Event()
+
+    def _renew() -> None:
+        while not done.wait(max(1.0, duration / 3)):
+            now = time.time()
+            ledger.reserve(name, now, now + duration)
+
+    now = time.time()
+    ledger.reserve(name, now, now + duration)
+    heartbeat = threading.Thread(target=_renew, name=f"pbi-reserva-{job_name}", daemon=True)
+    heartbeat.start()
+    try:
+        with query_priority(PRIORITY_SCHEDULED):
+            yield
+    finally:
+        done.set()
+        heartbeat.join()
+        ledger.release(name)
+
+
+def reserve_schedule(job_name: str, run_at: datetime) -> None:
+    """Reserva a janela de um disparo futuro (chamado pelo scheduler ao carregar os agendamentos)."""
+    start = run_at.timestamp() - POWERBI_BUDGET_CONFIG["reservation_lead_seconds"]
+    end = run_at.timestamp() + POWERBI_BUDGET_CONFIG["reservation_seconds"]
+    get_query_budget().ledger.reserve(f"schedule:{job_name}:{run_at:%Y-%m-%dT%H:%M}", start, end)
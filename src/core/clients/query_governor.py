@@ -0,0 +1,189 @@
+"""
+Controle de admissão das consultas executeQueries do Power BI.
+
+Todas as chamadas DAX do processo para o mesmo tenant passam por um único
+QueryGovernor, que combina:
+- limite de concorrência adaptativo (AIMD): +1 a cada janela de sucessos,
+  metade a cada HTTP 429;
+- pausa global enquanto vigora o Retry-After de um 429;
+- token bucket dimensionado para o limite PPU de requisições por minuto;
+- fila por prioridade: uma classe só é admitida se nenhuma classe mais
+  prioritária estiver esperando, e a classe de menor prioridade usa no máximo
+  metade do limite de concorrência.
+
+Assim, jobs paralelos (metas, INA, unidades, MCP) não estouram a cota juntos.
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from src.config import POWERBI_GOVERNOR_CONFIG
+from src.core.utils.logger import get_logger
+
+logger = get_logger("query_governor")
+
+
+def parse_retry_after(value: str | None, default: float) -> float:
+    """Converte o header Retry-After (segundos ou data HTTP) em segundos de espera."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class QueryGovernor:
+    """Semáforo adaptativo + token bucket, thread-safe."""
+
+    def __init__(
+        self,
+        name: str,
+        rate_per_minute: int = 120,
+        burst: int = 20,
+        max_concurrency: int = 10,
+        initial_concurrency: int = 5,
+        min_concurrency: int = 1,
+    ):
+        self.name = name
+        self._rate = rate_per_minute / 60.0  # tokens por segundo
+        self._burst = max(1, burst)
+        self._max = max(1, max_concurrency)
+        self._min = max(1, min(min_concurrency, self._max))
+
+        self._cond = threading.Condition()
+        self._limit = max(self._min, min(initial_concurrency, self._max))
+        self._in_flight = 0
+        self._tokens = float(self._burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._successes = 0  # sucessos desde o último ajuste do limite
+        self._waiting: dict[int, int] = {}  # rank de prioridade -> threads aguardando
+
+        self._stats = {"admitted": 0, "throttled": 0, "waited_seconds": 0.0, "timeouts": 0}
+
+    # ── Admissão ────────────────────────────────────────────────────────────
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self._burst, self._tokens + (now - self._refilled_at) * self._rate)
+        self._refilled_at = now
+
+    def _class_limit(self, rank: int) -> int:
+        # A classe de menor prioridade (rank >= 2) nunca ocupa mais da metade das vagas
+        return self._limit if rank < 2 else max(1, self._limit // 2)
+
+    def _outranked(self, rank: int) -> bool:
+        return any(count and other < rank for other, count in self._waiting.items())
+
+    def acquire(self, timeout: float | None = None, rank: int = 1) -> bool:
+        """
+        Bloqueia até haver vaga de concorrência, token disponível e nenhuma pausa de 429.
+        rank é a prioridade do chamador (menor = mais prioritário).
+        Retorna False se o timeout expirar antes da admissão.
+        """
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+
+        with self._cond:
+            self._waiting[rank] = self._waiting.get(rank, 0) + 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    if deadline is not None and now >= deadline:
+                        self._stats["timeouts"] += 1
+                        return False
+
+                    if now < self._paused_until:
+                        wait = self._paused_until - now
+                    elif self._in_flight >= self._class_limit(rank) or self._outranked(rank):
+                        wait = None  # aguarda um release() ou a admissão de quem tem prioridade
+                    else:
+                        self._refill(now)
+                        if self._tokens >= 1:
+                            self._tokens -= 1
+                            self._in_flight += 1
+                            self._stats["admitted"] += 1
+                            self._stats["waited_seconds"] += now - start
+                            return True
+                        wait = (1 - self._tokens) / self._rate
+
+                    if deadline is not None:
+                        wait = deadline - now if wait is None else min(wait, deadline - now)
+                    self._cond.wait(wait)
+            finally:
+                self._waiting[rank] -= 1
+                self._cond.notify_all()
+
+    def release(self, throttled: bool = False, retry_after: float | None = None) -> None:
+        """
+        Devolve a vaga. throttled=True (HTTP 429) reduz o limite pela metade e pausa
+        novas admissões por retry_after segundos; sucessos aumentam o limite aos poucos.
+        """
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            now = time.monotonic()
+
+            if throttled:
+                self._stats["throttled"] += 1
+                pause = retry_after
+                if pause is None:
+                    pause = POWERBI_GOVERNOR_CONFIG["default_retry_after_seconds"]
+                # Vários 429 da mesma rajada contam como um único corte
+                if now >= self._paused_until:
+                    self._limit = max(self._min, self._limit // 2)
+                    logger.warning(
+                        f"[{self.name}] HTTP 429: concorrência reduzida para {self._limit}, pausa de {pause:.0f}s"
+                    )
+                self._paused_until = max(self._paused_until, now + pause)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self._limit and self._limit < self._max:
+                    self._limit += 1
+                    self._successes = 0
+                    logger.debug(f"[{self.name}] concorrência ampliada para {self._limit}")
+
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                **self._stats,
+                "waited_seconds": round(self._stats["waited_seconds"], 2),
+                "limit": self._limit,
+                "in_flight": self._in_flight,
+                "paused_for": max(0, round(self._paused_until - time.monotonic(), 1)),
+            }
+
+
+# Um governor por tenant no processo
+_governors: dict[str, QueryGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def get_query_governor(tenant: str) -> QueryGovernor:
+    """Retorna o governor compartilhado do tenant, criando-o na primeira chamada."""
+    with _governors_lock:
+        governor = _governors.get(tenant)
+        if governor is None:
+            governor = QueryGovernor(
+                name=f"pbi:{tenant[:8]}",
+                rate_per_minute=POWERBI_GOVERNOR_CONFIG["rate_per_minute"],
+                burst=POWERBI_GOVERNOR_CONFIG["burst"],
+                max_concurrency=POWERBI_GOVERNOR_CONFIG["max_concurrency"],
+                initial_concurrency=POWERBI_GOVERNOR_CONFIG["initial_concurrency"],
+            )
+            _governors[tenant] = governor
+        return governor
+
+
+def get_governor_stats() -> dict:
+    """Contadores de admissão de todos os governors do processo."""
+    with _governors_lock:
+        governors = dict(_governors)
+    return {tenant: g.stats() for tenant, g in governors.items()}
@@ -1,10 +1,14 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import numpy as np
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
-from src.config import UNIDADES_CONFIG
+from src.config import NEXUS_CONFIG, UNIDADES_CONFIG
+from src.core.clients.nexus_paginator import NexusPaginator
+from src.core.services.nexus_mirror import get_nexus_mirror
 from src.core.services.supabase_service import SupabaseService
 from src.core.utils.logger import get_logger
 
@@ -29,6 +33,11 @@ class UnidadesClient:
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
 
+        # Safe batch size de 500 itens por página
+        self.paginator = NexusPaginator(
+            self.session, self.headers, page_size=500, window=NEXUS_CONFIG["prefetch_pages"], timeout=30
+        )
+
         svc = SupabaseService()
         self.model_map = svc.get_setting("nexus_model_map", {})
         self.type_map = svc.get_setting("unidades_type_map", {})
@@ -36,72 +45,49 @@ class UnidadesClient:
     def fetch_all_from_source(self, endpoint: str) -> list:
         """
         Busca TODOS os dados da API Nexus (Source) paginando via 'page'.
-        Ignora o mirror Supabase.
+        Ignora o mirror Supabase. Mantém NEXUS_CONFIG['prefetch_pages'] páginas em voo.
         """
         all_items = []
-        page = 1
-        limit = 500  # Safe batch size
 
         url = f"{self.api_url}/{endpoint}/"
         logger.info(f"Fetching full data from SOURCE API: {url}")
 
-        while True:
-            try:
-                params = {"page": page, "limit": limit}
-
-                # Direct Request using Session
-                resp = self.session.get(url, headers=self.headers, params=params, timeout=30)
-
-                if resp.status_code != 200:
-                    logger.error(f"Failed to fetch page {page}: {resp.status_code} - {resp.text[:100]}")
-                    break
-
-                data = resp.json()
-
-                # Handle potential wrappers
-                if isinstance(data, dict):
-                    if "data" in data:
-                        items = data["data"]
-                    elif "results" in data:
-                        items = data["results"]
-                    else:
-                        items = []  # Unknown format or empty dict
-                elif isinstance(data, list):
-                    items = data
-                else:
-                    logger.error(f"Unknown response format: {type(data)}")
-                    break
-
-                if not items:
-                    break
-
-                all_items.extend(items)
-                logger.info(f"Page {page} fetched {len(items)} items. Total so far: {len(all_items)}")
-
-                if len(items) < limit:
-                    # Last page
-                    break
-
-                page += 1
-
-            except Exception as e:
-                logger.error(f"Exception on page {page}: {e}")
-                break
+        for page, items in enumerate(self.paginator.pages(url), start=1):
+            all_items.extend(items)
+            logger.info(f"Page {page} fetched {len(items)} items. Total so far: {len(all_items)}")
 
         return all_items
 
+    # Tabelas do mirror Supabase e a chave de UNIDADES_CONFIG com a projeção de cada uma
+    _TABLES = {
+        "unidades": ("nexus_unidades", "unidades_select"),
+        "modelos": ("nexus_modelos", "modelos_select"),
+        "participantes": ("nexus_participantes", "participantes_select"),
+    }
+
+    @staticmethod
+    def _modelos_since(items: list, min_date: str) -> list:
+        """Filtro de data dos modelos (contrato ou cancelamento a partir de min_date)."""
+        filtered = []
+        for x in items:
+            d_contrato = x.get("data_contrato") or x.get("data")
+            d_cancel = x.get("data_cancelamento")
+            if (d_contrato and d_contrato >= min_date) or (d_cancel and d_cancel >= min_date):
+                filtered.append(x)
+        return filtered
+
     def _get_paginated_latest(self, endpoint: str, min_date: str | None = None) -> list:
         """
         Busca dados do Supabase (Mirror) em vez da API Externa.
         Mapeia 'endpoint' para tabelas 'nexus_*'.
+
+        Projeção (select) e, para 'modelos', o filtro de data são aplicados no servidor:
+        a resposta traz só as colunas usadas e os contratos/cancelamentos a partir de min_date.
+        Se o servidor rejeitar a consulta (ex: coluna configurada inexistente), repete com
+        select=* sem filtro — o filtro em Python continua valendo nos dois casos.
         """
         svc = SupabaseService()
-        table_map = {
-            "unidades": "nexus_unidades",
-            "modelos": "nexus_modelos",
-            "participantes": "nexus_participantes",
-        }
-        table = table_map.get(endpoint)
+        table, select_key = self._TABLES.get(endpoint, (None, None))
         if not table:
             logger.error(f"Endpoint/Tabela desconhecido: {endpoint}")
             return []
@@ -109,55 +95,28 @@ class UnidadesClient:
         try:
             logger.info(f"Fetching data from Supabase table: {table}")
 
-            # Construir Consulta
-            # Queremos TODOS os dados efetivamente, ou filtrar por data se a coluna existir
-            params = {"select": "*"}
-
-            # Otimização: Se buscar 'modelos' com min_date, aplicar filtro diretamente
+            params = {"select": UNIDADES_CONFIG.get(select_key) or "*"}
             if endpoint == "modelos" and min_date:
-                # Filtrar por data_contrato OU data (legado)
-                # Supabase REST não suporta OR complexo facilmente em um parâmetro sem string raw
-                # Então buscamos um pouco mais e filtramos em Python, ou usamos 'gte'
-                # Vamos simplesmente buscar tudo por enquanto ou ordenar por data decrescente com limite de 1000?
-                # Idealmente sincronizamos TODO o histórico, então devemos buscar tudo.
-                # No entanto, sincronizar 500k linhas via REST pode ser lento.
-                # Mas 'nexus_modelos' tem apenas ~600 linhas no teste?
-                pass
-
-            # Buscar TODAS as linhas (auxiliar de paginação)
-            all_items = []
-            offset = 0
-            limit = 1000
-
-            while True:
-                p = params.copy()
-                p["offset"] = offset
-                p["limit"] = limit
-                # Ordenar por id para garantir consistência
-                p["order"] = "id.asc"
-
-                chunk = svc._get(table, p)
-                if not chunk:
-                    break
-
-                all_items.extend(chunk)
-                if len(chunk) < limit:
-                    break
-
-                offset += limit
+                # data_contrato OU data (legado) OU data_cancelamento >= min_date
+                params["or"] = f"(data_contrato.gte.{min_date},data.gte.{min_date},data_cancelamento.gte.{min_date})"
+
+            # Páginas lidas em paralelo, ordenadas por id para garantir consistência
+            all_items = None
+            if params["select"] != "*" or "or" in params:
+                all_items = svc.fetch_table_parallel(table, params)
+                if all_items is None:
+                    logger.warning(
+                        f"Consulta com filtro/projeção rejeitada em {table}; "
+                        f"buscando tabela completa (verifique UNIDADES_{select_key.upper()})."
+                    )
+            if all_items is None:
+                all_items = svc.fetch_table_parallel(table, {"select": "*"}) or []
 
             logger.info(f"Fetched {len(all_items)} rows from {table}.")
 
             # Pós-filtrar por min_date se solicitado (para 'modelos')
             if min_date and endpoint == "modelos":
-                filtered = []
-                for x in all_items:
-                    d_contrato = x.get("data_contrato") or x.get("data")
-                    d_cancel = x.get("data_cancelamento")
-
-                    if (d_contrato and d_contrato >= min_date) or (d_cancel and d_cancel >= min_date):
-                        filtered.append(x)
-                return filtered
+                return self._modelos_since(all_items, min_date)
 
             return all_items
 
@@ -165,10 +124,24 @@ class UnidadesClient:
             logger.error(f"Error fetching from Supabase ({endpoint}): {e}")
             return []
 
+    def _get_dimension(self, endpoint: str) -> list:
+        """
+        Linhas de uma tabela de dimensão: do espelho local (sincronizado por delta) quando
+        habilitado; direto do Supabase se o espelho estiver desligado ou nunca tiver carregado.
+        """
+        mirror = get_nexus_mirror()
+        if mirror is not None:
+            table, select_key = self._TABLES[endpoint]
+            mirror.sync(table, UNIDADES_CONFIG.get(select_key) or "*")
+            rows = mirror.rows(table)
+            if rows:
+                return rows
+        return self._get_paginated_latest(endpoint)
+
     def _get_all_participantes(self) -> dict:
         """Busca todos os participantes (consultores/gerentes) para lookup via Supabase."""
         logger.info("Fetching lookups: Participantes...")
-        results = self._get_paginated_latest("participantes")
+        results = self._get_dimension("participantes")
         # Mapear ID -> Nome (Assumir campo 'nome' ou 'NOME')
         pmap = {}
         for p in results:
@@ -179,7 +152,7 @@ class UnidadesClient:
     def _get_all_unidades(self) -> dict:
         """Busca TODAS as unidades para lookup (cache local)."""
         logger.info("Fetching lookups: Unidades...")
-        results = self._get_paginated_latest("unidades")
+        results = self._get_dimension("unidades")
         # Mapear ID -> {nome, cidade, uf, raw_data}
         unidades_map = {}
         for u in results:
@@ -205,165 +178,188 @@ class UnidadesClient:
         unidades_map = self._get_all_unidades()
 
         # 2. Buscar Fatos (Modelos) filtrados por min_date
-        # Nota: Filtramos por min_date para evitar buscar 10 anos de vendas
+        # Nota: Filtramos por min_date no servidor para evitar buscar 10 anos de vendas
         modelos = self._get_paginated_latest("modelos", min_date=start_date)
 
-        new_units = []
-        cancelled_units = []
-        upsell_units = []
-
-        # Parsear datas para comparação
-        start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-        end_dt = datetime.strptime(end_date, "%Y-%m-%d")
-
-        for m in modelos:
-            # Verificar datas - preferir data (view Supabase) ou fallback
-            data_contrato_str = m.get("data") or m.get("data_contrato")
-            data_cancelamento_str = m.get("data_cancelamento")
-
-            raw_data = m.get("raw_data") or {}
-
-            # Correção Temporária: Hardcode Modelo 40 ausente (Studio Store)
-            if 40 not in self.model_map:
-                self.model_map[40] = "Studio Store"
-            if "40" not in self.model_map:
-                self.model_map["40"] = "Studio Store"
-
-            # LINK: Dados da Unidade (do lookup de Unidades)
-            uid = m.get("unidade")
-            unit_data = unidades_map.get(uid)
-
-            # Fallback: Se unidade não estiver no cache, buscar nome na API Nexus
-            if not unit_data:
-                logger.info(f"Unit {uid} not in cache, fetching from API...")
-                fetched_name = self.fetch_unit_name(uid)
-                unit_data = {
-                    "nome": fetched_name,
-                    "cidade": "-",
-                    "uf": "-",
-                    "raw_data": {},
-                }
-                # Armazenar em cache para buscas futuras nesta sessão
-                unidades_map[uid] = unit_data
-
-            # Usar nome de nexus_unidades diretamente
-            base_unit_name = unit_data["nome"]
-            # Formato: "Unidade {ID} - {Nome}" se o nome ainda não estiver formatado
-            if base_unit_name and "Unidade" not in str(base_unit_name):
-                unit_name = f"Unidade {uid} - {base_unit_name}"
-            else:
-                unit_name = base_unit_name or f"Unidade {uid}"
-
-            unit_cidade = unit_data["cidade"]
-            unit_uf = unit_data["uf"]
-
-            # LINK: Nome do Consultor (do lookup de Participantes)
-            consultor_id = m.get("consultor_venda")
-            consultor_nome = participantes_map.get(consultor_id, "N/A")
-
-            # LINK: Nome do Gerente (do lookup de Participantes)
-            gerente_id = m.get("gerente_venda")
-            gerente_nome = participantes_map.get(gerente_id, "N/A")
-
-            # Resolver Nome do Modelo e Tipo (Preferir raw_data do Data Lake)
-            model_name = raw_data.get("modelo_nome")
-            if not model_name:
-                model_id = m.get("modelo")
-                model_name = self.model_map.get(str(model_id), f"Modelo {model_id}")
-
-            # Resolver Tipo (Rede Distribuição)
-            type_name = raw_data.get("tipo_nome")
-            if not type_name:
-                type_id = m.get("tipo_franquia") or m.get("tipo_contrato")
-                type_name = self.type_map.get(str(type_id), f"Tipo {type_id}")
-
-            # Campos Adicionais solicitados
-            valor_aquisicao = m.get("valor", 0)
-
-            rede_distribuicao = type_name  # Usar nome completo do tipo como Rede
-
-            percentual_retencao = m.get("percentual_retencao", 0)
-            anos_contrato = m.get("anos", 0)
-
-            item = {
-                "codigo": uid,
-                "nome": unit_name,
-                "cidade": unit_cidade,
-                "uf": unit_uf,
-                "modelo": model_name,
-                "tipo": type_name,
-                "consultor": consultor_nome,
-                "gerente": gerente_nome,
-                "valor": valor_aquisicao,
-                "rede_distribuicao": rede_distribuicao,
-                "percentual_retencao": percentual_retencao,
-                "royalties": m.get("royalties", 0),
-                "crm": m.get("crm", 0),
-                "anos_contrato": anos_contrato,
-                "data": data_contrato_str,
-                "raw_data": raw_data,
-                "unit_raw_data": unit_data.get("raw_data", {}),
-            }
+        # Correção Temporária: Hardcode Modelo 40 ausente (Studio Store)
+        if 40 not in self.model_map:
+            self.model_map[40] = "Studio Store"
+        if "40" not in self.model_map:
+            self.model_map["40"] = "Studio Store"
 
-            # Lógica: Nova Unidade (Verificar se data_contrato está no intervalo)
-            # Filtrar status ativo
-            status = m.get("status")
+        # Classificação colunar: datas convertidas uma vez, máscaras calculadas em bloco
+        new_idx, cancelled_idx, upsell_idx = self._classify(modelos, start_date, end_date)
 
-            if data_contrato_str:
-                try:
-                    clean_date = data_contrato_str[:10]
-                    dt = datetime.strptime(clean_date, "%Y-%m-%d")
+        # Fallback: unidades fora do lookup têm o nome buscado na API Nexus, todas de uma vez
+        # (só as das linhas que entram no relatório)
+        selected = sorted({*new_idx, *cancelled_idx, *upsell_idx})
+        missing = {modelos[i].get("unidade") for i in selected} - unidades_map.keys()
+        if missing:
+            for uid, fetched_name in self.resolve_unit_names(missing).items():
+                unidades_map[uid] = {"nome": fetched_name, "cidade": "-", "uf": "-", "raw_data": {}}
 
-                    if start_dt <= dt <= end_dt:
-                        # Lógica de page.tsx:
-                        # newUnits = items.filter(i => i.status === "Ativo")
-                        # upsellUnits = ... raw_data.tipo_venda === 'Upsell' or is_upsell
+        # Itens montados apenas para as linhas selecionadas (uma linha pode ser nova e cancelada)
+        items = {i: self._build_item(modelos[i], unidades_map, participantes_map) for i in selected}
 
-                        is_upsell = raw_data.get("tipo_venda") == "Upsell" or raw_data.get("is_upsell") is True
+        return {
+            "date": end_date,
+            "start_date": start_date,
+            "new": [items[i] for i in new_idx],
+            "cancelled": [items[i] for i in cancelled_idx],
+            "upsell": [items[i] for i in upsell_idx],
+        }
 
-                        if is_upsell:
-                            upsell_units.append(item)
-                        elif status == "Ativo":
-                            new_units.append(item)
-                        else:
-                            # Pode estar Cancelada no mesmo período? Tratado abaixo.
-                            pass
+    @staticmethod
+    def _to_datetime64(values: list) -> np.ndarray:
+        """Datas "YYYY-MM-DD..." → datetime64[D] (NaT para vazias ou inválidas)."""
+        clean = [v[:10] if isinstance(v, str) else "" for v in values]
+        try:
+            return np.array(clean, dtype="datetime64[D]")
+        except ValueError:
+            pass
 
-                except Exception:
-                    pass
+        # Algum valor fora do ISO estrito (ex: "2025-3-5"): normaliza como o strptime original
+        for i, v in enumerate(clean):
+            if v and not (len(v) == 10 and v[4] == "-" and v[7] == "-" and v[:4].isdigit()):
+                try:
+                    clean[i] = datetime.strptime(v, "%Y-%m-%d").date().isoformat()
+                except ValueError:
+                    clean[i] = ""
+        try:
+            return np.array(clean, dtype="datetime64[D]")
+        except ValueError:
+            pass
 
-            # Lógica: Cancelada
-            # page.tsx: i.status === "Cancelado" || i.raw_data?.cancelamento === 1
-            is_cancelled = status == "Cancelado" or raw_data.get("cancelamento") == 1
+        # Formato ISO mas data inexistente (ex: 2025-02-30): NaT só para esses valores
+        out = np.full(len(clean), np.datetime64("NaT"), dtype="datetime64[D]")
+        for i, v in enumerate(clean):
+            try:
+                out[i] = np.datetime64(v, "D")
+            except ValueError:
+                pass
+        return out
 
-            if is_cancelled and data_cancelamento_str:
-                try:
-                    clean_cancel = data_cancelamento_str[:10]
-                    dt = datetime.strptime(clean_cancel, "%Y-%m-%d")
-                    if start_dt <= dt <= end_dt:
-                        cancelled_units.append(item)
-                except Exception:
-                    pass
+    def _classify(self, modelos: list, start_date: str, end_date: str) -> tuple[list, list, list]:
+        """
+        Índices (em ordem) das linhas novas, canceladas e de upsell no intervalo (inclusivo).
 
-            # Fallback para flag de cancelamento no data lake sem data?
-            # Geralmente precisamos da data para saber SE foi cancelada HOJE.
-            # Assumindo que data_cancelamento corresponde.
+        Lógica de page.tsx:
+          newUnits = contrato no período e status === "Ativo" (exceto upsell)
+          upsellUnits = contrato no período e (raw_data.tipo_venda === 'Upsell' ou is_upsell)
+          cancelledUnits = (status === "Cancelado" ou raw_data.cancelamento === 1) e cancelamento no período
+        """
+        if not modelos:
+            return [], [], []
+
+        start, end = np.datetime64(start_date, "D"), np.datetime64(end_date, "D")
+        # Preferir data (view Supabase) ou fallback
+        contrato = self._to_datetime64([m.get("data") or m.get("data_contrato") for m in modelos])
+        cancelamento = self._to_datetime64([m.get("data_cancelamento") for m in modelos])
+
+        status = np.array([m.get("status") or "" for m in modelos], dtype=object)
+        raws = [m.get("raw_data") or {} for m in modelos]
+        is_upsell = np.fromiter(
+            (r.get("tipo_venda") == "Upsell" or r.get("is_upsell") is True for r in raws), dtype=bool, count=len(raws)
+        )
+        flag_cancel = np.fromiter((r.get("cancelamento") == 1 for r in raws), dtype=bool, count=len(raws))
+
+        # Comparações com NaT são sempre falsas: linhas sem data ficam de fora
+        contrato_no_periodo = (contrato >= start) & (contrato <= end)
+        cancelado_no_periodo = (cancelamento >= start) & (cancelamento <= end)
+
+        upsell = contrato_no_periodo & is_upsell
+        new = contrato_no_periodo & ~is_upsell & (status == "Ativo")
+        cancelled = ((status == "Cancelado") | flag_cancel) & cancelado_no_periodo
+
+        return np.flatnonzero(new).tolist(), np.flatnonzero(cancelled).tolist(), np.flatnonzero(upsell).tolist()
+
+    def _build_item(self, m: dict, unidades_map: dict, participantes_map: dict) -> dict:
+        """Monta o item do relatório de um modelo, vinculando unidade, participantes, modelo e tipo."""
+        data_contrato_str = m.get("data") or m.get("data_contrato")
+        raw_data = m.get("raw_data") or {}
+
+        # LINK: Dados da Unidade (do lookup de Unidades)
+        uid = m.get("unidade")
+        unit_data = unidades_map[uid]
+
+        # Usar nome de nexus_unidades diretamente
+        base_unit_name = unit_data["nome"]
+        # Formato: "Unidade {ID} - {Nome}" se o nome ainda não estiver formatado
+        if base_unit_name and "Unidade" not in str(base_unit_name):
+            unit_name = f"Unidade {uid} - {base_unit_name}"
+        else:
+            unit_name = base_unit_name or f"Unidade {uid}"
+
+        # LINK: Nome do Consultor e do Gerente (do lookup de Participantes)
+        consultor_nome = participantes_map.get(m.get("consultor_venda"), "N/A")
+        gerente_nome = participantes_map.get(m.get("gerente_venda"), "N/A")
+
+        # Resolver Nome do Modelo e Tipo (Preferir raw_data do Data Lake)
+        model_name = raw_data.get("modelo_nome")
+        if not model_name:
+            model_id = m.get("modelo")
+            model_name = self.model_map.get(str(model_id), f"Modelo {model_id}")
+
+        # Resolver Tipo (Rede Distribuição)
+        type_name = raw_data.get("tipo_nome")
+        if not type_name:
+            type_id = m.get("tipo_franquia") or m.get("tipo_contrato")
+            type_name = self.type_map.get(str(type_id), f"Tipo {type_id}")
 
         return {
-            "date": end_date,
-            "start_date": start_date,
-            "new": new_units,
-            "cancelled": cancelled_units,
-            "upsell": upsell_units,
+            "codigo": uid,
+            "nome": unit_name,
+            "cidade": unit_data["cidade"],
+            "uf": unit_data["uf"],
+            "modelo": model_name,
+            "tipo": type_name,
+            "consultor": consultor_nome,
+            "gerente": gerente_nome,
+            "valor": m.get("valor", 0),
+            "rede_distribuicao": type_name,  # Usar nome completo do tipo como Rede
+            "percentual_retencao": m.get("percentual_retencao", 0),
+            "royalties": m.get("royalties", 0),
+            "crm": m.get("crm", 0),
+            "anos_contrato": m.get("anos", 0),
+            "data": data_contrato_str,
+            "raw_data": raw_data,
+            "unit_raw_data": unit_data.get("raw_data", {}),
         }
 
-    def fetch_unit_name(self, uid: int | str) -> str:
-        """Fallback para buscar nome de unidade única"""
+    def resolve_unit_names(self, uids) -> dict:
+        """
+        Nomes de várias unidades ausentes do lookup: primeiro o cache persistente (espelho
+        local, com TTL), depois a API Nexus em paralelo pela sessão com pool de conexões.
+        Nomes não resolvidos voltam como "Unidade {uid}" e não são cacheados.
+        """
+        uids = list(uids)
+        mirror = get_nexus_mirror()
+        cached = mirror.get_names("nexus_unidades", uids) if mirror is not None else {}
+        names = {uid: cached[str(uid)] for uid in uids if str(uid) in cached}
+
+        pending = [uid for uid in uids if uid not in names]
+        if pending:
+            logger.info(f"{len(pending)} units not in cache, fetching from API...")
+            workers = max(1, min(UNIDADES_CONFIG["name_resolver_workers"], len(pending)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="unit-name") as executor:
+                fetched = dict(zip(pending, executor.map(self._fetch_unit_name, pending)))
+            resolved = {uid: nome for uid, nome in fetched.items() if nome}
+            if mirror is not None:
+                mirror.put_names("nexus_unidades", resolved, UNIDADES_CONFIG["name_cache_ttl_seconds"])
+            names.update({uid: fetched[uid] or f"Unidade {uid}" for uid in pending})
+        return names
+
+    def _fetch_unit_name(self, uid: int | str) -> str | None:
+        """Nome da unidade na API Nexus, ou None se não encontrada/indisponível."""
         try:
             url = f"{self.api_url}/unidades/{uid}/"
-            resp = requests.get(url, headers=self.headers, timeout=5)
+            resp = self.session.get(url, headers=self.headers, timeout=5)
             if resp.status_code == 200:
                 return resp.json().get("nome")
         except Exception:
             pass
-        return f"Unidade {uid}"
+        return None
+
+    def fetch_unit_name(self, uid: int | str) -> str:
+        """Fallback para buscar nome de unidade única"""
+        return self.resolve_unit_names([uid])[uid]
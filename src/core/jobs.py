@@ -1,3 +1,4 @@
+from src.core.clients.query_budget import scheduled_run
 from src.core.services.supabase_service import SupabaseService
 from src.core.utils.logger import get_logger
 from src.modules.metas.runner import MetasAutomation
@@ -11,8 +12,10 @@ def job_metas(recipients=None, template_content=None):
     """Executa a automação de Metas (Power BI)."""
     logger.info("Iniciando Metas Automation (Dynamic)")
     SupabaseService().log_event("job_start", {"job": "metas"})
-    ma = MetasAutomation()
-    ma.run(recipients=recipients, template_content=template_content)
+    # Prioridade "scheduled": reserva a cota do Power BI enquanto o relatório é montado
+    with scheduled_run("metas"):
+        ma = MetasAutomation()
+        ma.run(recipients=recipients, template_content=template_content)
 
 
 def job_ranking_geral(recipients=None, template_content=None):
@@ -30,8 +33,9 @@ def job_painel_ina(recipients=None, template_content=None):
     logger.info("Iniciando Painel INA Automation")
     SupabaseService().log_event("job_start", {"job": "painel_ina"})
 
-    ina = InaAutomation()
-    ina.run(recipients=recipients, template_content=template_content)
+    with scheduled_run("painel_ina"):
+        ina = InaAutomation()
+        ina.run(recipients=recipients, template_content=template_content)
 
 
 def job_unidades(recipients=None, template_content=None, report_type="daily"):
@@ -41,8 +45,9 @@ def job_unidades(recipients=None, template_content=None, report_type="daily"):
     logger.info(f"Iniciando Unidades Automation ({report_type})")
     SupabaseService().log_event("job_start", {"job": f"unidades_{report_type}"})
 
-    ua = UnidadesAutomation()
-    ua.run(report_type=report_type, recipients=recipients, template_content=template_content)
+    with scheduled_run(f"unidades_{report_type}"):
+        ua = UnidadesAutomation()
+        ua.run(report_type=report_type, recipients=recipients, template_content=template_content)
 
 
 def job_refresh_pbi_token():
@@ -58,14 +63,18 @@ def job_refresh_pbi_token():
 
     try:
         pbi = PowerBIClient()
-        if pbi.authenticate():
-            token = pbi.token
-            expires_at = pbi.token_expiry
+        # Token novo do Azure AD: o atual do broker pode ter sido adotado de um store e estar perto de expirar
+        renewed = pbi.refresh_token()
+        if renewed:
+            token, expires_at = renewed
 
             pbi_token_data = {
                 "token": token,
                 "expires_at": expires_at,
-                "updated_at": datetime.now().isoformat()
+                "updated_at": datetime.now().isoformat(),
+                # Identifica o app para que outros processos só reaproveitem o token certo
+                "tenant": pbi.tenant,
+                "client_id": pbi.client_id,
             }
 
             # Persistir no Supabase
@@ -137,9 +146,10 @@ def job_refresh_dashboards(dashboards: list[str]) -> dict:
     try:
         pbi = PowerBIClient()
 
-        # Etapa 1: Gera o token e persiste no Supabase antes de qualquer refresh
+        # Etapa 1: Gera um token novo e persiste no Supabase antes de qualquer refresh
         logger.info("[JOB] Autenticando no Azure AD para refresh dos dashboards...")
-        if not pbi.authenticate():
+        renewed = pbi.refresh_token()
+        if not renewed:
             logger.error("[JOB] Falha na autenticação Azure AD. Refresh cancelado.")
             supabase.log_event("job_error", {
                 "job": "pbi_refresh_dashboards",
@@ -148,10 +158,13 @@ def job_refresh_dashboards(dashboards: list[str]) -> dict:
             return {}
 
         # Persiste o token gerado para uso futuro (ex: GET /pbi/token)
+        token, expires_at = renewed
         supabase.update_setting("pbi_access_token", {
-            "token": pbi.token,
-            "expires_at": pbi.token_expiry,
+            "token": token,
+            "expires_at": expires_at,
             "updated_at": datetime.now().isoformat(),
+            "tenant": pbi.tenant,
+            "client_id": pbi.client_id,
         })
         logger.info("[JOB] Token Bearer gerado e persistido no Supabase.")
 
@@ -208,6 +221,9 @@ JOB_MAPPING = {
     "pbi_refresh_dashboards": job_refresh_dashboards,
 }
 
+# Jobs que consultam o Power BI: o scheduler reserva a cota na janela de cada disparo
+PBI_REPORT_JOBS = {"metas_diarias", "ranking_geral", "painel_ina", "unidades_diarias", "unidades_semanais"}
+
 
 def safe_run_job(job_func, recipients=None, template_content=None):
     """Wrapper para executar jobs com tratamento de erro e logs."""
@@ -1,11 +1,15 @@
 """
 Centralized DAX Queries for Power BI Data Fetching.
 Separating queries from logic makes it easier to maintain and update the semantic model references.
+
+As consultas são DaxTemplate compilados uma vez na importação; as funções get_*_query
+apenas preenchem os parâmetros tipados (datas aceitam date, "YYYY-MM-DD" ou "DATE(y, m, d)").
 """
 
+from src.core.utils.dax_template import DaxTemplate
 
-def get_metas_com_op_query(date_start, date_end):
-    return f"""
+_METAS_COM_OP = DaxTemplate(
+    """
     EVALUATE
     CALCULATETABLE(
         ROW(
@@ -16,13 +20,20 @@ def get_metas_com_op_query(date_start, date_end):
             "Operacional_Meta2", [Total_Operacional_Meta2],
             "Operacional_Meta3", [Total_Operacional_Meta3]
         ),
-        DATESBETWEEN('Calendario'[Date], {date_start}, {date_end})
+        DATESBETWEEN('Calendario'[Date], $date_start, $date_end)
     )
-    """
+    """,
+    date_start="date",
+    date_end="date",
+)
 
 
-def get_percentuais_gs_query(date_start, date_end):
-    return f"""
+def get_metas_com_op_query(date_start, date_end):
+    return _METAS_COM_OP.render(date_start=date_start, date_end=date_end)
+
+
+_PERCENTUAIS_GS = DaxTemplate(
+    """
     EVALUATE
     CALCULATETABLE(
         ROW(
@@ -30,13 +41,20 @@ def get_percentuais_gs_query(date_start, date_end):
             "Pct_Meta2", [% Meta 2 GS],
             "Pct_Meta3", [% Meta 3 GS]
         ),
-        DATESBETWEEN('Calendario'[Date], {date_start}, {date_end})
+        DATESBETWEEN('Calendario'[Date], $date_start, $date_end)
     )
-    """
+    """,
+    date_start="date",
+    date_end="date",
+)
 
 
-def get_percentuais_com_op_query(date_start, date_end):
-    return f"""
+def get_percentuais_gs_query(date_start, date_end):
+    return _PERCENTUAIS_GS.render(date_start=date_start, date_end=date_end)
+
+
+_PERCENTUAIS_COM_OP = DaxTemplate(
+    """
     EVALUATE
     CALCULATETABLE(
         ROW(
@@ -47,13 +65,20 @@ def get_percentuais_com_op_query(date_start, date_end):
             "Op_Pct2", [% Meta 2 OPERACIONAL],
             "Op_Pct3", [% Meta 3 OPERACIONAL]
         ),
-        DATESBETWEEN('Calendario'[Date], {date_start}, {date_end})
+        DATESBETWEEN('Calendario'[Date], $date_start, $date_end)
     )
-    """
+    """,
+    date_start="date",
+    date_end="date",
+)
 
 
-def get_receitas_query(date_start, date_end):
-    return f"""
+def get_percentuais_com_op_query(date_start, date_end):
+    return _PERCENTUAIS_COM_OP.render(date_start=date_start, date_end=date_end)
+
+
+_RECEITAS = DaxTemplate(
+    """
     EVALUATE
     CALCULATETABLE(
         ROW(
@@ -73,38 +98,143 @@ def get_receitas_query(date_start, date_end):
                 COALESCE([Valor_OutrasReceitas], 0)
             )
         ),
-        DATESBETWEEN('Calendario'[Date], {date_start}, {date_end})
+        DATESBETWEEN('Calendario'[Date], $date_start, $date_end)
     )
+    """,
+    date_start="date",
+    date_end="date",
+)
+
+
+def get_receitas_query(date_start, date_end):
+    return _RECEITAS.render(date_start=date_start, date_end=date_end)
+
+
+_METAS_DEPARTAMENTO = DaxTemplate(
     """
+    SELECTCOLUMNS(
+        FILTER($tabela, $tabela[Mês] = $mes),
+        "Departamento", $departamento,
+        "Tipo", $tabela[TIPO],
+        "Meta", $tabela[Metas]
+    )
+    """,
+    tabela="table",
+    mes="date",
+    departamento="string",
+)
+_UNION = DaxTemplate("EVALUATE UNION($tabelas)", tabelas="fragments")
+_EVALUATE = DaxTemplate("EVALUATE $tabela", tabela="fragments")
 
 
-def get_metas_dept_query(tabela, month_filter):
-    return f"""
+def get_metas_departamentos_query(tabelas, month_filter):
+    """
+    Metas de todos os departamentos em uma única consulta.
+    tabelas: lista de (departamento, tabela_metas). Cada tabela *_Metas é filtrada pelo mês
+    e projetada como (Departamento, Tipo, Meta); o pivot Meta 1/2/3 é feito no cliente.
+    """
+    selects = [
+        _METAS_DEPARTAMENTO.render(tabela=tabela, mes=month_filter, departamento=departamento)
+        for departamento, tabela in tabelas
+    ]
+    if len(selects) == 1:
+        return _EVALUATE.render(tabela=selects[0])
+    return _UNION.render(tabelas=selects)
+
+
+_PERCENTUAL_COLUNA = DaxTemplate("$coluna, $medida", coluna="string", medida="measure")
+_PERCENTUAIS_DEPARTAMENTOS = DaxTemplate(
+    """
     EVALUATE
-    FILTER(
-        '{tabela}',
-        '{tabela}'[Mês] = {month_filter}
+    CALCULATETABLE(
+        ROW($colunas),
+        DATESBETWEEN('Calendario'[Date], $date_start, $date_end)
+    )
+    """,
+    colunas="fragments",
+    date_start="date",
+    date_end="date",
+)
+
+
+def get_percentuais_departamentos_query(prefixos, date_start, date_end):
+    """Percentuais % Meta 1/2/3 de todos os departamentos em um único ROW ("{PREFIXO}_Pct{n}")."""
+    colunas = [
+        _PERCENTUAL_COLUNA.render(coluna=f"{prefixo}_Pct{n}", medida=f"% Meta {n} {prefixo}")
+        for prefixo in prefixos
+        for n in (1, 2, 3)
+    ]
+    return _PERCENTUAIS_DEPARTAMENTOS.render(colunas=colunas, date_start=date_start, date_end=date_end)
+
+
+_METAS_DEPARTAMENTO_PERIODO = DaxTemplate(
+    """
+    SELECTCOLUMNS(
+        FILTER($tabela, $tabela[Mês] >= $inicio && $tabela[Mês] <= $fim),
+        "Departamento", $departamento,
+        "Mes", $tabela[Mês],
+        "Tipo", $tabela[TIPO],
+        "Meta", $tabela[Metas]
     )
+    """,
+    tabela="table",
+    inicio="date",
+    fim="date",
+    departamento="string",
+)
+
+
+def get_metas_departamentos_periodo_query(tabelas, first_month, last_month):
+    """
+    Como get_metas_departamentos_query, mas para todos os meses entre first_month e
+    last_month (primeiros dias de mês) em uma única consulta, com a coluna "Mes".
     """
+    selects = [
+        _METAS_DEPARTAMENTO_PERIODO.render(
+            tabela=tabela, inicio=first_month, fim=last_month, departamento=departamento
+        )
+        for departamento, tabela in tabelas
+    ]
+    if len(selects) == 1:
+        return _EVALUATE.render(tabela=selects[0])
+    return _UNION.render(tabelas=selects)
 
 
-def get_percentuais_dept_query(prefixo, date_start, date_end):
-    return f"""
+_MES = DaxTemplate("{$inicio, $fim}", inicio="date_text", fim="date_text")
+_COLUNA = DaxTemplate("$coluna, $expressao", coluna="string", expressao="fragments")
+_POR_MES = DaxTemplate(
+    """
     EVALUATE
-    CALCULATETABLE(
-        ROW(
-            "Pct1", [% Meta 1 {prefixo}],
-            "Pct2", [% Meta 2 {prefixo}],
-            "Pct3", [% Meta 3 {prefixo}]
-        ),
-        DATESBETWEEN('Calendario'[Date], {date_start}, {date_end})
+    GENERATE(
+        DATATABLE("Inicio", DATETIME, "Fim", DATETIME, {$meses}),
+        CALCULATETABLE(
+            ROW($colunas),
+            DATESBETWEEN('Calendario'[Date], [Inicio], [Fim])
+        )
     )
+    """,
+    meses="fragments",
+    colunas="fragments",
+)
+
+
+def get_por_mes_query(columns, periodos):
+    """
+    Avalia as colunas de um ROW mensal para vários meses em uma única consulta.
+
+    columns: [(nome, expressão)] — normalmente parse_scalar_query(<consulta mensal>).columns,
+    de modo que os grupos de medidas continuam definidos só nas consultas acima.
+    periodos: [(inicio, fim)] de cada mês. Cada linha do resultado traz "[Inicio]" e
+    "[Fim]" do mês, seguidas das colunas do ROW ("[Nome]").
     """
+    meses = [_MES.render(inicio=inicio, fim=fim) for inicio, fim in periodos]
+    colunas = [_COLUNA.render(coluna=nome, expressao=expressao) for nome, expressao in columns]
+    return _POR_MES.render(meses=meses, colunas=colunas)
 
 
-def get_receitas_liquido_query(date_start, date_end):
-    # Líquido = Realizado - Repasse por departamento
-    return f"""
+# Líquido = Realizado - Repasse por departamento
+_RECEITAS_LIQUIDO = DaxTemplate(
+    """
     EVALUATE
     CALCULATETABLE(
         ROW(
@@ -123,26 +253,106 @@ def get_receitas_liquido_query(date_start, date_end):
             "Franchising_Repasse", COALESCE([Valor_Franchising_Repasse], 0),
             "Tecnologia_Repasse", COALESCE([Valor_PJ_Repasse], 0)
         ),
-        DATESBETWEEN('Calendario'[Date], {date_start}, {date_end})
+        DATESBETWEEN('Calendario'[Date], $date_start, $date_end)
     )
-    """
+    """,
+    date_start="date",
+    date_end="date",
+)
 
 
-def get_unidades_summary_query(date_start, date_end):
-    """
-    Retorna apenas UnidadesPagantes via DAX.
-    NovasUnidades e UnidadesInativadas são derivadas do len() das listas em fetch_dashboard_data.
+def get_receitas_liquido_query(date_start, date_end):
+    return _RECEITAS_LIQUIDO.render(date_start=date_start, date_end=date_end)
+
+
+_UNIDADES_SUMMARY = DaxTemplate(
     """
-    return f"""
     EVALUATE
     CALCULATETABLE(
         ROW(
             "UnidadesPagantes", [unidades_pagantes]
         ),
-        DATESBETWEEN('Calendario'[Date], "{date_start}", "{date_end}"),
+        DATESBETWEEN('Calendario'[Date], $date_start, $date_end),
         FILTER(ALL('Unidades (2)'[nome]), 'Unidades (2)'[nome] <> "")
     )
+    """,
+    date_start="date_text",
+    date_end="date_text",
+)
+
+
+def get_unidades_summary_query(date_start, date_end):
     """
+    Retorna apenas UnidadesPagantes via DAX.
+    NovasUnidades e UnidadesInativadas são derivadas do len() das listas em fetch_dashboard_data.
+    """
+    return _UNIDADES_SUMMARY.render(date_start=date_start, date_end=date_end)
+
+
+# Projeções das listas de unidades, compartilhadas pelas consultas por status e pela consulta combinada.
+# {dia} recebe a coluna de data extra usada pela consulta combinada (partições diárias).
+_UNIDADES_NOVAS_TABELA = """
+    FILTER(
+        SELECTCOLUMNS(
+            GENERATE(
+                FILTER('modelos_Ativos',
+                    NOT ISBLANK('modelos_Ativos'[data])
+                    && NOT ISBLANK('modelos_Ativos'[unidade])
+                    && 'modelos_Ativos'[unidade] <> 0
+                ),
+                VAR vUnidade = 'modelos_Ativos'[unidade]
+                RETURN ROW(
+                    "Nome_Virtual",   CALCULATE(MAX('Unidades (2)'[nome]), 'Unidades (2)'[codigo] = vUnidade),
+                    "UF_Virtual",     CALCULATE(MAX('Unidades (2)'[uf]),   'Unidades (2)'[codigo] = vUnidade),
+                    "Modelo_Virtual", CALCULATE(MAX('Desc_Modelos'[nome]))
+                )
+            ),
+            "Nome",   [Nome_Virtual],
+            "UF",     [UF_Virtual],
+            "Modelo", [Modelo_Virtual],
+            "Codigo", 'modelos_Ativos'[unidade],
+            "Valor",  'modelos_Ativos'[valor],
+            "Anos",   'modelos_Ativos'[anos]{dia}
+        ),
+        NOT ISBLANK([Nome]) && [Nome] <> ""
+    )
+"""
+
+_UNIDADES_INATIVAS_TABELA = """
+    SELECTCOLUMNS(
+        GENERATE(
+            FILTER('Modelos_Inativos',
+                NOT ISBLANK('Modelos_Inativos'[data_inativacao])
+                && NOT ISBLANK('Modelos_Inativos'[unidade])
+                && NOT ISBLANK(RELATED('Desc_Modelos'[nome]))
+            ),
+            VAR vUnidade = 'Modelos_Inativos'[unidade]
+            RETURN ROW(
+                "Nome_Virtual",   CALCULATE(MAX('Unidades'[nome]), 'Unidades'[codigo] = vUnidade),
+                "UF_Virtual",     CALCULATE(MAX('Unidades'[uf]),   'Unidades'[codigo] = vUnidade),
+                "Modelo_Virtual", RELATED('Desc_Modelos'[nome])
+            )
+        ),
+        "Nome",   [Nome_Virtual],
+        "UF",     [UF_Virtual],
+        "Modelo", [Modelo_Virtual],
+        "Codigo", 'Modelos_Inativos'[unidade],
+        "Valor",  'Modelos_Inativos'[valor],
+        "Anos",   'Modelos_Inativos'[anos]{dia}
+    )
+"""
+
+_UNIDADES_NOVAS = DaxTemplate(
+    f"""
+    EVALUATE
+    CALCULATETABLE(
+        {_UNIDADES_NOVAS_TABELA.format(dia="")},
+        DATESBETWEEN('Calendario'[Date], $date_start, $date_end)
+    )
+    """,
+    date_start="date_text",
+    date_end="date_text",
+)
 
 
 def get_unidades_novas_query(date_start, date_end):
@@ -152,36 +362,20 @@ def get_unidades_novas_query(date_start, date_end):
       - Nome / UF      : 'Unidades (2)'[nome|uf] join em [codigo] = [unidade]
       - Modelo         : CALCULATE(MAX('Desc_Modelos'[nome])) via relacionamento
     """
-    return f"""
+    return _UNIDADES_NOVAS.render(date_start=date_start, date_end=date_end)
+
+
+_UNIDADES_INATIVAS = DaxTemplate(
+    f"""
     EVALUATE
     CALCULATETABLE(
-        FILTER(
-            SELECTCOLUMNS(
-                GENERATE(
-                    FILTER('modelos_Ativos',
-                        NOT ISBLANK('modelos_Ativos'[data])
-                        && NOT ISBLANK('modelos_Ativos'[unidade])
-                        && 'modelos_Ativos'[unidade] <> 0
-                    ),
-                    VAR vUnidade = 'modelos_Ativos'[unidade]
-                    RETURN ROW(
-                        "Nome_Virtual",   CALCULATE(MAX('Unidades (2)'[nome]), 'Unidades (2)'[codigo] = vUnidade),
-                        "UF_Virtual",     CALCULATE(MAX('Unidades (2)'[uf]),   'Unidades (2)'[codigo] = vUnidade),
-                        "Modelo_Virtual", CALCULATE(MAX('Desc_Modelos'[nome]))
-                    )
-                ),
-                "Nome",   [Nome_Virtual],
-                "UF",     [UF_Virtual],
-                "Modelo", [Modelo_Virtual],
-                "Codigo", 'modelos_Ativos'[unidade],
-                "Valor",  'modelos_Ativos'[valor],
-                "Anos",   'modelos_Ativos'[anos]
-            ),
-            NOT ISBLANK([Nome]) && [Nome] <> ""
-        ),
-        DATESBETWEEN('Calendario'[Date], "{date_start}", "{date_end}")
+        {_UNIDADES_INATIVAS_TABELA.format(dia="")},
+        DATESBETWEEN('Calendario'[Date], $date_start, $date_end)
     )
-    """
+    """,
+    date_start="date_text",
+    date_end="date_text",
+)
 
 
 def get_unidades_inativas_query(date_start, date_end):
@@ -191,33 +385,34 @@ def get_unidades_inativas_query(date_start, date_end):
       - Nome / UF      : 'Unidades'[nome|uf] join em [codigo] = [unidade]
       - Modelo         : RELATED('Desc_Modelos'[nome]) via relacionamento direto
     """
-    return f"""
+    return _UNIDADES_INATIVAS.render(date_start=date_start, date_end=date_end)
+
+
+_NOVAS_COM_DIA = _UNIDADES_NOVAS_TABELA.format(dia=""", "Dia", 'modelos_Ativos'[data]""")
+_INATIVAS_COM_DIA = _UNIDADES_INATIVAS_TABELA.format(dia=""", "Dia", 'Modelos_Inativos'[data_inativacao]""")
+
+_UNIDADES_LISTAS = DaxTemplate(
+    f"""
     EVALUATE
     CALCULATETABLE(
-        SELECTCOLUMNS(
-            GENERATE(
-                FILTER('Modelos_Inativos',
-                    NOT ISBLANK('Modelos_Inativos'[data_inativacao])
-                    && NOT ISBLANK('Modelos_Inativos'[unidade])
-                    && NOT ISBLANK(RELATED('Desc_Modelos'[nome]))
-                ),
-                VAR vUnidade = 'Modelos_Inativos'[unidade]
-                RETURN ROW(
-                    "Nome_Virtual",   CALCULATE(MAX('Unidades'[nome]), 'Unidades'[codigo] = vUnidade),
-                    "UF_Virtual",     CALCULATE(MAX('Unidades'[uf]),   'Unidades'[codigo] = vUnidade),
-                    "Modelo_Virtual", RELATED('Desc_Modelos'[nome])
-                )
-            ),
-            "Nome",   [Nome_Virtual],
-            "UF",     [UF_Virtual],
-            "Modelo", [Modelo_Virtual],
-            "Codigo", 'Modelos_Inativos'[unidade],
-            "Valor",  'Modelos_Inativos'[valor],
-            "Anos",   'Modelos_Inativos'[anos]
+        UNION(
+            ADDCOLUMNS({_NOVAS_COM_DIA}, "Status", "Nova"),
+            ADDCOLUMNS({_INATIVAS_COM_DIA}, "Status", "Inativada")
         ),
-        DATESBETWEEN('Calendario'[Date], "{date_start}", "{date_end}")
+        DATESBETWEEN('Calendario'[Date], $date_start, $date_end)
     )
+    """,
+    date_start="date_text",
+    date_end="date_text",
+)
+
+
+def get_unidades_listas_query(date_start, date_end):
+    """
+    Novas e inativadas em uma única consulta: UNION das duas projeções acima
+    com as colunas Status ("Nova" | "Inativada") e Dia (data do contrato ou da inativação).
     """
+    return _UNIDADES_LISTAS.render(date_start=date_start, date_end=date_end)
 
 
 def get_unidades_list_query(date_start, date_end, status="Nova"):
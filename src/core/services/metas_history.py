@@ -0,0 +1,192 @@
+"""
+Histórico local dos valores numéricos de metas.
+
+Cada execução do relatório de metas grava os números brutos (antes de virarem
+strings em format_currency) como um snapshot por data de referência:
+(data, departamento, medida) → valor. O armazenamento é um SQLite com chave
+primária ordenada por data (WITHOUT ROWID), o que mantém o arquivo compacto e
+torna as leituras de uma série ou de um snapshot uma busca por intervalo no índice.
+
+Com isso, gráficos de tendência, variação dia a dia e a regeneração de relatórios
+de períodos passados são lidos do disco em milissegundos, sem ir ao Power BI.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from src.config import METAS_HISTORY_CONFIG
+from src.core.utils.logger import get_logger
+
+logger = get_logger("metas_history")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metas_history (
+    ref_date     TEXT NOT NULL,
+    departamento TEXT NOT NULL,
+    medida       TEXT NOT NULL,
+    valor        REAL,
+    recorded_at  REAL NOT NULL,
+    PRIMARY KEY (ref_date, departamento, medida)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_metas_history_serie ON metas_history(departamento, medida, ref_date);
+"""
+
+# Snapshot: {departamento: {medida: valor}}
+Snapshot = dict[str, dict[str, float | None]]
+
+
+def _as_float(value) -> float | None:
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class MetasHistoryStore:
+    """
+    Séries diárias de metas por (departamento, medida) em SQLite (WAL).
+
+    Falhas de I/O nunca propagam: o histórico é complementar ao relatório e,
+    se indisponível, as leituras retornam vazio e as gravações são ignoradas.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout = 10000")
+            if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != "wal":
+                conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def record(self, ref_date: date, snapshot: Snapshot) -> int:
+        """Grava (ou substitui) o snapshot da data de referência. Retorna o número de valores gravados."""
+        day = ref_date.isoformat()
+        now = time.time()
+        rows = [
+            (day, departamento, medida, _as_float(valor), now)
+            for departamento, medidas in snapshot.items()
+            for medida, valor in medidas.items()
+        ]
+        if not rows:
+            return 0
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO metas_history (ref_date, departamento, medida, valor, recorded_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return len(rows)
+        except sqlite3.Error as e:
+            logger.warning(f"Falha ao gravar histórico de metas ({day}): {e}")
+            return 0
+
+    def snapshot(self, ref_date: date) -> Snapshot:
+        """Todos os valores gravados para a data ({} se não houver)."""
+        try:
+            rows = self._conn().execute(
+                "SELECT departamento, medida, valor FROM metas_history WHERE ref_date = ?",
+                (ref_date.isoformat(),),
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Falha ao ler histórico de metas ({ref_date}): {e}")
+            return {}
+        result: Snapshot = {}
+        for departamento, medida, valor in rows:
+            result.setdefault(departamento, {})[medida] = valor
+        return result
+
+    def series(
+        self, departamento: str, medida: str, start: date | None = None, end: date | None = None
+    ) -> list[tuple[date, float | None]]:
+        """Série (data, valor) de uma medida, em ordem cronológica, opcionalmente limitada ao intervalo."""
+        try:
+            rows = self._conn().execute(
+                "SELECT ref_date, valor FROM metas_history "
+                "WHERE departamento = ? AND medida = ? AND ref_date >= ? AND ref_date <= ? ORDER BY ref_date",
+                (
+                    departamento,
+                    medida,
+                    start.isoformat() if start else "",
+                    end.isoformat() if end else "9999-12-31",
+                ),
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Falha ao ler série {departamento}/{medida}: {e}")
+            return []
+        return [(date.fromisoformat(day), valor) for day, valor in rows]
+
+    def dates(self, start: date | None = None, end: date | None = None) -> list[date]:
+        """Datas de referência com snapshot gravado, em ordem cronológica."""
+        try:
+            rows = self._conn().execute(
+                "SELECT DISTINCT ref_date FROM metas_history WHERE ref_date >= ? AND ref_date <= ? ORDER BY ref_date",
+                (start.isoformat() if start else "", end.isoformat() if end else "9999-12-31"),
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Falha ao listar datas do histórico de metas: {e}")
+            return []
+        return [date.fromisoformat(day) for (day,) in rows]
+
+    def previous_date(self, ref_date: date) -> date | None:
+        """Última data com snapshot anterior a ref_date (base da variação dia a dia)."""
+        try:
+            row = self._conn().execute(
+                "SELECT MAX(ref_date) FROM metas_history WHERE ref_date < ?", (ref_date.isoformat(),)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Falha ao consultar histórico de metas: {e}")
+            return None
+        return date.fromisoformat(row[0]) if row and row[0] else None
+
+    def deltas(self, ref_date: date) -> Snapshot:
+        """
+        Variação de cada medida entre ref_date e o snapshot anterior.
+        Medidas sem valor em um dos dois dias ficam de fora.
+        """
+        previous = self.previous_date(ref_date)
+        if previous is None:
+            return {}
+        atual, anterior = self.snapshot(ref_date), self.snapshot(previous)
+        result: Snapshot = {}
+        for departamento, medidas in atual.items():
+            for medida, valor in medidas.items():
+                base = anterior.get(departamento, {}).get(medida)
+                if valor is not None and base is not None:
+                    result.setdefault(departamento, {})[medida] = valor - base
+        return result
+
+
+_store: MetasHistoryStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_metas_history() -> MetasHistoryStore | None:
+    """Store compartilhado do processo, ou None se o histórico estiver desabilitado."""
+    global _store
+    if not METAS_HISTORY_CONFIG["enabled"]:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = MetasHistoryStore(METAS_HISTORY_CONFIG["path"])
+        return _store
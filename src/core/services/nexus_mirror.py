@@ -0,0 +1,242 @@
+"""
+Espelho local das tabelas de dimensão do Nexus (participantes e unidades).
+
+As tabelas nexus_* do Supabase são copiadas para um SQLite local (WAL) compartilhado
+por todos os processos do projeto. Depois da carga inicial, cada sincronização busca
+apenas as linhas com updated_at a partir da última marca d'água (watermark), de modo
+que os relatórios diário, semanal e mensal leem as dimensões do disco em vez de
+recarregar as tabelas inteiras a cada execução.
+
+Como o delta por updated_at não enxerga exclusões, uma carga completa é refeita a
+cada full_sync_seconds. Se a tabela não tiver a coluna updated_at, toda sincronização
+vira carga completa (o espelho continua servindo as leituras entre elas).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from src.config import NEXUS_MIRROR_CONFIG
+from src.core.services.supabase_service import SupabaseService
+from src.core.utils.logger import get_logger
+
+logger = get_logger("nexus_mirror")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nexus_dim (
+    tabela     TEXT NOT NULL,
+    chave      TEXT NOT NULL,
+    payload    TEXT NOT NULL,
+    updated_at TEXT,
+    PRIMARY KEY (tabela, chave)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_nexus_dim_updated ON nexus_dim(tabela, updated_at);
+CREATE TABLE IF NOT EXISTS nexus_nomes (
+    tabela     TEXT NOT NULL,
+    chave      TEXT NOT NULL,
+    nome       TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (tabela, chave)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS nexus_sync (
+    tabela       TEXT PRIMARY KEY,
+    watermark    TEXT,
+    synced_at    REAL NOT NULL,
+    full_sync_at REAL NOT NULL
+);
+"""
+
+
+class NexusMirror:
+    """
+    Cópia local de tabelas nexus_* sincronizada por delta de updated_at.
+
+    Falhas de rede ou de I/O nunca propagam: sync() retorna False e as leituras
+    continuam servindo o último estado gravado (ou vazio, se nunca houve carga).
+    """
+
+    def __init__(self, path: str, sync_interval_seconds: int = 300, full_sync_seconds: int = 86400):
+        self._path = path
+        self._sync_interval = sync_interval_seconds
+        self._full_sync_interval = full_sync_seconds
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout = 10000")
+            if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != "wal":
+                conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # ── Sincronização ───────────────────────────────────────────────────────
+
+    def _state(self, table: str) -> tuple[str | None, float, float] | None:
+        row = (
+            self._conn()
+            .execute("SELECT watermark, synced_at, full_sync_at FROM nexus_sync WHERE tabela = ?", (table,))
+            .fetchone()
+        )
+        return tuple(row) if row else None
+
+    @staticmethod
+    def _key(row: dict) -> str | None:
+        key = row.get("id")
+        if key is None:
+            key = row.get("codigo")
+        return None if key is None else str(key)
+
+    def _write(self, table: str, rows: list, full: bool, watermark: str | None) -> None:
+        now = time.time()
+        records = [
+            (table, key, json.dumps(row, ensure_ascii=False, default=str), row.get("updated_at"))
+            for row in rows
+            if (key := self._key(row)) is not None
+        ]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if full:
+                conn.execute("DELETE FROM nexus_dim WHERE tabela = ?", (table,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO nexus_dim (tabela, chave, payload, updated_at) VALUES (?, ?, ?, ?)", records
+            )
+            conn.execute(
+                "INSERT INTO nexus_sync (tabela, watermark, synced_at, full_sync_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(tabela) DO UPDATE SET watermark = excluded.watermark, synced_at = excluded.synced_at, "
+                "full_sync_at = CASE WHEN ? THEN excluded.full_sync_at ELSE nexus_sync.full_sync_at END",
+                (table, watermark, now, now, full),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def sync(self, table: str, select: str = "*", force: bool = False) -> bool:
+        """
+        Atualiza o espelho da tabela. Dentro de sync_interval_seconds desde a última
+        sincronização (de qualquer processo), não faz nada. Retorna False se falhar.
+        """
+        with self._sync_lock:
+            try:
+                state = self._state(table)
+                now = time.time()
+                if state and not force and now - state[1] < self._sync_interval:
+                    return True
+
+                if select != "*" and "updated_at" not in select.split(","):
+                    select = f"{select},updated_at"
+                svc = SupabaseService()
+
+                watermark = state[0] if state else None
+                full = state is None or watermark is None or now - state[2] >= self._full_sync_interval
+                if not full:
+                    # gte: linhas com o mesmo updated_at da marca anterior são regravadas (idempotente)
+                    rows = svc.fetch_table_parallel(
+                        table, {"select": select, "updated_at": f"gte.{watermark}"}, order="updated_at.asc,id.asc"
+                    )
+                    if rows is None:
+                        full = True
+
+                if full:
+                    rows = svc.fetch_table_parallel(table, {"select": select})
+                    if rows is None and select != "*":
+                        # Tabela sem updated_at (ou projeção inválida): carga completa sem projeção
+                        rows = svc.fetch_table_parallel(table, {"select": "*"})
+                    if rows is None:
+                        logger.warning(f"Falha ao sincronizar espelho de {table}.")
+                        return False
+
+                stamps = [r["updated_at"] for r in rows if r.get("updated_at")]
+                new_watermark = max(stamps, default=None) if full else max([watermark, *stamps])
+                self._write(table, rows, full, new_watermark)
+                logger.info(f"Espelho {table}: {len(rows)} linhas {'(carga completa)' if full else '(delta)'}.")
+                return True
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Falha ao gravar espelho de {table}: {e}")
+                return False
+
+    # ── Leitura ─────────────────────────────────────────────────────────────
+
+    def rows(self, table: str) -> list[dict]:
+        """Todas as linhas espelhadas da tabela ([] se nunca sincronizada)."""
+        try:
+            cur = self._conn().execute("SELECT payload FROM nexus_dim WHERE tabela = ?", (table,))
+            return [json.loads(payload) for (payload,) in cur]
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Falha ao ler espelho de {table}: {e}")
+            return []
+
+    def get(self, table: str, key: int | str) -> dict | None:
+        """Linha pela chave (id, ou codigo na ausência de id), via índice."""
+        try:
+            row = (
+                self._conn()
+                .execute("SELECT payload FROM nexus_dim WHERE tabela = ? AND chave = ?", (table, str(key)))
+                .fetchone()
+            )
+            return json.loads(row[0]) if row else None
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Falha ao ler espelho de {table} [{key}]: {e}")
+            return None
+
+    # ── Nomes resolvidos na API ─────────────────────────────────────────────
+
+    def get_names(self, table: str, keys) -> dict[str, str]:
+        """Nomes ainda válidos (TTL) resolvidos na API Nexus para registros ausentes do espelho."""
+        keys = [str(k) for k in keys]
+        found: dict[str, str] = {}
+        try:
+            conn = self._conn()
+            now = time.time()
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT chave, nome FROM nexus_nomes WHERE tabela = ? AND expires_at > ? AND chave IN ({marks})",
+                    (table, now, *chunk),
+                ).fetchall()
+                found.update(rows)
+        except sqlite3.Error as e:
+            logger.warning(f"Falha ao ler nomes em cache de {table}: {e}")
+        return found
+
+    def put_names(self, table: str, names: dict, ttl_seconds: int) -> None:
+        """Grava nomes resolvidos na API com validade de ttl_seconds."""
+        if not names:
+            return
+        expires_at = time.time() + ttl_seconds
+        try:
+            self._conn().executemany(
+                "INSERT OR REPLACE INTO nexus_nomes (tabela, chave, nome, expires_at) VALUES (?, ?, ?, ?)",
+                [(table, str(k), nome, expires_at) for k, nome in names.items()],
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Falha ao gravar nomes em cache de {table}: {e}")
+
+
+_mirror: NexusMirror | None = None
+_mirror_lock = threading.Lock()
+
+
+def get_nexus_mirror() -> NexusMirror | None:
+    """Espelho compartilhado do processo, ou None se desabilitado."""
+    global _mirror
+    if not NEXUS_MIRROR_CONFIG["enabled"]:
+        return None
+    with _mirror_lock:
+        if _mirror is None:
+            _mirror = NexusMirror(
+                NEXUS_MIRROR_CONFIG["path"],
+                sync_interval_seconds=NEXUS_MIRROR_CONFIG["sync_interval_seconds"],
+                full_sync_seconds=NEXUS_MIRROR_CONFIG["full_sync_seconds"],
+            )
+        return _mirror
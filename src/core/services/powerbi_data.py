@@ -4,21 +4,26 @@ Responsável por buscar dados reais de metas e receitas do Power BI via DAX,
 integrando diretamente com o modelo semântico mapeado.
 """
 
+import contextvars
 import json
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
-from src.config import POWERBI_CONFIG
+from src.config import POWERBI_CONFIG, POWERBI_GOVERNOR_CONFIG
 from src.core.clients.powerbi_client import PowerBIClient
 from src.core.services.dax_queries import (
     get_metas_com_op_query,
-    get_metas_dept_query,
+    get_metas_departamentos_periodo_query,
+    get_metas_departamentos_query,
     get_percentuais_com_op_query,
-    get_percentuais_dept_query,
+    get_percentuais_departamentos_query,
     get_percentuais_gs_query,
+    get_por_mes_query,
     get_receitas_liquido_query,
     get_receitas_query,
 )
+from src.core.services.metas_history import get_metas_history
+from src.core.utils.dax_parser import parse_scalar_query
 from src.core.utils.logger import get_logger
 
 logger = get_logger("powerbi_data")
@@ -34,6 +39,16 @@ _DEPARTAMENTOS_CONFIG: list[tuple[str, str, str]] = [
 ]
 
 
+def _month_bounds(ref: date) -> tuple[date, date]:
+    """Primeiro e último dia do mês de ref."""
+    start = date(ref.year, ref.month, 1)
+    if ref.month == 12:
+        end = date(ref.year + 1, 1, 1) - timedelta(days=1)
+    else:
+        end = date(ref.year, ref.month + 1, 1) - timedelta(days=1)
+    return start, end
+
+
 def format_currency(value) -> str:
     """Formata valor como moeda brasileira."""
     if value is None or value == 0:
@@ -67,323 +82,419 @@ class PowerBIDataFetcher:
             self._authenticated = self.client.authenticate()
         return self._authenticated
 
-    def _get_month_filter(self) -> str:
-        """Retorna filtro DAX DATE() para o primeiro dia do mês atual."""
-        now = datetime.now()
-        return f"DATE({now.year}, {now.month}, 1)"
-
-    def _get_month_range(self) -> tuple[str, str]:
-        """Retorna (start_str, end_str) no formato DAX DATE() para o mês atual."""
-        now = datetime.now()
-        start = datetime(now.year, now.month, 1)
-        if now.month == 12:
-            end = datetime(now.year + 1, 1, 1) - timedelta(days=1)
-        else:
-            end = datetime(now.year, now.month + 1, 1) - timedelta(days=1)
+    def _get_month_filter(self, ref: date | None = None) -> str:
+        """Retorna filtro DAX DATE() para o primeiro dia do mês de referência (padrão: mês atual)."""
+        ref = ref or datetime.now().date()
+        return f"DATE({ref.year}, {ref.month}, 1)"
+
+    def _get_month_range(self, ref: date | None = None) -> tuple[str, str]:
+        """Retorna (start_str, end_str) no formato DAX DATE() para o mês de referência (padrão: mês atual)."""
+        start, end = _month_bounds(ref or datetime.now().date())
         start_str = f"DATE({start.year}, {start.month}, {start.day})"
         end_str = f"DATE({end.year}, {end.month}, {end.day})"
         return start_str, end_str
 
-    def fetch_valores_realizados(self) -> dict:
-        """Busca os valores REALIZADOS de cada departamento (da tabela Medidas)."""
-        start_str, end_str = self._get_month_range()
-        query = get_receitas_liquido_query(start_str, end_str)
+    # ── Conversão das linhas DAX ("[Coluna]": valor) ───────────────────────
 
-        try:
-            result = self.client.execute_dax(query)
-            if result and len(result) > 0:
-                row = result[0]
-                result_dict = {
-                    "Comercial": row.get("[Total_Comercial]") or 0,
-                    "Operacional": row.get("[Total_Operacao]") or 0,
-                    "Corporate": row.get("[Corporate_Liquido]") or 0,
-                    "Educação": row.get("[Educacao_Liquido]") or 0,
-                    "Expansão": row.get("[Expansao_Liquido]") or 0,
-                    "Franchising": row.get("[Franchising_Liquido]") or 0,
-                    "Tecnologia": row.get("[Tecnologia_Liquido]") or 0,
-                    "Tax": row.get("[Tax_Liquido]") or 0,
-                    # Repasses individuais
-                    "Corporate_Repasse": row.get("[Corporate_Repasse]") or 0,
-                    "Educação_Repasse": row.get("[Educacao_Repasse]") or 0,
-                    "Expansão_Repasse": row.get("[Expansao_Repasse]") or 0,
-                    "Franchising_Repasse": row.get("[Franchising_Repasse]") or 0,
-                    "Tax_Repasse": row.get("[Tax_Repasse]") or 0,
-                    "Tecnologia_Repasse": row.get("[Tecnologia_Repasse]") or 0,
-                }
-                return result_dict
-        except Exception as e:
-            logger.error(f"Erro ao buscar valores realizados: {e}")
+    @staticmethod
+    def _parse_realizados(row: dict) -> dict:
+        return {
+            "Comercial": row.get("[Total_Comercial]") or 0,
+            "Operacional": row.get("[Total_Operacao]") or 0,
+            "Corporate": row.get("[Corporate_Liquido]") or 0,
+            "Educação": row.get("[Educacao_Liquido]") or 0,
+            "Expansão": row.get("[Expansao_Liquido]") or 0,
+            "Franchising": row.get("[Franchising_Liquido]") or 0,
+            "Tecnologia": row.get("[Tecnologia_Liquido]") or 0,
+            "Tax": row.get("[Tax_Liquido]") or 0,
+            # Repasses individuais
+            "Corporate_Repasse": row.get("[Corporate_Repasse]") or 0,
+            "Educação_Repasse": row.get("[Educacao_Repasse]") or 0,
+            "Expansão_Repasse": row.get("[Expansao_Repasse]") or 0,
+            "Franchising_Repasse": row.get("[Franchising_Repasse]") or 0,
+            "Tax_Repasse": row.get("[Tax_Repasse]") or 0,
+            "Tecnologia_Repasse": row.get("[Tecnologia_Repasse]") or 0,
+        }
 
-        return {}
+    @staticmethod
+    def _parse_metas_com_op(row: dict) -> dict:
+        return {
+            "Comercial": {
+                "meta1": row.get("[Comercial_Meta1]", 0),
+                "meta2": row.get("[Comercial_Meta2]", 0),
+                "meta3": row.get("[Comercial_Meta3]", 0),
+            },
+            "Operacional": {
+                "meta1": row.get("[Operacional_Meta1]", 0),
+                "meta2": row.get("[Operacional_Meta2]", 0),
+                "meta3": row.get("[Operacional_Meta3]", 0),
+            },
+        }
 
-    def fetch_metas_comercial_operacional(self) -> dict:
-        """Busca as METAS específicas de Comercial e Operacional com filtro de data."""
-        start_str, end_str = self._get_month_range()
-        query = get_metas_com_op_query(start_str, end_str)
+    @staticmethod
+    def _parse_pct_gs(row: dict) -> dict:
+        return {
+            "pct_meta1": (row.get("[Pct_Meta1]") or 0) * 100,
+            "pct_meta2": (row.get("[Pct_Meta2]") or 0) * 100,
+            "pct_meta3": (row.get("[Pct_Meta3]") or 0) * 100,
+        }
 
-        try:
-            result = self.client.execute_dax(query)
-            if result and len(result) > 0:
-                row = result[0]
-                return {
-                    "Comercial": {
-                        "meta1": row.get("[Comercial_Meta1]", 0),
-                        "meta2": row.get("[Comercial_Meta2]", 0),
-                        "meta3": row.get("[Comercial_Meta3]", 0),
-                    },
-                    "Operacional": {
-                        "meta1": row.get("[Operacional_Meta1]", 0),
-                        "meta2": row.get("[Operacional_Meta2]", 0),
-                        "meta3": row.get("[Operacional_Meta3]", 0),
-                    },
-                }
-        except Exception as e:
-            logger.error(f"Erro ao buscar metas Comercial/Operacional: {e}")
+    @staticmethod
+    def _parse_pct_com_op(row: dict) -> dict:
+        return {
+            "Comercial": {
+                "pct_meta1": (row.get("[Com_Pct1]") or 0) * 100,
+                "pct_meta2": (row.get("[Com_Pct2]") or 0) * 100,
+                "pct_meta3": (row.get("[Com_Pct3]") or 0) * 100,
+            },
+            "Operacional": {
+                "pct_meta1": (row.get("[Op_Pct1]") or 0) * 100,
+                "pct_meta2": (row.get("[Op_Pct2]") or 0) * 100,
+                "pct_meta3": (row.get("[Op_Pct3]") or 0) * 100,
+            },
+        }
+
+    @staticmethod
+    def _parse_receitas(row: dict) -> dict:
+        return {
+            "outras": row.get("[OutrasReceitas]") or 0,
+            "intercompany": row.get("[InterCompany]") or 0,
+            "total_geral": row.get("[TotalGeral]") or 0,
+            "repasse": row.get("[Repasse]") or 0,
+            "sem_categoria": row.get("[SemCategoria]") or 0,
+        }
 
-        return {}
+    @staticmethod
+    def _parse_pct_deptos(row: dict) -> dict:
+        return {
+            nome: {f"pct_meta{n}": (row.get(f"[{prefixo}_Pct{n}]") or 0) * 100 for n in (1, 2, 3)}
+            for nome, _tabela, prefixo in _DEPARTAMENTOS_CONFIG
+        }
 
-    def fetch_percentuais_gs(self) -> dict:
-        """Busca percentuais das metas GS (% Meta 1/2/3 GS)."""
-        start_str, end_str = self._get_month_range()
-        query = get_percentuais_gs_query(start_str, end_str)
+    @staticmethod
+    def _metas_tabelas() -> list[tuple[str, str]]:
+        return [("GS", "GS_Metas")] + [(nome, tabela) for nome, tabela, _ in _DEPARTAMENTOS_CONFIG]
+
+    @classmethod
+    def _pivot_metas(cls, departamentos, tipos, valores) -> dict[str, dict]:
+        """Pivot das linhas (Departamento, Tipo, Meta) em {departamento: {"meta1", "meta2", "meta3"}}."""
+        metas = {nome: {"meta1": 0, "meta2": 0, "meta3": 0} for nome, _ in cls._metas_tabelas()}
+        campos = {"Meta 1": "meta1", "Meta 2": "meta2", "Meta 3": "meta3"}
+        for departamento, tipo, valor in zip(departamentos, tipos, valores):
+            campo = campos.get(tipo)
+            if departamento in metas and campo:
+                metas[departamento][campo] = valor
+        return metas
+
+    def _scalar_groups(self) -> list[tuple[str, object, object]]:
+        """Grupos de medidas escalares: (chave, consulta(inicio, fim), conversão da linha)."""
+        prefixos = [prefixo for _, _, prefixo in _DEPARTAMENTOS_CONFIG]
+        return [
+            ("realizados", get_receitas_liquido_query, self._parse_realizados),
+            ("receitas_raw", get_receitas_query, self._parse_receitas),
+            ("pct_gs", get_percentuais_gs_query, self._parse_pct_gs),
+            ("metas_com_op", get_metas_com_op_query, self._parse_metas_com_op),
+            ("pct_com_op", get_percentuais_com_op_query, self._parse_pct_com_op),
+            (
+                "pct_deptos",
+                lambda start, end: get_percentuais_departamentos_query(prefixos, start, end),
+                self._parse_pct_deptos,
+            ),
+        ]
+
+    # ── Consultas do mês ────────────────────────────────────────────────────
 
+    def _fetch_scalar(self, query: str, parse, descricao: str) -> dict | None:
         try:
             result = self.client.execute_dax(query)
             if result and len(result) > 0:
-                row = result[0]
-                return {
-                    "pct_meta1": (row.get("[Pct_Meta1]") or 0) * 100,
-                    "pct_meta2": (row.get("[Pct_Meta2]") or 0) * 100,
-                    "pct_meta3": (row.get("[Pct_Meta3]") or 0) * 100,
-                }
+                return parse(result[0])
         except Exception as e:
-            logger.error(f"Erro ao buscar percentuais GS: {e}")
+            logger.error(f"Erro ao buscar {descricao}: {e}")
+        return None
 
-        return {"pct_meta1": 0, "pct_meta2": 0, "pct_meta3": 0}
+    def _query_scalar(self, query: str, parse, descricao: str) -> dict:
+        """Como _fetch_scalar, mas a falha vira exceção (o grupo fica de fora em _run_parallel)."""
+        result = self._fetch_scalar(query, parse, descricao)
+        if result is None:
+            raise RuntimeError(f"consulta de {descricao} falhou")
+        return result
 
-    def fetch_percentuais_comercial_operacional(self) -> dict:
-        """Busca percentuais de Comercial e Operacional."""
-        start_str, end_str = self._get_month_range()
-        query = get_percentuais_com_op_query(start_str, end_str)
+    def fetch_valores_realizados(self, ref: date | None = None) -> dict:
+        """Busca os valores REALIZADOS de cada departamento (da tabela Medidas)."""
+        start_str, end_str = self._get_month_range(ref)
+        query = get_receitas_liquido_query(start_str, end_str)
+        return self._fetch_scalar(query, self._parse_realizados, "valores realizados") or {}
 
-        try:
-            result = self.client.execute_dax(query)
-            if result and len(result) > 0:
-                row = result[0]
-                return {
-                    "Comercial": {
-                        "pct_meta1": (row.get("[Com_Pct1]") or 0) * 100,
-                        "pct_meta2": (row.get("[Com_Pct2]") or 0) * 100,
-                        "pct_meta3": (row.get("[Com_Pct3]") or 0) * 100,
-                    },
-                    "Operacional": {
-                        "pct_meta1": (row.get("[Op_Pct1]") or 0) * 100,
-                        "pct_meta2": (row.get("[Op_Pct2]") or 0) * 100,
-                        "pct_meta3": (row.get("[Op_Pct3]") or 0) * 100,
-                    },
-                }
-        except Exception as e:
-            logger.error(f"Erro ao buscar percentuais Comercial/Operacional: {e}")
+    def fetch_metas_comercial_operacional(self, ref: date | None = None) -> dict:
+        """Busca as METAS específicas de Comercial e Operacional com filtro de data."""
+        start_str, end_str = self._get_month_range(ref)
+        query = get_metas_com_op_query(start_str, end_str)
+        return self._fetch_scalar(query, self._parse_metas_com_op, "metas Comercial/Operacional") or {}
 
-        return {
+    def fetch_percentuais_gs(self, ref: date | None = None) -> dict:
+        """Busca percentuais das metas GS (% Meta 1/2/3 GS)."""
+        start_str, end_str = self._get_month_range(ref)
+        query = get_percentuais_gs_query(start_str, end_str)
+        return self._fetch_scalar(query, self._parse_pct_gs, "percentuais GS") or {
+            "pct_meta1": 0,
+            "pct_meta2": 0,
+            "pct_meta3": 0,
+        }
+
+    def fetch_percentuais_comercial_operacional(self, ref: date | None = None) -> dict:
+        """Busca percentuais de Comercial e Operacional."""
+        start_str, end_str = self._get_month_range(ref)
+        query = get_percentuais_com_op_query(start_str, end_str)
+        return self._fetch_scalar(query, self._parse_pct_com_op, "percentuais Comercial/Operacional") or {
             "Comercial": {"pct_meta1": 0, "pct_meta2": 0, "pct_meta3": 0},
             "Operacional": {"pct_meta1": 0, "pct_meta2": 0, "pct_meta3": 0},
         }
 
-    def fetch_receitas(self) -> dict:
+    def fetch_receitas(self, ref: date | None = None) -> dict:
         """Busca valores de receitas (Outras Receitas, Intercompany, etc.)."""
-        start_str, end_str = self._get_month_range()
+        start_str, end_str = self._get_month_range(ref)
         query = get_receitas_query(start_str, end_str)
+        return self._fetch_scalar(query, self._parse_receitas, "receitas") or {
+            "outras": 0,
+            "intercompany": 0,
+            "total_geral": 0,
+            "repasse": 0,
+            "sem_categoria": 0,
+        }
 
+    def fetch_metas_departamentos(self, ref: date | None = None) -> dict[str, dict]:
+        """
+        Busca as metas de GS e de todos os departamentos em uma única consulta (UNION das
+        tabelas *_Metas). Retorna {departamento: {"meta1", "meta2", "meta3"}}; o pivot do
+        TIPO (Meta 1/2/3) é feito aqui.
+        """
         try:
-            result = self.client.execute_dax(query)
-            if result and len(result) > 0:
-                row = result[0]
-                return {
-                    "outras": row.get("[OutrasReceitas]") or 0,
-                    "intercompany": row.get("[InterCompany]") or 0,
-                    "total_geral": row.get("[TotalGeral]") or 0,
-                    "repasse": row.get("[Repasse]") or 0,
-                    "sem_categoria": row.get("[SemCategoria]") or 0,
-                }
-        except Exception as e:
-            logger.error(f"Erro ao buscar receitas: {e}")
-
-        return {"outras": 0, "intercompany": 0, "total_geral": 0, "repasse": 0, "sem_categoria": 0}
-
-    def fetch_metas_departamento(self, tabela: str, prefixo: str) -> dict:
-        """Busca metas de um departamento específico."""
-        month_filter = self._get_month_filter()
-        query = get_metas_dept_query(tabela, month_filter)
-
-        try:
-            result = self.client.execute_dax(query)
-            if result:
-                metas = {"meta1": 0, "meta2": 0, "meta3": 0}
-                for row in result:
-                    tipo = row.get(f"{tabela}[TIPO]", "")
-                    valor = row.get(f"{tabela}[Metas]", 0)
-                    if tipo == "Meta 1":
-                        metas["meta1"] = valor
-                    elif tipo == "Meta 2":
-                        metas["meta2"] = valor
-                    elif tipo == "Meta 3":
-                        metas["meta3"] = valor
-                return metas
+            return self._query_metas_departamentos(ref)
         except Exception as e:
-            logger.error(f"Erro ao buscar metas {tabela}: {e}")
-
-        return {"meta1": 0, "meta2": 0, "meta3": 0}
-
-    def fetch_percentuais_departamento(self, prefixo: str) -> dict:
-        """Busca percentuais de atingimento de metas para um departamento."""
-        start_str, end_str = self._get_month_range()
-        query = get_percentuais_dept_query(prefixo, start_str, end_str)
-
-        try:
-            result = self.client.execute_dax(query)
-            if result and len(result) > 0:
-                row = result[0]
-                return {
-                    "pct_meta1": (row.get("[Pct1]") or 0) * 100,
-                    "pct_meta2": (row.get("[Pct2]") or 0) * 100,
-                    "pct_meta3": (row.get("[Pct3]") or 0) * 100,
-                }
-        except Exception as e:
-            logger.error(f"Erro ao buscar percentuais {prefixo}: {e}")
-
-        return {"pct_meta1": 0, "pct_meta2": 0, "pct_meta3": 0}
+            logger.error(f"Erro ao buscar metas dos departamentos: {e}")
+
+        return self._pivot_metas([], [], [])
+
+    def _query_metas_departamentos(self, ref: date | None = None) -> dict[str, dict]:
+        query = get_metas_departamentos_query(self._metas_tabelas(), self._get_month_filter(ref))
+        result = self.client.execute_dax_result(query)
+        if result is None:
+            raise RuntimeError("consulta de metas dos departamentos falhou")
+        return self._pivot_metas(result.column("Departamento"), result.column("Tipo"), result.column("Meta"))
+
+    def fetch_percentuais_departamentos(self, ref: date | None = None) -> dict[str, dict]:
+        """Busca os percentuais de atingimento de todos os departamentos em uma única consulta."""
+        start_str, end_str = self._get_month_range(ref)
+        prefixos = [prefixo for _, _, prefixo in _DEPARTAMENTOS_CONFIG]
+        query = get_percentuais_departamentos_query(prefixos, start_str, end_str)
+        return self._fetch_scalar(query, self._parse_pct_deptos, "percentuais dos departamentos") or {
+            nome: {"pct_meta1": 0, "pct_meta2": 0, "pct_meta3": 0} for nome, _, _ in _DEPARTAMENTOS_CONFIG
+        }
 
-    def fetch_all_data(self) -> tuple[dict | None, list | None, dict | None]:
+    @staticmethod
+    def _run_parallel(tasks: list[tuple[str, object, tuple]]) -> dict:
         """
-        Orquestra a busca de TODOS os dados necessários para a automação.
+        Executa as tarefas (chave, função, args) em paralelo — a concorrência efetiva é decidida
+        pelo governor do tenant (AIMD + Retry-After), compartilhado com os demais jobs do processo.
+        Tarefas que falham ficam de fora do resultado.
+        """
+        results: dict = {}
+        with ThreadPoolExecutor(max_workers=min(len(tasks), POWERBI_GOVERNOR_CONFIG["max_concurrency"])) as executor:
+            # copy_context: as threads herdam a prioridade do job (ex: "scheduled")
+            future_to_key = {
+                executor.submit(contextvars.copy_context().run, fn, *args): key for key, fn, args in tasks
+            }
+            for future in as_completed(future_to_key):
+                key = future_to_key[future]
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    logger.error(f"Erro em query paralela '{key}': {e}")
+        return results
 
-        Executa as 18 consultas DAX em paralelo (ThreadPoolExecutor) em vez de
-        sequencialmente, reduzindo o tempo total de ~9 minutos para ~1 minuto.
+    def fetch_raw_data(self, ref: date | None = None) -> dict[str, dict] | None:
+        """
+        Executa as 7 consultas DAX do mês de referência (padrão: mês atual) em paralelo;
+        as escalares ainda são fundidas pelo auto-batching do cliente.
 
-        Retorna:
-            - total_gs: Relatório consolidado da GS.
-            - departamentos: Lista de relatórios por departamento.
-            - receitas: Dados de outras receitas/intercompany.
+        Retorna os números brutos como {departamento: {medida: valor}} — o mesmo formato
+        gravado no histórico (metas_history) — ou None se a autenticação falhar.
+        Departamentos: "GS", "Comercial", "Operacional", os de _DEPARTAMENTOS_CONFIG e "Receitas".
         """
+        fetched = self._fetch_raw(ref)
+        return fetched[0] if fetched is not None else None
+
+    def _fetch_raw(self, ref: date | None = None) -> tuple[dict[str, dict], list[str]] | None:
+        """fetch_raw_data com a lista das consultas que falharam (medidas zeradas no snapshot)."""
         if not self.authenticate():
             logger.error("Falha na autenticação com Power BI")
-            return None, None, None
+            return None
 
         logger.info("Buscando dados do Power BI em paralelo...")
 
-        # Monta a lista de todas as tarefas independentes como (chave, função, args)
+        # Metas e percentuais dos departamentos vêm em uma consulta cada, qualquer que seja
+        # o número de departamentos em _DEPARTAMENTOS_CONFIG.
+        start_str, end_str = self._get_month_range(ref)
         tasks: list[tuple[str, object, tuple]] = [
-            ("realizados", self.fetch_valores_realizados, ()),
-            ("receitas_raw", self.fetch_receitas, ()),
-            ("metas_gs", self.fetch_metas_departamento, ("GS_Metas", "GS")),
-            ("pct_gs", self.fetch_percentuais_gs, ()),
-            ("metas_com_op", self.fetch_metas_comercial_operacional, ()),
-            ("pct_com_op", self.fetch_percentuais_comercial_operacional, ()),
+            (key, self._query_scalar, (builder(start_str, end_str), parse, key))
+            for key, builder, parse in self._scalar_groups()
         ]
+        tasks.append(("metas_deptos", self._query_metas_departamentos, (ref,)))
+        results = self._run_parallel(tasks)
+        falhas = [key for key, _, _ in tasks if key not in results]
+        return self._assemble_raw(results), falhas
 
-        for nome, tabela, prefixo in _DEPARTAMENTOS_CONFIG:
-            tasks.append((f"metas_{nome}", self.fetch_metas_departamento, (tabela, prefixo)))
-            tasks.append((f"pct_{nome}", self.fetch_percentuais_departamento, (prefixo,)))
-
-        # Executa todas as queries DAX em paralelo — max_workers limitado a 10
-        # para não sobrecarregar a API do Power BI
-        results: dict = {}
-        with ThreadPoolExecutor(max_workers=min(len(tasks), 10)) as executor:
-            future_to_key = {executor.submit(fn, *args): key for key, fn, args in tasks}
-            for future in as_completed(future_to_key):
-                key = future_to_key[future]
-                try:
-                    results[key] = future.result()
-                except Exception as e:
-                    logger.error(f"Erro em query paralela '{key}': {e}")
-                    results[key] = {}
+    def fetch_raw_months(self, months: list[date]) -> dict[date, dict[str, dict]]:
+        """
+        Busca os números brutos de vários meses com uma consulta por grupo de medidas
+        (7 no total, qualquer que seja o número de meses), em vez de 7 por mês.
 
-        # --- Monta estrutura de retorno ---
-        realizados = results.get("realizados", {})
-        receitas_raw = results.get("receitas_raw", {})
-        metas_gs = results.get("metas_gs", {"meta1": 0, "meta2": 0, "meta3": 0})
-        pct_gs = results.get("pct_gs", {"pct_meta1": 0, "pct_meta2": 0, "pct_meta3": 0})
-        metas_com_op = results.get("metas_com_op", {})
-        pct_com_op = results.get("pct_com_op", {})
+        Cada ROW mensal é avaliado para todos os meses via GENERATE sobre uma DATATABLE
+        de períodos; as metas vêm das tabelas *_Metas filtradas pelo intervalo de meses.
+        Retorna {primeiro_dia_do_mês: raw} (mesmo formato de fetch_raw_data); meses com
+        alguma consulta falha ficam de fora, para que um backfill posterior os preencha.
+        """
+        meses = sorted({date(m.year, m.month, 1) for m in months})
+        if not meses or not self.authenticate():
+            return {}
+
+        periodos = [_month_bounds(m) for m in meses]
+        first_start, first_end = (f"DATE({d.year}, {d.month}, {d.day})" for d in periodos[0])
+        logger.info(f"Buscando {len(meses)} meses do Power BI ({meses[0]:%m/%Y} a {meses[-1]:%m/%Y})...")
+
+        def _grupo(query_builder, parse) -> dict[date, dict]:
+            columns = parse_scalar_query(query_builder(first_start, first_end)).columns
+            rows = self.client.execute_dax(get_por_mes_query(columns, periodos))
+            if rows is None:
+                raise RuntimeError("consulta por mês falhou")
+            return {date.fromisoformat(str(row.get("[Inicio]"))[:10]): parse(row) for row in rows}
+
+        def _metas() -> dict[date, dict]:
+            query = get_metas_departamentos_periodo_query(self._metas_tabelas(), meses[0], meses[-1])
+            result = self.client.execute_dax_result(query)
+            if result is None:
+                raise RuntimeError("consulta de metas por período falhou")
+            colunas: dict[date, tuple[list, list, list]] = {mes: ([], [], []) for mes in meses}
+            for mes, departamento, tipo, valor in zip(
+                result.column("Mes"), result.column("Departamento"), result.column("Tipo"), result.column("Meta")
+            ):
+                destino = colunas.get(date.fromisoformat(str(mes)[:10])) if mes else None
+                if destino is not None:
+                    destino[0].append(departamento)
+                    destino[1].append(tipo)
+                    destino[2].append(valor)
+            return {mes: self._pivot_metas(*cols) for mes, cols in colunas.items()}
+
+        tasks = [(key, _grupo, (builder, parse)) for key, builder, parse in self._scalar_groups()]
+        tasks.append(("metas_deptos", _metas, ()))
+        by_group = self._run_parallel(tasks)
+
+        raws: dict[date, dict[str, dict]] = {}
+        for mes in meses:
+            results = {key: valores.get(mes) for key, valores in by_group.items()}
+            falhas = [key for key, _, _ in tasks if results.get(key) is None]
+            if falhas:
+                logger.warning(f"Mês {mes:%m/%Y} ignorado: consultas falharam ({', '.join(falhas)})")
+                continue
+            raws[mes] = self._assemble_raw(results)
+        return raws
+
+    @staticmethod
+    def _assemble_raw(results: dict) -> dict[str, dict]:
+        """Monta o snapshot bruto {departamento: {medida: valor}} a partir dos resultados por consulta."""
+        realizados = results.get("realizados") or {}
+        metas_deptos = results.get("metas_deptos") or {}
+        pct_deptos = results.get("pct_deptos") or {}
+        metas_com_op = results.get("metas_com_op") or {}
+        pct_com_op = results.get("pct_com_op") or {}
 
         real_comercial = realizados.get("Comercial", 0)
         real_operacional = realizados.get("Operacional", 0)
-        realizado_gs = real_comercial + real_operacional
 
-        total_gs = {
-            "meta1": format_currency(metas_gs.get("meta1", 0)),
-            "meta2": format_currency(metas_gs.get("meta2", 0)),
-            "meta3": format_currency(metas_gs.get("meta3", 0)),
-            "pct_meta1": pct_gs.get("pct_meta1", 0),
-            "pct_meta2": pct_gs.get("pct_meta2", 0),
-            "pct_meta3": pct_gs.get("pct_meta3", 0),
-            "realizado": format_currency(realizado_gs),
-            "percent": format_percent(pct_gs.get("pct_meta1", 0)),
+        raw: dict[str, dict] = {
+            "GS": {
+                **metas_deptos.get("GS", {}),
+                **(results.get("pct_gs") or {}),
+                "realizado": real_comercial + real_operacional,
+            },
+            "Comercial": {
+                **metas_com_op.get("Comercial", {}),
+                **pct_com_op.get("Comercial", {}),
+                "realizado": real_comercial,
+            },
+            "Operacional": {
+                **metas_com_op.get("Operacional", {}),
+                **pct_com_op.get("Operacional", {}),
+                "realizado": real_operacional,
+            },
         }
+        for nome, _tabela, _prefixo in _DEPARTAMENTOS_CONFIG:
+            raw[nome] = {
+                **metas_deptos.get(nome, {}),
+                **pct_deptos.get(nome, {}),
+                "liquido": realizados.get(nome, 0),
+                "repasse": realizados.get(f"{nome}_Repasse", 0),
+            }
+        raw["Receitas"] = dict(results.get("receitas_raw") or {})
+        return raw
 
-        departamentos: list[dict] = []
+    @staticmethod
+    def format_report(raw: dict[str, dict]) -> tuple[dict, list, dict]:
+        """
+        Converte os números brutos (fetch_raw_data ou um snapshot do histórico)
+        nas estruturas formatadas usadas pelos relatórios: (total_gs, departamentos, receitas).
+        """
 
-        # Comercial — usa percentuais do Power BI
-        com_metas = metas_com_op.get("Comercial", {})
-        com_pct = pct_com_op.get("Comercial", {})
-        departamentos.append(
-            {
-                "nome": "Comercial",
-                "meta1": format_currency(com_metas.get("meta1", 0)),
-                "meta2": format_currency(com_metas.get("meta2", 0)),
-                "meta3": format_currency(com_metas.get("meta3", 0)),
-                "pct_meta1": com_pct.get("pct_meta1", 0),
-                "pct_meta2": com_pct.get("pct_meta2", 0),
-                "pct_meta3": com_pct.get("pct_meta3", 0),
-                "realizado": format_currency(real_comercial),
-                "percent": format_percent(com_pct.get("pct_meta1", 0)),
+        def _meta_fields(valores: dict) -> dict:
+            return {
+                "meta1": format_currency(valores.get("meta1", 0)),
+                "meta2": format_currency(valores.get("meta2", 0)),
+                "meta3": format_currency(valores.get("meta3", 0)),
+                "pct_meta1": valores.get("pct_meta1") or 0,
+                "pct_meta2": valores.get("pct_meta2") or 0,
+                "pct_meta3": valores.get("pct_meta3") or 0,
             }
-        )
 
-        # Operacional — usa percentuais do Power BI
-        op_metas = metas_com_op.get("Operacional", {})
-        op_pct = pct_com_op.get("Operacional", {})
-        departamentos.append(
-            {
-                "nome": "Operacional",
-                "meta1": format_currency(op_metas.get("meta1", 0)),
-                "meta2": format_currency(op_metas.get("meta2", 0)),
-                "meta3": format_currency(op_metas.get("meta3", 0)),
-                "pct_meta1": op_pct.get("pct_meta1", 0),
-                "pct_meta2": op_pct.get("pct_meta2", 0),
-                "pct_meta3": op_pct.get("pct_meta3", 0),
-                "realizado": format_currency(real_operacional),
-                "percent": format_percent(op_pct.get("pct_meta1", 0)),
-            }
-        )
+        gs = raw.get("GS", {})
+        total_gs = {
+            **_meta_fields(gs),
+            "realizado": format_currency(gs.get("realizado") or 0),
+            "percent": format_percent(gs.get("pct_meta1") or 0),
+        }
 
-        # Outros departamentos — resultados já disponíveis no dict paralelo
-        for nome, _tabela, _prefixo in _DEPARTAMENTOS_CONFIG:
-            metas = results.get(f"metas_{nome}", {"meta1": 0, "meta2": 0, "meta3": 0})
-            pct = results.get(f"pct_{nome}", {"pct_meta1": 0, "pct_meta2": 0, "pct_meta3": 0})
-            liquido_val = realizados.get(nome, 0)
-            repasse_val = realizados.get(f"{nome}_Repasse", 0)
+        # Comercial e Operacional — usam percentuais do Power BI
+        departamentos: list[dict] = []
+        for nome in ("Comercial", "Operacional"):
+            valores = raw.get(nome, {})
+            departamentos.append(
+                {
+                    "nome": nome,
+                    **_meta_fields(valores),
+                    "realizado": format_currency(valores.get("realizado") or 0),
+                    "percent": format_percent(valores.get("pct_meta1") or 0),
+                }
+            )
 
+        for nome, _tabela, _prefixo in _DEPARTAMENTOS_CONFIG:
+            valores = raw.get(nome, {})
+            liquido_val = valores.get("liquido") or 0
+            repasse_val = valores.get("repasse") or 0
             departamentos.append(
                 {
                     "nome": nome,
-                    "meta1": format_currency(metas.get("meta1", 0)),
-                    "meta2": format_currency(metas.get("meta2", 0)),
-                    "meta3": format_currency(metas.get("meta3", 0)),
-                    "pct_meta1": pct.get("pct_meta1", 0),
-                    "pct_meta2": pct.get("pct_meta2", 0),
-                    "pct_meta3": pct.get("pct_meta3", 0),
+                    **_meta_fields(valores),
                     "realizado": format_currency(liquido_val + repasse_val),  # Total Bruto
                     "repasse": format_currency(repasse_val),
                     "liquido": format_currency(liquido_val),
-                    "percent": format_percent(pct.get("pct_meta1", 0)),
+                    "percent": format_percent(valores.get("pct_meta1") or 0),
                 }
             )
 
-        repasse_raw = receitas_raw.get("repasse", 0)
+        receitas_raw = raw.get("Receitas", {})
+        repasse_raw = receitas_raw.get("repasse") or 0
         repasse_final = repasse_raw if repasse_raw else sum(
-            realizados.get(f"{n}_Repasse", 0) for n, _, _ in _DEPARTAMENTOS_CONFIG
+            raw.get(n, {}).get("repasse") or 0 for n, _, _ in _DEPARTAMENTOS_CONFIG
         )
 
         receitas = {
@@ -393,10 +504,60 @@ class PowerBIDataFetcher:
             "total_geral": format_currency(receitas_raw.get("total_geral", 0)),
             "sem_categoria": format_currency(receitas_raw.get("sem_categoria", 0)),
         }
+        return total_gs, departamentos, receitas
 
+    def fetch_all_data(self) -> tuple[dict | None, list | None, dict | None]:
+        """
+        Orquestra a busca de TODOS os dados necessários para a automação.
+
+        Os números brutos são gravados no histórico local (data de referência = hoje)
+        antes de serem formatados — só quando todas as consultas tiveram sucesso.
+
+        Retorna:
+            - total_gs: Relatório consolidado da GS.
+            - departamentos: Lista de relatórios por departamento.
+            - receitas: Dados de outras receitas/intercompany.
+        """
+        fetched = self._fetch_raw()
+        if fetched is None:
+            return None, None, None
+        raw, falhas = fetched
+
+        # Um snapshot com consultas falhas (zeradas) substituiria o último snapshot bom do dia
+        history = get_metas_history()
+        if falhas:
+            logger.warning(f"Snapshot não gravado no histórico: consultas falharam ({', '.join(falhas)})")
+        elif history is not None:
+            history.record(datetime.now().date(), raw)
+
+        total_gs, departamentos, receitas = self.format_report(raw)
         logger.info(f"OK - Dados de {len(departamentos)} departamentos obtidos em paralelo")
         return total_gs, departamentos, receitas
 
+    def load_from_history(self, ref_date: date) -> tuple[dict | None, list | None, dict | None]:
+        """Regenera o relatório de uma data a partir do histórico local, sem consultar o Power BI."""
+        history = get_metas_history()
+        raw = history.snapshot(ref_date) if history is not None else {}
+        if not raw:
+            logger.warning(f"Sem snapshot de metas no histórico para {ref_date}")
+            return None, None, None
+        return self.format_report(raw)
+
+    def backfill(self, months: list[date]) -> dict[date, dict[str, dict]]:
+        """
+        Busca vários meses de uma vez (fetch_raw_months) e grava cada um no histórico,
+        com data de referência no último dia do mês (ou hoje, para o mês corrente).
+        Meses com consultas falhas não são gravados. Retorna {primeiro_dia_do_mês: raw}.
+        """
+        raws = self.fetch_raw_months(months)
+        history = get_metas_history()
+        if history is not None:
+            today = datetime.now().date()
+            for mes, raw in raws.items():
+                history.record(min(_month_bounds(mes)[1], today), raw)
+        logger.info(f"OK - Backfill de {len(raws)} meses concluído")
+        return raws
+
 
 # Teste
 if __name__ == "__main__":
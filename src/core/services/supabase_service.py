@@ -1,6 +1,8 @@
 import logging
 import os
 import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 import requests
@@ -21,6 +23,15 @@ load_dotenv()
 logger = get_logger("supabase_service")
 
 
+def _as_pairs(params) -> list[tuple]:
+    """Normaliza params (dict, lista de tuplas ou None) para lista de tuplas."""
+    if not params:
+        return []
+    if isinstance(params, dict):
+        return list(params.items())
+    return list(params)
+
+
 class SupabaseService:
     _instance = None
 
@@ -51,6 +62,9 @@ class SupabaseService:
             logger.error("Credenciais do Supabase não encontradas no .env")
             return
 
+        # Requisições simultâneas por leitura paralela (fetch_table_parallel)
+        self.parallel_workers = int(os.getenv("SUPABASE_PARALLEL_WORKERS", "4"))
+
         self.headers = {
             "apikey": self.key,
             "Authorization": f"Bearer {self.key}",
@@ -90,6 +104,134 @@ class SupabaseService:
             logger.error(f"Erro inesperado Supabase ({table}): {type(e).__name__}")
             return []
 
+    def select(self, table: str, params=None) -> list | None:
+        """
+        Como _get, mas distingue erro de resultado vazio: retorna None se a consulta falhar
+        (ex: coluna inexistente em um select/filtro), permitindo ao chamador um fallback.
+        """
+        try:
+            endpoint = f"{self.url}/rest/v1/{table}"
+            return self._get_with_retry(endpoint, {**self.headers, "Prefer": "count=none"}, params)
+        except requests.RequestException as e:
+            logger.warning(f"Consulta Supabase ({table}) falhou: {type(e).__name__}")
+            return None
+        except Exception as e:
+            logger.error(f"Erro inesperado Supabase ({table}): {type(e).__name__}")
+            return None
+
+    def count_rows(self, table: str, params=None) -> int | None:
+        """
+        Total exato de linhas que a consulta retornaria (header Content-Range com Prefer: count=exact).
+        Retorna None se o servidor não informar o total ou em caso de erro.
+        """
+        try:
+            endpoint = f"{self.url}/rest/v1/{table}"
+            query = [(k, v) for k, v in _as_pairs(params) if k not in ("order", "offset", "limit")]
+            resp = requests.get(
+                endpoint,
+                headers={**self.headers, "Prefer": "count=exact"},
+                params=[*query, ("limit", 1)],
+                timeout=30,
+            )
+            resp.raise_for_status()
+            total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+            return int(total) if total.isdigit() else None
+        except Exception as e:
+            logger.warning(f"Falha ao contar linhas de {table}: {type(e).__name__}")
+            return None
+
+    def fetch_table_parallel(
+        self,
+        table: str,
+        params=None,
+        order: str = "id.asc",
+        page_size: int = 1000,
+        max_workers: int | None = None,
+    ) -> list | None:
+        """
+        Lê todas as linhas da consulta em páginas simultâneas, preservando a ordem.
+
+        Uma contagem exata define os intervalos offset/limit, buscados em paralelo por um
+        pool limitado (SUPABASE_PARALLEL_WORKERS) e concatenados na ordem original.
+        `order` deve ser determinística (terminar em uma coluna única) para que as páginas
+        não se sobreponham. Se a tabela crescer entre a contagem e a leitura, as páginas
+        excedentes são buscadas em sequência. Sem contagem disponível, a leitura é sequencial.
+
+        Retorna None se alguma página falhar.
+        """
+        query = [(k, v) for k, v in _as_pairs(params) if k not in ("order", "offset", "limit")]
+        query.append(("order", order))
+
+        def fetch_page(offset: int) -> list | None:
+            return self.select(table, [*query, ("offset", offset), ("limit", page_size)])
+
+        total = self.count_rows(table, query)
+        rows: list = []
+        offset = 0
+        if total:
+            offsets = list(range(0, total, page_size))
+            workers = max(1, min(max_workers or self.parallel_workers, len(offsets)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="supabase-range") as executor:
+                pages = list(executor.map(fetch_page, offsets))
+            for page in pages:
+                if page is None:
+                    return None
+                rows.extend(page)
+            if len(pages[-1]) < page_size:
+                return rows
+            offset = offsets[-1] + page_size
+
+        # Sem contagem, ou linhas novas após a contagem: continua em sequência
+        while True:
+            page = fetch_page(offset)
+            if page is None:
+                return None
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            offset += page_size
+
+    def iter_rows(
+        self,
+        table: str,
+        select: str = "*",
+        filters=None,
+        order_key: str = "id",
+        page_size: int = 1000,
+        chunked: bool = False,
+    ) -> Iterator:
+        """
+        Percorre a consulta em páginas por cursor (keyset): cada página pede
+        `<order_key>=gt.<último valor>` ordenado por order_key, então o custo por página
+        não cresce com a posição, ao contrário de offset/Range. Gera uma linha por vez
+        (ou a lista de cada página, com chunked=True) sem acumular a tabela em memória.
+
+        order_key deve ser única e não nula (ex: id). Se uma página falhar, a iteração
+        é interrompida e o erro é logado.
+        """
+        query = [(k, v) for k, v in _as_pairs(filters) if k not in ("order", "offset", "limit")]
+        if select != "*" and order_key not in select.split(","):
+            select = f"{select},{order_key}"
+        last = None
+        while True:
+            cursor = [] if last is None else [(order_key, f"gt.{last}")]
+            page = self.select(
+                table,
+                [("select", select), *query, *cursor, ("order", f"{order_key}.asc"), ("limit", page_size)],
+            )
+            if page is None:
+                logger.error(f"Leitura de {table} interrompida após {order_key}={last}.")
+                return
+            if not page:
+                return
+            if chunked:
+                yield page
+            else:
+                yield from page
+            if len(page) < page_size:
+                return
+            last = page[-1][order_key]
+
     def get_active_schedules(self):
         """Busca todos os agendamentos ativos e seus destinatários."""
         if not self.url:
@@ -347,35 +489,7 @@ class SupabaseService:
 
     def get_all_ids(self, table: str) -> set:
         """Retorna um set com todos os IDs da tabela para validação rápida."""
-        all_ids = set()
-        offset = 0
-        limit = 1000
-
-        while True:
-            try:
-                endpoint = f"{self.url}/rest/v1/{table}?select=id"
-                headers = self.headers.copy()
-                headers["Range"] = f"{offset}-{offset + limit - 1}"
-
-                resp = requests.get(endpoint, headers=headers, timeout=30)
-
-                resp.raise_for_status()
-                data = resp.json()
-
-                if not data:
-                    break
-
-                for item in data:
-                    all_ids.add(str(item["id"]))
-
-                if len(data) < limit:
-                    break
-
-                offset += limit
-            except Exception as e:
-                logger.warning(f"Erro ao buscar IDs de {table} no offset {offset}: {e}")
-                break
-        return all_ids
+        return {str(item["id"]) for item in self.iter_rows(table, select="id")}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,162 @@
+"""
+Partições diárias das listas de unidades novas e inativadas.
+
+Cada consulta das listas ao Power BI traz a data de cada linha (contrato ou inativação);
+o resultado é gravado por dia em SQLite, inclusive os dias sem nenhuma unidade.
+Relatórios de períodos maiores (semanal, mensal, customizado) são montados juntando
+as partições já gravadas pelos jobs diários e só consultam os dias que faltam.
+
+Todo dia encerrado (anterior a hoje) que for consultado é gravado, com o horário da gravação.
+Na leitura, dias dentro da janela de refresh_days antes de hoje são sempre reconsultados
+(lançamentos tardios), assim como partições gravadas há mais de ttl_seconds (correções
+retroativas na origem); a reconsulta regrava a partição.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+from src.config import UNIDADES_PARTITIONS_CONFIG
+from src.core.utils.logger import get_logger
+
+logger = get_logger("unidades_partitions")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS unidades_dia (
+    dia         TEXT PRIMARY KEY,
+    novas       TEXT NOT NULL,
+    inativadas  TEXT NOT NULL,
+    recorded_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Partição de um dia: (novas, inativadas)
+Partition = tuple[list[dict], list[dict]]
+
+
+def _days(start: date, end: date) -> list[date]:
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def missing_ranges(start: date, end: date, loaded) -> list[tuple[date, date]]:
+    """Dias do intervalo fora de `loaded`, agrupados em intervalos contíguos (uma consulta por intervalo)."""
+    ranges: list[tuple[date, date]] = []
+    for day in _days(start, end):
+        if day in loaded:
+            continue
+        if ranges and ranges[-1][1] + timedelta(days=1) == day:
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+
+class UnidadesPartitionStore:
+    """
+    Listas de unidades por dia em SQLite (WAL), compartilhadas entre os relatórios.
+
+    Falhas de I/O nunca propagam: leituras viram "dia ausente" (consultado no Power BI)
+    e gravações são ignoradas.
+    """
+
+    def __init__(self, path: str, refresh_days: int = 3, ttl_seconds: int = 7 * 86400):
+        self._path = path
+        self._refresh_days = refresh_days
+        self._ttl = ttl_seconds
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout = 10000")
+            if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != "wal":
+                conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _refreshing(self, day: date) -> bool:
+        """Dia dentro da janela de reconsulta (nunca servido do disco)."""
+        return day >= date.today() - timedelta(days=self._refresh_days)
+
+    def load(self, start: date, end: date) -> dict[date, Partition]:
+        """Partições válidas no intervalo (dias ausentes, expirados ou ainda abertos ficam de fora)."""
+        try:
+            rows = self._conn().execute(
+                "SELECT dia, novas, inativadas FROM unidades_dia WHERE dia >= ? AND dia <= ? AND recorded_at > ?",
+                (start.isoformat(), end.isoformat(), time.time() - self._ttl),
+            ).fetchall()
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Falha ao ler partições de unidades ({start} a {end}): {e}")
+            return {}
+        result: dict[date, Partition] = {}
+        for dia, novas, inativadas in rows:
+            day = date.fromisoformat(dia)
+            if not self._refreshing(day):
+                result[day] = (json.loads(novas), json.loads(inativadas))
+        return result
+
+    def store(self, start: date, end: date, partitions: dict[date, Partition]) -> int:
+        """
+        Grava as partições de todos os dias encerrados do intervalo consultado, inclusive os
+        da janela de reconsulta (dias sem linhas viram partições vazias). Retorna o número de
+        dias gravados.
+        """
+        now = time.time()
+        today = date.today()
+        rows = []
+        for day in _days(start, end):
+            if day >= today:
+                continue
+            novas, inativadas = partitions.get(day, ([], []))
+            rows.append(
+                (
+                    day.isoformat(),
+                    json.dumps(novas, ensure_ascii=False, default=str),
+                    json.dumps(inativadas, ensure_ascii=False, default=str),
+                    now,
+                )
+            )
+        if not rows:
+            return 0
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO unidades_dia (dia, novas, inativadas, recorded_at) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return len(rows)
+        except sqlite3.Error as e:
+            logger.warning(f"Falha ao gravar partições de unidades ({start} a {end}): {e}")
+            return 0
+
+
+_store: UnidadesPartitionStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_unidades_partitions() -> UnidadesPartitionStore | None:
+    """Store compartilhado do processo, ou None se as partições estiverem desabilitadas."""
+    global _store
+    if not UNIDADES_PARTITIONS_CONFIG["enabled"]:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = UnidadesPartitionStore(
+                UNIDADES_PARTITIONS_CONFIG["path"],
+                refresh_days=UNIDADES_PARTITIONS_CONFIG["refresh_days"],
+                ttl_seconds=UNIDADES_PARTITIONS_CONFIG["ttl_seconds"],
+            )
+        return _store
@@ -0,0 +1,280 @@
+"""
+Cache persistente de resultados DAX em SQLite.
+
+Um único arquivo em modo WAL é compartilhado por todos os processos do projeto
+(API, scheduler, servidor MCP e scripts CLI), de modo que um restart do container
+não obriga a refazer as consultas ao Power BI dentro da janela de validade.
+
+Cada entrada tem TTL próprio e o tamanho total do cache é limitado em bytes,
+com despejo LRU (entradas acessadas há mais tempo saem primeiro). Entradas podem
+ser marcadas com uma tag de versão (ex: horário do último refresh do dataset).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import NamedTuple
+
+from src.core.utils.logger import get_logger
+
+logger = get_logger("dax_cache")
+
+# Incrementar ao mudar o schema: por ser um cache, versões antigas são descartadas
+_SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dax_cache (
+    key         TEXT PRIMARY KEY,
+    tag         TEXT,
+    value       BLOB NOT NULL,
+    size        INTEGER NOT NULL,
+    created_at  REAL NOT NULL,
+    expires_at  REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_dax_cache_last_access ON dax_cache(last_access);
+CREATE INDEX IF NOT EXISTS idx_dax_cache_expires_at ON dax_cache(expires_at);
+"""
+
+
+class CacheEntry(NamedTuple):
+    value: list
+    created_at: float
+    tag: str | None
+
+# Fallback quando o arquivo não pode ser aberto (ex: volume somente leitura):
+# banco em memória compartilhado entre as threads do processo.
+_MEMORY_URI = "file:dax_cache_memdb?mode=memory&cache=shared"
+
+
+class DAXCache:
+    """
+    Cache thread-safe e multi-processo com TTL e limite de bytes (LRU).
+
+    Cada thread mantém sua própria conexão SQLite; a concorrência entre processos
+    é resolvida pelo lock do próprio SQLite (WAL + busy_timeout). Falhas de I/O
+    nunca propagam: são logadas e tratadas como cache miss.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int = 1800, max_bytes: int = 64 * 1024 * 1024):
+        self._path = path
+        self._ttl = ttl_seconds
+        self._max_bytes = max_bytes
+        self._local = threading.local()
+        self._use_memory = False
+
+    # ── Conexão ─────────────────────────────────────────────────────────────
+
+    def _open(self) -> sqlite3.Connection:
+        # A troca para WAL e a criação do schema exigem lock exclusivo; vários processos
+        # abrindo o arquivo ao mesmo tempo recebem "database is locked" — basta tentar de novo.
+        attempts = 5
+        for attempt in range(attempts):
+            if self._use_memory:
+                break
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+                conn = sqlite3.connect(self._path, timeout=10, isolation_level=None)
+                conn.execute("PRAGMA busy_timeout = 10000")
+                if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != "wal":
+                    conn.execute("PRAGMA journal_mode = WAL")
+                conn.execute("PRAGMA synchronous = NORMAL")
+                self._ensure_schema(conn)
+                return conn
+            except sqlite3.OperationalError as e:
+                if "locked" in str(e) and attempt < attempts - 1:
+                    time.sleep(0.1 * (attempt + 1))
+                    continue
+                logger.warning(f"Cache DAX em disco indisponível ({self._path}): {e}. Usando memória.")
+                self._use_memory = True
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Cache DAX em disco indisponível ({self._path}): {e}. Usando memória.")
+                self._use_memory = True
+
+        conn = sqlite3.connect(_MEMORY_URI, uri=True, isolation_level=None, check_same_thread=False)
+        self._ensure_schema(conn)
+        return conn
+
+    @staticmethod
+    def _ensure_schema(conn: sqlite3.Connection) -> None:
+        if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Rechecagem dentro do lock: outro processo pode ter migrado primeiro
+                if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                    conn.execute("DROP TABLE IF EXISTS dax_cache")
+                    conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # Conexões não sobrevivem a fork(): reabre se o PID mudou
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = self._open()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # ── API pública ─────────────────────────────────────────────────────────
+
+    def get(self, key: str) -> list | None:
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str) -> CacheEntry | None:
+        """Retorna a entrada (valor, timestamp de gravação, tag) ou None se ausente/expirada."""
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT value, created_at, expires_at, tag FROM dax_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at, expires_at, tag = row
+            if now > expires_at:
+                conn.execute("DELETE FROM dax_cache WHERE key = ? AND expires_at = ?", (key, expires_at))
+                return None
+            conn.execute("UPDATE dax_cache SET last_access = ? WHERE key = ?", (now, key))
+            return CacheEntry(json.loads(value), created_at, tag)
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Falha ao ler cache DAX [{key[:8]}]: {e}")
+            return None
+
+    def get_entries(self, keys: list[str]) -> dict[str, CacheEntry]:
+        """Leitura em lote: retorna as entradas válidas encontradas, por chave."""
+        if not keys:
+            return {}
+        now = time.time()
+        found: dict[str, CacheEntry] = {}
+        try:
+            conn = self._conn()
+            # Limite de variáveis do SQLite: consulta em blocos
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, value, created_at, expires_at, tag FROM dax_cache WHERE key IN ({marks})", chunk
+                ).fetchall()
+                for key, value, created_at, expires_at, tag in rows:
+                    if now <= expires_at:
+                        found[key] = CacheEntry(json.loads(value), created_at, tag)
+            if found:
+                conn.executemany("UPDATE dax_cache SET last_access = ? WHERE key = ?", [(now, k) for k in found])
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Falha ao ler cache DAX em lote ({len(keys)} chaves): {e}")
+        return found
+
+    def set_many(
+        self,
+        items: list[tuple[str, list]],
+        ttl_seconds: int | None = None,
+        tag: str | None = None,
+    ) -> None:
+        """Grava várias entradas pequenas em uma única transação."""
+        if not items:
+            return
+        now = time.time()
+        expires_at = now + (ttl_seconds if ttl_seconds is not None else self._ttl)
+        records = []
+        for key, value in items:
+            payload = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+            records.append((key, tag, payload, len(payload), now, expires_at, now))
+
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO dax_cache "
+                    "(key, tag, value, size, created_at, expires_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    records,
+                )
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Falha ao gravar cache DAX em lote ({len(items)} entradas): {e}")
+
+    def set(
+        self,
+        key: str,
+        value: list,
+        ttl_seconds: int | None = None,
+        tag: str | None = None,
+    ) -> None:
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+        size = len(payload)
+
+        # Uma entrada maior que o cache inteiro nunca é armazenada
+        if size > self._max_bytes:
+            logger.debug(f"Resultado DAX [{key[:8]}] excede o limite do cache ({size} bytes). Ignorado.")
+            return
+
+        expires_at = now + (ttl_seconds if ttl_seconds is not None else self._ttl)
+
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO dax_cache "
+                    "(key, tag, value, size, created_at, expires_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, tag, payload, size, now, expires_at, now),
+                )
+                conn.execute("DELETE FROM dax_cache WHERE expires_at < ?", (now,))
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Falha ao gravar cache DAX [{key[:8]}]: {e}")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Remove as entradas menos recentemente usadas até caber em max_bytes."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM dax_cache").fetchone()[0]
+        if total <= self._max_bytes:
+            return
+
+        excess = total - self._max_bytes
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM dax_cache ORDER BY last_access ASC"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+
+        conn.executemany("DELETE FROM dax_cache WHERE key = ?", victims)
+        logger.debug(f"Cache DAX: {len(victims)} entradas despejadas (LRU)")
+
+    def delete(self, key: str) -> None:
+        try:
+            self._conn().execute("DELETE FROM dax_cache WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            logger.warning(f"Falha ao remover entrada do cache DAX [{key[:8]}]: {e}")
+
+    def clear(self) -> None:
+        try:
+            self._conn().execute("DELETE FROM dax_cache")
+        except sqlite3.Error as e:
+            logger.warning(f"Falha ao limpar cache DAX: {e}")
+
+    def stats(self) -> dict:
+        """Retorna quantidade de entradas e bytes ocupados (para diagnóstico)."""
+        try:
+            entries, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM dax_cache").fetchone()
+            return {"entries": entries, "bytes": size, "max_bytes": self._max_bytes}
+        except sqlite3.Error:
+            return {"entries": 0, "bytes": 0, "max_bytes": self._max_bytes}
@@ -0,0 +1,259 @@
+"""
+Parser mínimo de DAX para as consultas escalares do projeto.
+
+Reconhece as duas formas usadas em dax_queries.py:
+
+    EVALUATE ROW("Nome", <expr>, ...)
+    EVALUATE CALCULATETABLE(ROW("Nome", <expr>, ...), <filtro>, ...)
+
+e devolve as colunas (nome, expressão) e os filtros. Não é um parser DAX completo:
+qualquer coisa fora dessas formas retorna None e segue o caminho normal.
+O scanner respeita strings ("..."), nomes de tabela ('...'), colunas/medidas ([...])
+e comentários (//, --, /* */).
+
+canonicalize() produz a forma canônica de uma consulta (sem comentários e com espaços
+normalizados), usada nas chaves de cache e nos logs.
+"""
+
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+# Caracteres que encerram um token simples na canonicalização
+_DELIMITERS = "(),\"'["
+
+
+class ScalarQuery(NamedTuple):
+    columns: list[tuple[str, str]]  # (nome da coluna, expressão DAX)
+    filters: list[str]  # argumentos de filtro do CALCULATETABLE (vazio para ROW puro)
+
+    @property
+    def filter_key(self) -> tuple[str, ...]:
+        """Contexto de filtro normalizado (para agrupar consultas compatíveis)."""
+        return tuple(canonicalize(f) for f in self.filters)
+
+
+def _scan(text: str):
+    """
+    Percorre o texto emitindo (índice, caractere, profundidade) apenas para caracteres
+    fora de strings, identificadores entre aspas/colchetes e comentários.
+    """
+    i, n, depth = 0, len(text), 0
+    while i < n:
+        ch = text[i]
+        if ch == '"':
+            # String DAX: aspas duplas escapadas como ""
+            i += 1
+            while i < n:
+                if text[i] == '"':
+                    if i + 1 < n and text[i + 1] == '"':
+                        i += 2
+                        continue
+                    break
+                i += 1
+            i += 1
+            continue
+        if ch == "'":
+            end = text.find("'", i + 1)
+            i = n if end < 0 else end + 1
+            continue
+        if ch == "[":
+            end = text.find("]", i + 1)
+            i = n if end < 0 else end + 1
+            continue
+        if text.startswith("//", i) or text.startswith("--", i):
+            end = text.find("\n", i)
+            i = n if end < 0 else end + 1
+            continue
+        if text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            continue
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        yield i, ch, depth
+        i += 1
+
+
+def strip_comments(text: str) -> str:
+    """Remove comentários DAX preservando strings e identificadores."""
+    out, last = [], 0
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch == '"':
+            j = i + 1
+            while j < n:
+                if text[j] == '"':
+                    if j + 1 < n and text[j + 1] == '"':
+                        j += 2
+                        continue
+                    break
+                j += 1
+            i = j + 1
+            continue
+        if ch in "'[":
+            end = text.find("'" if ch == "'" else "]", i + 1)
+            i = n if end < 0 else end + 1
+            continue
+        if text.startswith("//", i) or text.startswith("--", i):
+            end = text.find("\n", i)
+            end = n if end < 0 else end
+            out.append(text[last:i])
+            last = i = end
+            continue
+        if text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            end = n if end < 0 else end + 2
+            out.append(text[last:i] + " ")
+            last = i = end
+            continue
+        i += 1
+    out.append(text[last:])
+    return "".join(out)
+
+
+@lru_cache(maxsize=1024)
+def canonicalize(query: str) -> str:
+    """
+    Forma canônica de uma consulta DAX: comentários removidos, sequências de espaços
+    reduzidas a um espaço e nenhum espaço junto a parênteses e vírgulas (`ROW (` vira
+    `ROW(`). Strings, nomes de tabela e colunas/medidas são preservados como estão.
+    Consultas equivalentes vindas de pontos diferentes (runners, MCP, scripts) geram
+    o mesmo texto e, portanto, a mesma chave de cache.
+    """
+    out: list[str] = []
+    space = False
+    i, n = 0, len(query)
+
+    def emit(token: str) -> None:
+        nonlocal space
+        if space and out and token[0] not in "(,)" and out[-1][-1] not in "(,":
+            out.append(" ")
+        space = False
+        out.append(token)
+
+    while i < n:
+        ch = query[i]
+        if ch == '"':
+            j = i + 1
+            while j < n:
+                if query[j] == '"':
+                    if j + 1 < n and query[j + 1] == '"':
+                        j += 2
+                        continue
+                    break
+                j += 1
+            emit(query[i : j + 1])
+            i = j + 1
+            continue
+        if ch in "'[":
+            end = query.find("'" if ch == "'" else "]", i + 1)
+            end = n if end < 0 else end + 1
+            emit(query[i:end])
+            i = end
+            continue
+        if query.startswith("//", i) or query.startswith("--", i):
+            end = query.find("\n", i)
+            i = n if end < 0 else end
+            space = True
+            continue
+        if query.startswith("/*", i):
+            end = query.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            space = True
+            continue
+        if ch.isspace():
+            space = True
+            i += 1
+            continue
+        j = i + 1
+        if ch not in "(),":
+            # Token simples: vai até o próximo espaço, delimitador ou início de string/identificador
+            while j < n and not query[j].isspace() and query[j] not in _DELIMITERS:
+                if query.startswith(("//", "--", "/*"), j):
+                    break
+                j += 1
+        emit(query[i:j])
+        i = j
+    return "".join(out)
+
+
+def split_args(text: str) -> list[str]:
+    """Divide uma lista de argumentos nas vírgulas de nível zero."""
+    parts, start = [], 0
+    for i, ch, depth in _scan(text):
+        if ch == "," and depth == 0:
+            parts.append(text[start:i].strip())
+            start = i + 1
+    tail = text[start:].strip()
+    if tail or parts:
+        parts.append(tail)
+    return parts
+
+
+def call_args(text: str, function: str) -> list[str] | None:
+    """
+    Se text for exatamente FUNCTION( ... ), retorna seus argumentos; senão None.
+    """
+    text = text.strip()
+    match = re.match(rf"{function}\s*\(", text, re.IGNORECASE)
+    if not match or not text.endswith(")"):
+        return None
+    open_at = match.end() - 1
+    # O parêntese que fecha a chamada precisa ser o último caractere
+    for i, ch, depth in _scan(text):
+        if i > open_at and ch == ")" and depth == 0:
+            if i != len(text) - 1:
+                return None
+            return split_args(text[open_at + 1 : i])
+    return None
+
+
+def _string_literal(text: str) -> str | None:
+    text = text.strip()
+    if len(text) >= 2 and text[0] == '"' and text[-1] == '"':
+        return text[1:-1].replace('""', '"')
+    return None
+
+
+def parse_scalar_query(query: str) -> ScalarQuery | None:
+    """Reconhece EVALUATE ROW(...) / EVALUATE CALCULATETABLE(ROW(...), filtros...)."""
+    text = strip_comments(query).strip()
+    match = re.match(r"EVALUATE\s+", text, re.IGNORECASE)
+    if not match:
+        return None
+    body = text[match.end() :]
+
+    filters: list[str] = []
+    args = call_args(body, "CALCULATETABLE")
+    if args is not None:
+        if len(args) < 2:
+            return None
+        body, filters = args[0], args[1:]
+
+    row_args = call_args(body, "ROW")
+    if row_args is None or not row_args or len(row_args) % 2:
+        return None
+
+    columns = []
+    for name_arg, expr in zip(row_args[::2], row_args[1::2]):
+        name = _string_literal(name_arg)
+        if name is None or not expr:
+            return None
+        columns.append((name, expr))
+    return ScalarQuery(columns, filters)
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def build_scalar_query(columns: list[tuple[str, str]], filters: list[str] | tuple[str, ...]) -> str:
+    """Monta EVALUATE ROW(...) (ou CALCULATETABLE(ROW(...), filtros)) a partir das colunas."""
+    row = "ROW(\n        " + ",\n        ".join(f"{_quote(n)}, {e}" for n, e in columns) + "\n    )"
+    if not filters:
+        return f"EVALUATE\n    {row}"
+    return "EVALUATE\nCALCULATETABLE(\n    " + row + ",\n    " + ",\n    ".join(filters) + "\n)"
@@ -0,0 +1,133 @@
+"""
+Templates DAX pré-compilados com parâmetros tipados.
+
+O texto do template é canonicalizado (ver dax_parser.canonicalize) e dividido em
+trechos fixos e parâmetros uma única vez, na importação do módulo que o define.
+Cada chamada apenas converte os valores pelo tipo declarado e concatena os trechos,
+sem reformatar a consulta inteira. Como os parâmetros também são normalizados
+(ex: date(2025, 3, 1), "2025-03-01" e "DATE(2025, 03, 01)" viram DATE(2025,3,1)),
+a mesma consulta gera o mesmo texto — e a mesma chave de cache — em qualquer ponto
+de entrada (runners, servidor MCP, scripts).
+
+Parâmetros são escritos como $nome no texto:
+
+    _METAS = DaxTemplate(
+        "EVALUATE CALCULATETABLE(ROW(...), DATESBETWEEN('Calendario'[Date], $inicio, $fim))",
+        inicio="date",
+        fim="date",
+    )
+    _METAS.render(inicio=date(2025, 3, 1), fim="DATE(2025, 3, 31)")
+"""
+
+import re
+from collections.abc import Callable
+from datetime import date, datetime
+from string import Template
+from typing import Any
+
+from src.core.utils.dax_parser import canonicalize
+
+_DAX_DATE = re.compile(r"^\s*DATE\s*\(\s*(\d{4})\s*,\s*(\d{1,2})\s*,\s*(\d{1,2})\s*\)\s*$", re.IGNORECASE)
+_ISO_DATE = re.compile(r"^\s*\"?(\d{4})-(\d{2})-(\d{2})(?:T[\d:.]+)?\"?\s*$")
+_NAME = re.compile(r"^[A-Za-z0-9_]+$")
+
+
+def _to_date(value: Any) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        match = _DAX_DATE.match(value) or _ISO_DATE.match(value)
+        if match:
+            return date(*(int(part) for part in match.groups()))
+    raise ValueError(f"Data DAX inválida: {value!r}")
+
+
+def dax_date(value: Any) -> str:
+    """date/datetime, "YYYY-MM-DD" ou "DATE(y, m, d)" → DATE(y,m,d)."""
+    d = _to_date(value)
+    return f"DATE({d.year},{d.month},{d.day})"
+
+
+def dax_date_text(value: Any) -> str:
+    """Mesmas entradas de dax_date → literal "YYYY-MM-DD" (filtros que comparam texto)."""
+    return f'"{_to_date(value).isoformat()}"'
+
+
+def dax_string(value: Any) -> str:
+    """Literal de texto DAX (aspas duplas escapadas)."""
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def dax_table(value: Any) -> str:
+    """Nome de tabela entre aspas simples (ex: 'Comercial_Metas')."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def dax_measure(value: Any) -> str:
+    """Referência a coluna/medida entre colchetes (ex: [% Meta 1 GS])."""
+    return "[" + str(value).replace("]", "]]") + "]"
+
+
+def dax_name(value: Any) -> str:
+    """Fragmento de identificador (prefixos de departamento, sufixos numéricos)."""
+    text = str(value)
+    if not _NAME.match(text):
+        raise ValueError(f"Identificador DAX inválido: {value!r}")
+    return text
+
+
+def dax_fragments(value: Any) -> str:
+    """Trechos já montados por outros templates (str ou lista, unidos por vírgula)."""
+    if isinstance(value, str):
+        return value
+    return ",".join(value)
+
+
+PARAM_TYPES: dict[str, Callable[[Any], str]] = {
+    "date": dax_date,
+    "date_text": dax_date_text,
+    "string": dax_string,
+    "table": dax_table,
+    "measure": dax_measure,
+    "name": dax_name,
+    "fragments": dax_fragments,
+}
+
+
+class DaxTemplate:
+    """Consulta DAX compilada uma vez; render() só converte parâmetros e concatena."""
+
+    __slots__ = ("params", "_segments")
+
+    def __init__(self, text: str, **params: str):
+        unknown = {kind for kind in params.values() if kind not in PARAM_TYPES}
+        if unknown:
+            raise ValueError(f"Tipos de parâmetro DAX desconhecidos: {sorted(unknown)}")
+        self.params = params
+
+        # Trechos alternados: texto fixo (str) e nome de parâmetro (tuple de 1 elemento)
+        canonical = canonicalize(text)
+        segments: list = []
+        last = 0
+        for match in Template.pattern.finditer(canonical):
+            name = match.group("named") or match.group("braced")
+            if name is None:
+                continue
+            if name not in params:
+                raise ValueError(f"Parâmetro DAX sem tipo declarado: ${name}")
+            segments.append(canonical[last : match.start()])
+            segments.append((name,))
+            last = match.end()
+        segments.append(canonical[last:])
+        self._segments = [s for s in segments if s != ""]
+
+    def render(self, **values: Any) -> str:
+        """Monta a consulta; parâmetros ausentes ou a mais levantam ValueError."""
+        if values.keys() != self.params.keys():
+            missing = sorted(self.params.keys() - values.keys())
+            extra = sorted(values.keys() - self.params.keys())
+            raise ValueError(f"Parâmetros DAX inválidos (faltando: {missing}, inesperados: {extra})")
+        converted = {name: PARAM_TYPES[kind](values[name]) for name, kind in self.params.items()}
+        return "".join(converted[s[0]] if isinstance(s, tuple) else s for s in self._segments)
@@ -39,6 +39,9 @@ def get_logger(name: str = "automation") -> logging.Logger:
     Retorna um logger configurado com:
     - Arquivo rotativo (JSON, 5 MB, 3 backups) — estruturado para ferramentas de log
     - Console (texto legível) — para desenvolvimento e Docker logs
+
+    LOG_STREAM=stderr desvia o console para stderr (processos que usam stdout
+    como canal de dados, como o servidor MCP stdio).
     """
     log_dir = os.path.join(os.getcwd(), "logs")
     os.makedirs(log_dir, exist_ok=True)
@@ -60,7 +63,8 @@ def get_logger(name: str = "automation") -> logging.Logger:
     file_handler.setFormatter(_JSONFormatter())
 
     # ── Handler de console: texto legível ───────────────────────────────────
-    console_handler = logging.StreamHandler(sys.stdout)
+    console_stream = sys.stderr if os.getenv("LOG_STREAM") == "stderr" else sys.stdout
+    console_handler = logging.StreamHandler(console_stream)
     console_handler.setFormatter(_CONSOLE_FORMATTER)
 
     logger.addHandler(file_handler)
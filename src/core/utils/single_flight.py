@@ -0,0 +1,68 @@
+"""
+Coalescência de chamadas concorrentes idênticas (single-flight).
+
+Enquanto uma chamada para uma chave está em andamento, as demais threads que
+pedirem a mesma chave aguardam o Future da primeira em vez de repetir o trabalho.
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+from src.core.utils.logger import get_logger
+
+logger = get_logger("single_flight")
+
+
+class SingleFlight:
+    """Registro thread-safe de chamadas em andamento, com contadores de coalescência."""
+
+    def __init__(self, name: str = "single_flight"):
+        self._name = name
+        self._lock = threading.Lock()
+        self._inflight: dict[Hashable, Future] = {}
+        self._leaders = 0
+        self._coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> tuple[Any, bool]:
+        """
+        Executa fn(*args, **kwargs) uma única vez por chave em andamento.
+
+        Retorna (resultado, compartilhado). 'compartilhado' é True quando a chamada
+        apenas aguardou o resultado de outra thread. Exceções do líder são
+        propagadas para todos os que aguardavam.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = Future()
+                self._inflight[key] = future
+                self._leaders += 1
+                leader = True
+            else:
+                self._coalesced += 1
+                leader = False
+
+        if not leader:
+            logger.debug(f"[{self._name}] Chamada coalescida com requisição em andamento")
+            return future.result(), True
+
+        try:
+            result = fn(*args, **kwargs)
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        """Contadores acumulados: chamadas executadas (líderes), coalescidas e em andamento."""
+        with self._lock:
+            return {
+                "executed": self._leaders,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._inflight),
+            }
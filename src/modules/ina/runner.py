@@ -207,15 +207,14 @@ class InaAutomation:
 
         try:
             logger.info("Executando query KPIs no Power BI")
-            kpis_res = self.powerbi.execute_dax(query_kpis)
+            kpis_res = self.powerbi.execute_dax_result(query_kpis)
 
             if not kpis_res:
                 logger.error("Query KPIs retornou vazio. Abortando.")
                 return None
 
-            raw = kpis_res[0]
-            # Normaliza chaves: remove prefixo e colchetes (ex: "[Card_Vencendo_Hoje]" → "Card_Vencendo_Hoje")
-            kpis = {re.sub(r".*\[|\]", "", k).strip(): v for k, v in raw.items()}
+            # Chaves já normalizadas pelo DaxResult (ex: "[Card_Vencendo_Hoje]" → "Card_Vencendo_Hoje")
+            kpis = kpis_res.first()
 
             logger.info(f"KPIs recebidos: {list(kpis.keys())}")
             for campo, val in kpis.items():
@@ -234,15 +233,15 @@ class InaAutomation:
         top10 = []
 
         try:
-            res = self.powerbi.execute_dax(query)
+            res = self.powerbi.execute_dax_result(query)
 
             if not res:
                 logger.warning("Top10 retornou vazio.")
                 return top10
 
             for item in res:
-                # Normaliza chaves
-                norm = {re.sub(r".*\[|\]", "", k).strip(): self._extrair_valor(v) for k, v in item.items()}
+                # Chaves já normalizadas pelo DaxResult; valores limpos de HTML
+                norm = {k: self._extrair_valor(v) for k, v in item.items()}
 
                 # Garante o campo nome_fantasia (vindo de razao_social)
                 norm["nome_fantasia"] = norm.get("razao_social", norm.get("Cliente", "Desconhecido"))
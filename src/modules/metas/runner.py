@@ -6,7 +6,8 @@ Extrai dados de metas do Power BI e envia imagens para WhatsApp/Email.
 import json
 import os
 import random
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 
 from jinja2 import Template
 
@@ -22,6 +23,36 @@ from src.core.utils.logger import get_logger
 
 logger = get_logger("run_metas")
 
+MESES = [
+    "Janeiro",
+    "Fevereiro",
+    "Março",
+    "Abril",
+    "Maio",
+    "Junho",
+    "Julho",
+    "Agosto",
+    "Setembro",
+    "Outubro",
+    "Novembro",
+    "Dezembro",
+]
+
+
+def _parse_month(value: str) -> date:
+    """Converte "YYYY-MM" no primeiro dia do mês."""
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+def _month_list(first: date, last: date) -> list[date]:
+    """Primeiros dias de mês de first a last (inclusive)."""
+    months = []
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        months.append(date(year, month, 1))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
 
 class MetasAutomation:
     """
@@ -50,22 +81,8 @@ class MetasAutomation:
 
     def get_periodo(self):
         """Retorna o período atual formatado (ex: Janeiro/2024)."""
-        meses = [
-            "Janeiro",
-            "Fevereiro",
-            "Março",
-            "Abril",
-            "Maio",
-            "Junho",
-            "Julho",
-            "Agosto",
-            "Setembro",
-            "Outubro",
-            "Novembro",
-            "Dezembro",
-        ]
         now = datetime.now() - timedelta(days=1)
-        return f"{meses[now.month - 1]}/{now.year}"
+        return f"{MESES[now.month - 1]}/{now.year}"
 
     def get_data_referencia(self):
         """Retorna a data de referência (ontem) formatada."""
@@ -84,6 +101,50 @@ class MetasAutomation:
         fetcher = PowerBIDataFetcher()
         return fetcher.fetch_all_data()
 
+    def backfill(self, first_month: date, last_month: date, render: bool = False, max_workers: int = 4) -> dict:
+        """
+        Preenche o histórico local de metas para os meses de first_month a last_month.
+
+        Todos os meses são buscados com uma consulta por grupo de medidas (não 7 por mês).
+        Com render, as imagens de cada mês são geradas em paralelo em
+        IMAGES_DIR/metas_historico/ (metas_geral_YYYY-MM.png e metas_resumo_YYYY-MM.png).
+        Retorna {mês: {"geral": caminho, "resumo": caminho}} quando render, senão {mês: None}.
+        """
+        from src.core.services.powerbi_data import PowerBIDataFetcher
+
+        months = _month_list(first_month, last_month)
+        logger.info(f"\n=== BACKFILL METAS ({len(months)} meses) ===")
+        fetcher = PowerBIDataFetcher()
+        raws = fetcher.backfill(months)
+        if not render or not raws:
+            return {mes: None for mes in raws}
+
+        out_dir = os.path.join(IMAGES_DIR, "metas_historico")
+        os.makedirs(out_dir, exist_ok=True)
+
+        def _render(mes: date, raw: dict) -> dict:
+            # Renderizadores guardam estado por chamada (ex: largura): um ImageGenerator por mês
+            image_gen = ImageGenerator()
+            total_gs, departamentos, receitas = fetcher.format_report(raw)
+            periodo = f"{MESES[mes.month - 1]}/{mes.year}"
+            geral_path = os.path.join(out_dir, f"metas_geral_{mes:%Y-%m}.png")
+            resumo_path = os.path.join(out_dir, f"metas_resumo_{mes:%Y-%m}.png")
+            image_gen.generate_metas_image(periodo, departamentos, total_gs, receitas, geral_path)
+            image_gen.generate_resumo_image(periodo, total_gs, receitas, resumo_path)
+            return {"geral": geral_path, "resumo": resumo_path}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {mes: executor.submit(_render, mes, raw) for mes, raw in raws.items()}
+        images = {}
+        for mes, future in futures.items():
+            try:
+                images[mes] = future.result()
+            except Exception as e:
+                logger.error(f"Erro ao gerar imagens de {mes:%m/%Y}: {e}")
+                images[mes] = None
+        logger.info(f"=== FIM BACKFILL METAS ({sum(1 for v in images.values() if v)} meses renderizados) ===\n")
+        return images
+
     def generate_images(self, total_gs, departamentos, receitas, periodo):
         """
         Gera todas as imagens de relatòrio (Geral, Resumo e por Departamento).
@@ -287,11 +348,32 @@ def main():
         help="Simulate WhatsApp sending (logs only).",
     )
     parser.add_argument("--payload", type=str, help="JSON payload with recipients and template.")
+    parser.add_argument(
+        "--backfill",
+        type=str,
+        metavar="YYYY-MM:YYYY-MM",
+        help="Fill the local metas history for a range of months (no sending).",
+    )
+    parser.add_argument(
+        "--render",
+        action="store_true",
+        help="With --backfill, also render the images of each month.",
+    )
 
     args = parser.parse_args()
 
     automation = MetasAutomation()
 
+    if args.backfill:
+        try:
+            first, _, last = args.backfill.partition(":")
+            first_month, last_month = _parse_month(first), _parse_month(last or first)
+        except ValueError:
+            logger.error(f"Intervalo de backfill inválido: '{args.backfill}' (use YYYY-MM:YYYY-MM)")
+            return
+        automation.backfill(first_month, last_month, render=args.render)
+        return
+
     recipients = None
     template_content = None
 
@@ -1,20 +1,21 @@
+import contextvars
 import re
-from typing import Any, Dict, List
-
-from src.core.services.dax_queries import get_unidades_list_query, get_unidades_summary_query
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Dict, List, Tuple
+
+from src.core.clients.dax_result import DaxResult
+from src.core.services.dax_queries import (
+    get_unidades_list_query,
+    get_unidades_listas_query,
+    get_unidades_summary_query,
+)
+from src.core.services.unidades_partitions import get_unidades_partitions, missing_ranges
 from src.core.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 
-def _normalize_keys(row: Dict) -> Dict:
-    """
-    Remove prefixo de tabela e colchetes dos nomes de colunas retornados pela API do Power BI.
-    Ex: "[FatoUnidades].[Nome]" → "Nome" | "[NovasUnidades]" → "NovasUnidades"
-    """
-    return {re.sub(r".*\[|\]", "", k).strip(): v for k, v in row.items()}
-
-
 def _extract_numeric(v: Any) -> int:
     """
     Extrai valor numérico de retornos do Power BI.
@@ -59,7 +60,7 @@ class PowerBIUnidadesFetcher:
         Normaliza chaves e extrai valores numéricos de HTML se necessário.
         """
         summary_query = get_unidades_summary_query(date_start, date_end)
-        rows = self.client.execute_dax(summary_query)
+        result = self.client.execute_dax_result(summary_query)
 
         summary_data = {
             "novas_unidades": 0,
@@ -67,8 +68,8 @@ class PowerBIUnidadesFetcher:
             "unidades_inativadas": 0,
         }
 
-        if rows:
-            row = _normalize_keys(rows[0])
+        if result:
+            row = result.first()
             logger.debug(f"Summary keys normalizadas: {list(row.keys())}")
 
             summary_data = {
@@ -83,26 +84,112 @@ class PowerBIUnidadesFetcher:
     def fetch_units_list(self, date_start: str, date_end: str, status: str) -> List[Dict]:
         """
         Busca a lista de unidades (novas ou inativadas) via Power BI DAX.
-        Normaliza as chaves de cada item retornado.
+        As chaves já vêm normalizadas pelo DaxResult.
         """
-        query = get_unidades_list_query(date_start, date_end, status=status)
-        rows = self.client.execute_dax(query)
+        # Períodos longos (mensal, backfill) são divididos em janelas de datas quando o
+        # resultado atinge o limite de linhas do executeQueries
+        try:
+            result = DaxResult.from_rows(
+                self.client.iter_dax_windows(
+                    lambda start, end: get_unidades_list_query(start, end, status=status),
+                    date_start,
+                    date_end,
+                )
+            )
+        except RuntimeError as e:
+            logger.error(f"Erro ao buscar lista de unidades ({status}): {e}")
+            return []
 
-        if not rows:
+        if not result:
             return []
 
-        normalized = [_normalize_keys(row) for row in rows]
+        # Nomes de coluna normalizados uma única vez por resultado (DaxResult)
+        normalized = result.to_rows()
         logger.debug(
             f"fetch_units_list ({status}): {len(normalized)} itens, "
             f"keys: {list(normalized[0].keys()) if normalized else []}"
         )
         return normalized
 
+    def _fetch_partitions(self, date_start: str, date_end: str) -> Dict | None:
+        """
+        Novas e inativadas do intervalo em uma única consulta (UNION com colunas Status e Dia),
+        separadas por dia: {date: (novas, inativadas)}. Linhas sem dia reconhecível ficam na
+        chave None. Retorna None se a consulta falhar.
+        """
+        try:
+            result = DaxResult.from_rows(
+                self.client.iter_dax_windows(get_unidades_listas_query, date_start, date_end)
+            )
+        except RuntimeError as e:
+            logger.warning(f"Consulta combinada de unidades falhou: {e}")
+            return None
+
+        first, last = date.fromisoformat(date_start), date.fromisoformat(date_end)
+        # Mantém as chaves das consultas por status (sem Status/Dia)
+        columns = [c for c in result.columns if c not in ("Status", "Dia")]
+        arrays = [result.data[c] for c in columns]
+        partitions: Dict = {}
+        for status, dia, values in zip(result.column("Status"), result.column("Dia"), zip(*arrays)):
+            day = date.fromisoformat(dia[:10]) if isinstance(dia, str) and len(dia) >= 10 else None
+            if day is not None and not first <= day <= last:
+                day = None
+            novas, inativadas = partitions.setdefault(day, ([], []))
+            (novas if status == "Nova" else inativadas).append(dict(zip(columns, values)))
+        return partitions
+
+    def fetch_units_lists(self, date_start: str, date_end: str) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Busca as listas de novas e inativadas do período.
+
+        Dias já gravados nas partições diárias (ex: pelos jobs diários) vêm do disco; os dias
+        que faltam são consultados em uma consulta combinada por trecho contíguo e gravados.
+        Se a consulta combinada falhar, volta às duas consultas por status para o período todo.
+        """
+        store = get_unidades_partitions()
+        first, last = date.fromisoformat(date_start), date.fromisoformat(date_end)
+        partitions = store.load(first, last) if store is not None else {}
+        if partitions:
+            logger.info(f"Unidades: {len(partitions)} dia(s) de {date_start} a {date_end} lidos das partições")
+
+        for range_start, range_end in missing_ranges(first, last, partitions):
+            fetched = self._fetch_partitions(range_start.isoformat(), range_end.isoformat())
+            if fetched is None:
+                return (
+                    self.fetch_units_list(date_start, date_end, status="Nova"),
+                    self.fetch_units_list(date_start, date_end, status="Inativada"),
+                )
+            if store is not None:
+                if None in fetched:
+                    logger.warning(f"Linhas sem data em {range_start}..{range_end}; partições não gravadas.")
+                else:
+                    store.store(range_start, range_end, fetched)
+            for day, (novas, inativadas) in fetched.items():
+                current = partitions.setdefault(day, ([], []))
+                current[0].extend(novas)
+                current[1].extend(inativadas)
+
+        # Montagem em ordem cronológica (linhas sem data por último)
+        new_units, inactive_units = [], []
+        for day in sorted(partitions, key=lambda d: (d is None, d or first)):
+            new_units.extend(partitions[day][0])
+            inactive_units.extend(partitions[day][1])
+
+        logger.debug(f"fetch_units_lists: {len(new_units)} novas, {len(inactive_units)} inativadas")
+        return new_units, inactive_units
+
     def fetch_dashboard_data(self, date_start: str, date_end: str) -> Dict:
-        """Busca todos os dados necessários para o dashboard de unidades."""
-        summary = self.fetch_summary(date_start, date_end)
-        new_units = self.fetch_units_list(date_start, date_end, status="Nova")
-        inactive_units = self.fetch_units_list(date_start, date_end, status="Inativada")
+        """
+        Busca todos os dados necessários para o dashboard de unidades.
+        O resumo e as listas são consultados ao mesmo tempo.
+        """
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="unidades-fetch") as executor:
+            # copy_context: as consultas herdam a prioridade do chamador
+            summary_future = executor.submit(
+                contextvars.copy_context().run, self.fetch_summary, date_start, date_end
+            )
+            new_units, inactive_units = self.fetch_units_lists(date_start, date_end)
+            summary = summary_future.result()
 
         # As medidas KPI do Power BI não respondem bem a filtros de período curto.
         # Os contadores são derivados diretamente das listas para garantir consistência.
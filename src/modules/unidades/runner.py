@@ -69,16 +69,7 @@ class UnidadesAutomation:
         """Busca todos os dados necessários para o dashboard de unidades."""
         logger.info(f"Buscando dados de unidades de {date_start} até {date_end}")
 
-        summary = self.fetcher.fetch_summary(date_start, date_end)
-        new_units = self.fetcher.fetch_units_list(date_start, date_end, status="Nova")
-        inactive_units = self.fetcher.fetch_units_list(date_start, date_end, status="Inativada")
-
-        # Os contadores são derivados diretamente das listas para garantir consistência
-        # (medidas KPI do Power BI não respondem bem a filtros de período curto).
-        summary["novas_unidades"] = len(new_units)
-        summary["unidades_inativadas"] = len(inactive_units)
-
-        return {"summary": summary, "new_units_list": new_units, "inactive_units_list": inactive_units}
+        return self.fetcher.fetch_dashboard_data(date_start, date_end)
 
     def run(
         self,
@@ -0,0 +1,12 @@
+from src.core.utils.dax_parser import canonicalize
+
+
+def test_canonicalize_ignora_espaco_antes_de_parenteses():
+    assert canonicalize('EVALUATE ROW ( "A" , SUM ( T[x] ) )') == canonicalize('EVALUATE ROW("A", SUM(T[x]))')
+    assert canonicalize("EVALUATE\n\tCALCULATETABLE (ROW(\"A\", [m]),  F )") == (
+        'EVALUATE CALCULATETABLE(ROW("A",[m]),F)'
+    )
+
+
+def test_canonicalize_preserva_strings_e_identificadores():
+    assert canonicalize('ROW ("a (b)", \'Tab (1)\'[Col (x)])') == 'ROW("a (b)",\'Tab (1)\'[Col (x)])'